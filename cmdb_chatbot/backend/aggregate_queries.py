@@ -0,0 +1,275 @@
+import re
+from datetime import date, datetime, timedelta
+from .db_utils import METRICS_VIEW, ACTIVITY_TABLE, AUTHORS_TABLE, LANGUAGE_PROFILE_TABLE
+from .nlp_utils import extract_top_n, extract_package_name
+
+DEFAULT_LIMIT = 10
+DEFAULT_INACTIVE_DAYS = 90
+
+# -------------------------------
+# Slot extraction
+# -------------------------------
+# Only questions about several repos (or "which repo ...") are answered here
+_FLEET = re.compile(r"\b(?:repos|repositories|projects|codebases)\b|\b(?:which|what)\s+(?:repo|repository|project)\b")
+_SINGULAR = re.compile(r"\b(?:which|what)\s+(?:repo|repository|project)\b")
+# Questions whose subject comes before the repos ("top contributors across all repos") belong to other handlers
+_OTHER_SUBJECTS = re.compile(r"\b(?:contributors?|authors?|committers?|developers?|people|files?|hotspots?|"
+                             r"modules?|branch\w*|tags?)\b")
+_COMMITS_SUBJECT = re.compile(r"\bcommits?\b")
+# Anywhere in the question these make it a dependency question ("how many repos depend on X")
+_DEPENDENCY_WORDS = re.compile(r"\b(?:depend\w*|librar\w*|packages?)\b")
+
+# metric -> (column, header, words that select it); checked in order
+METRICS = {
+    "contributors": ("contributors", "Contributors", ("contributor", "author", "committer", "developer")),
+    "files": ("files_count", "Files", ("file", "largest", "biggest", "smallest", "size")),
+    "last_commit": ("last_commit_date", "Last commit", ("recent", "latest", "last commit", "updated")),
+    "commits": ("total_commits", "Commits", ("commit",)),
+}
+ASCENDING_WORDS = ("fewest", "least", "smallest", "lowest", "bottom", "oldest")
+RANKING_WORDS = ("top", "most", "fewest", "least", "largest", "biggest", "smallest", "highest", "lowest",
+                 "rank", "sorted by", "order by", " by ", "oldest", "newest", "latest", "recently")
+INACTIVE_WORDS = ("inactive", "stale", "dormant", "abandoned", "no commits", "no activity", "not updated",
+                  "not been updated", "haven't been updated", "without commits", "not touched", "idle")
+COUNT_WORDS = ("how many", "number of", "count of")
+
+# Question words -> language names of the lines-of-code profile (see language_profiler.py)
+LANGUAGE_NAMES = {
+    "python": "Python", "go": "Go", "golang": "Go", "java": "Java", "javascript": "JavaScript",
+    "typescript": "TypeScript", "ruby": "Ruby", "rust": "Rust", "c#": "C#", "csharp": "C#",
+    "c++": "C++", "php": "PHP", "kotlin": "Kotlin", "scala": "Scala", "swift": "Swift",
+    "shell": "Shell", "bash": "Shell", "sql": "SQL", "html": "HTML", "css": "CSS",
+    "yaml": "YAML", "terraform": "HCL", "dart": "Dart", "elixir": "Elixir", "haskell": "Haskell",
+}
+_LANGUAGE_NAMES = "|".join(re.escape(name) for name in sorted(LANGUAGE_NAMES, key=len, reverse=True))
+_LANGUAGE = re.compile(
+    rf"\b(?:use|uses|using|written in|in|with|contain|contains)\s+({_LANGUAGE_NAMES})(?![\w+#])"
+    rf"|(?<![\w+#])({_LANGUAGE_NAMES})\s+(?:repos|repositories|projects|code|files)\b")
+
+_WINDOW = re.compile(r"\b(\d+)\s*(day|week|month|year)s?\b")
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+_NAMED_WINDOWS = {"last week": 7, "past week": 7, "last month": 30, "past month": 30,
+                  "last quarter": 90, "past quarter": 90, "last year": 365, "past year": 365}
+
+
+def extract_window_days(question):
+    """Days in "in the last 90 days" / "6 months" / "last quarter", or None."""
+    match = _WINDOW.search(question)
+    if match:
+        return int(match.group(1)) * _UNIT_DAYS[match.group(2)]
+    for phrase, days in _NAMED_WINDOWS.items():
+        if phrase in question:
+            return days
+    return None
+
+
+def parse_aggregate_question(question):
+    """
+    Match a question to an aggregate template and fill its slots.
+
+    Returns:
+        Dict with template ("inactive", "language", "count" or "ranking"),
+        metric, descending, limit, window_days and language, or None when
+        the question isn't a cross-repo aggregate
+    """
+    question = question.lower()
+    fleet = _FLEET.search(question)
+    if not fleet:
+        return None
+    other = _OTHER_SUBJECTS.search(question)
+    if other and other.start() < fleet.start():
+        return None
+    if _DEPENDENCY_WORDS.search(question):
+        return None
+    # "how many repos use django" names a package, not a language; the dependencies handler answers it
+    language = _LANGUAGE.search(question)
+    if not language and extract_package_name(question):
+        return None
+    commits = _COMMITS_SUBJECT.search(question)
+
+    limit = extract_top_n(question, default=1 if _SINGULAR.search(question) else DEFAULT_LIMIT,
+                          maximum=100)
+    slots = {"limit": limit, "window_days": extract_window_days(question), "metric": "commits",
+             "descending": not any(word in question for word in ASCENDING_WORDS), "language": None}
+
+    if language:
+        slots["language"] = LANGUAGE_NAMES[language.group(1) or language.group(2)]
+
+    if any(word in question for word in INACTIVE_WORDS):
+        slots["window_days"] = slots["window_days"] or DEFAULT_INACTIVE_DAYS
+        return dict(slots, template="inactive")
+    if language and (any(word in question for word in COUNT_WORDS) or "which" in question or "what" in question):
+        return dict(slots, template="language")
+    if any(word in question for word in COUNT_WORDS):
+        # "how many commits across all repos" sums commits instead of counting repos
+        slots["sum_commits"] = bool(commits and commits.start() < fleet.start())
+        return dict(slots, template="count")
+    if any(word in question for word in RANKING_WORDS):
+        for metric, (_, _, words) in METRICS.items():
+            if any(word in question for word in words):
+                slots["metric"] = metric
+                break
+        return dict(slots, template="ranking")
+    return None
+
+
+# -------------------------------
+# Queries
+# -------------------------------
+def _cutoff(window_days):
+    return date.today() - timedelta(days=window_days)
+
+
+def _query_ranking(cur, slots):
+    column, header, _ = METRICS[slots["metric"]]
+    direction = "DESC" if slots["descending"] else "ASC"
+    params = {"limit": slots["limit"]}
+
+    if slots["metric"] == "commits" and slots["window_days"]:
+        # Commits inside the window come from the weekly rollups' (period, period_start) index
+        params["cutoff"] = _cutoff(slots["window_days"])
+        cur.execute(f"""
+            SELECT repo_name, SUM(commits) AS window_commits
+            FROM {ACTIVITY_TABLE}
+            WHERE period = 'week' AND period_start >= %(cutoff)s
+            GROUP BY repo_name
+            ORDER BY window_commits {direction}, repo_name
+            LIMIT %(limit)s
+        """, params)
+        return ["Repository", f"Commits (last {slots['window_days']} days)"], cur.fetchall()
+
+    if slots["metric"] == "contributors":
+        cur.execute(f"""
+            SELECT m.repo_name, COALESCE(a.contributors, 0) AS contributors, m.total_commits
+            FROM {METRICS_VIEW} m
+            LEFT JOIN (
+                SELECT repo_name, COUNT(*) AS contributors FROM {AUTHORS_TABLE} GROUP BY repo_name
+            ) a USING (repo_name)
+            ORDER BY contributors {direction}, m.repo_name
+            LIMIT %(limit)s
+        """, params)
+        return ["Repository", header, "Commits"], cur.fetchall()
+
+    where = ""
+    if slots["window_days"]:
+        where = "WHERE last_commit_date >= %(cutoff)s"
+        params["cutoff"] = _cutoff(slots["window_days"])
+    cur.execute(f"""
+        SELECT repo_name, total_commits, files_count, last_commit_date
+        FROM {METRICS_VIEW}
+        {where}
+        ORDER BY {column} {direction} NULLS LAST, repo_name
+        LIMIT %(limit)s
+    """, params)
+    return ["Repository", "Commits", "Files", "Last commit"], cur.fetchall()
+
+
+def _query_inactive(cur, slots):
+    cur.execute(f"""
+        SELECT repo_name, last_commit_date, total_commits,
+               (current_date - last_commit_date::date) AS idle_days,
+               COUNT(*) OVER () AS matching
+        FROM {METRICS_VIEW}
+        WHERE last_commit_date < %(cutoff)s
+        ORDER BY last_commit_date, repo_name
+        LIMIT %(limit)s
+    """, {"cutoff": _cutoff(slots["window_days"]), "limit": max(slots["limit"], DEFAULT_LIMIT)})
+    rows = cur.fetchall()
+    return ["Repository", "Last commit", "Commits", "Days idle"], [row[:4] for row in rows], \
+        (rows[0][4] if rows else 0)
+
+
+def _query_language(cur, slots):
+    cur.execute(f"""
+        WITH matching AS (
+            SELECT repo_name, lines
+            FROM {LANGUAGE_PROFILE_TABLE}
+            WHERE language = %(language)s AND lines > 0
+        )
+        SELECT m.repo_name, m.lines, ROUND(m.lines * 100.0 / SUM(p.lines), 1),
+               COUNT(*) OVER () AS matching
+        FROM matching m
+        JOIN {LANGUAGE_PROFILE_TABLE} p USING (repo_name)
+        GROUP BY m.repo_name, m.lines
+        ORDER BY m.lines DESC, m.repo_name
+        LIMIT %(limit)s
+    """, {"language": slots["language"], "limit": max(slots["limit"], DEFAULT_LIMIT)})
+    rows = cur.fetchall()
+    return ["Repository", f"{slots['language']} lines", "% of repo"], [row[:3] for row in rows], \
+        (rows[0][3] if rows else 0)
+
+
+def _query_count(cur, slots):
+    cutoff = _cutoff(slots["window_days"]) if slots["window_days"] else None
+    if slots["sum_commits"]:
+        if cutoff is None:
+            cur.execute(f"SELECT COUNT(*), SUM(total_commits) FROM {METRICS_VIEW}")
+            return ["Repositories", "Commits"], [cur.fetchone()]
+        cur.execute(f"""
+            SELECT COUNT(DISTINCT repo_name), COALESCE(SUM(commits), 0)
+            FROM {ACTIVITY_TABLE}
+            WHERE period = 'week' AND period_start >= %(cutoff)s
+        """, {"cutoff": cutoff})
+        return ["Active repositories", f"Commits in the last {slots['window_days']} days"], [cur.fetchone()]
+
+    cur.execute(f"""
+        SELECT COUNT(*), COUNT(*) FILTER (WHERE last_commit_date >= %(cutoff)s)
+        FROM {METRICS_VIEW}
+    """, {"cutoff": cutoff})
+    total, active = cur.fetchone()
+    if cutoff is None:
+        return ["Repositories"], [(total,)]
+    return ["Repositories", f"With commits in the last {slots['window_days']} days"], [(total, active)]
+
+
+# -------------------------------
+# Answers
+# -------------------------------
+def _cell(value):
+    if value is None:
+        return "-"
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).replace("|", "\\|")
+
+
+def format_markdown_table(headers, rows):
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    lines += ["| " + " | ".join(_cell(value) for value in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def run_aggregate_query(cur, slots):
+    """Run the template chosen by parse_aggregate_question; returns Markdown."""
+    template = slots["template"]
+    if template == "inactive":
+        headers, rows, matching = _query_inactive(cur, slots)
+        if not matching:
+            return f"Every repository has commits in the last {slots['window_days']} days."
+        shown = f", showing the {len(rows)} idle longest" if matching > len(rows) else ""
+        heading = f"{matching} repositories have no commits in the last {slots['window_days']} days{shown}:"
+    elif template == "language":
+        headers, rows, matching = _query_language(cur, slots)
+        if not matching:
+            return f"No repository contains {slots['language']} code."
+        shown = f", showing the top {len(rows)}" if matching > len(rows) else ""
+        heading = f"{matching} repositories contain {slots['language']} code{shown}:"
+    elif template == "count":
+        headers, rows = _query_count(cur, slots)
+        heading = "Across all repositories:"
+    else:
+        headers, rows = _query_ranking(cur, slots)
+        if not rows:
+            return "No repositories match."
+        metric = METRICS[slots["metric"]][1].lower()
+        if slots["metric"] == "commits" and slots["window_days"]:
+            metric = f"commits in the last {slots['window_days']} days"
+        if slots["metric"] == "last_commit":
+            order = "most recent" if slots["descending"] else "oldest"
+        else:
+            order = "highest" if slots["descending"] else "lowest"
+        heading = f"Top {len(rows)} repositories by {metric} ({order} first):"
+    return f"{heading}\n\n{format_markdown_table(headers, rows)}"
+
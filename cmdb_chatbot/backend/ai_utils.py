@@ -1,13 +1,19 @@
+import os
+import json
+import time
+import hashlib
 import requests
 from tiktoken import encoding_for_model
 import tiktoken
-from .db_utils import connect_db, insert_repo_chunk_embedding, query_similar_chunks
+from .db_utils import db_cursor, insert_repo_chunk_embedding, query_similar_chunks
 from .git_utils import prepare_text_for_embedding
+from .shared_cache import shared_cache
+from .metrics import timed, EMBED_SECONDS, EMBED_CHUNKS
 
-API_KEY = "REPLACE WITH API KEY"
-MODEL_ID = "REPLACE WITH EMBEDDING MODEL"
-BASE_URL = "COMPANY Or PERSONAL BASE URL"
-CHAT_MODEL= "DESIRED CHAT MODEL"
+API_KEY = os.getenv("AI_API_KEY", "REPLACE WITH API KEY")
+MODEL_ID = os.getenv("AI_MODEL_ID", "REPLACE WITH EMBEDDING MODEL")
+BASE_URL = os.getenv("AI_BASE_URL", "COMPANY Or PERSONAL BASE URL")
+CHAT_MODEL= os.getenv("AI_CHAT_MODEL", "DESIRED CHAT MODEL")
 
 #CHUNK_SIZE = 1000  # approximate number of characters per chunk
 
@@ -25,6 +31,10 @@ RETRY_LIMIT = 3
 RETRY_DELAY = 2  # seconds
 ENCODER= tiktoken.get_encoding("cl100k_base")
 
+
+class AnswerCancelled(Exception):
+    """Raised when the user cancels a question while it is being answered."""
+
 def chunk_text_by_tokens(text, model_id=MODEL_ID, max_tokens=MAX_TOKENS):
     """
     Split text into chunks based on tokens, respecting max_tokens.
@@ -61,6 +71,21 @@ def get_embedding(text):
         raise Exception(f"Failed to get embedding: {response.status_code} - {response.text}")
 
 
+def get_question_embedding(text):
+    """
+    Embedding for a user question, served from the shared cache when possible.
+
+    Ingestion keeps calling get_embedding directly so chunk vectors don't
+    fill the cache.
+    """
+    key = hashlib.sha1(f"{MODEL_ID}\n{text}".encode()).hexdigest()
+    embedding = shared_cache.get("embeddings", key)
+    if embedding is None:
+        embedding = get_embedding(text)
+        shared_cache.set("embeddings", key, embedding)
+    return embedding
+
+
 def test_gpt_connection():
     headers = {
         "Authorization": f"Bearer {API_KEY}",
@@ -88,6 +113,65 @@ def test_gpt_connection():
 # Run the test
 #test_gpt_connection()
 
+def stream_chat_completion(messages, temperature=0.3, on_token=None, should_cancel=None):
+    """
+    Call the chat API with stream=True and consume the server-sent events.
+
+    Args:
+        messages: Chat messages for the completion
+        temperature: Sampling temperature
+        on_token: Optional callback receiving every content delta as it arrives
+        should_cancel: Optional callable; when it returns True the HTTP stream
+            is closed and AnswerCancelled is raised
+
+    Returns:
+        Tuple of (full answer text, seconds until the first token or None)
+    """
+    headers = {
+        "Authorization": f"Bearer {API_KEY}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": CHAT_MODEL,
+        "messages": messages,
+        "temperature": temperature,
+        "stream": True
+    }
+
+    start = time.perf_counter()
+    response = requests.post(f"{BASE_URL}/chat/completions", json=payload, headers=headers, stream=True)
+    if response.status_code != 200:
+        response.close()
+        raise Exception(f"Failed to stream completion: {response.status_code} - {response.text}")
+
+    parts = []
+    first_token = None
+    try:
+        for line in response.iter_lines():
+            if should_cancel and should_cancel():
+                raise AnswerCancelled()
+            line = line.decode("utf-8") if isinstance(line, bytes) else line
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            # Some providers send chunks without choices (e.g. content filter results)
+            for choice in json.loads(data).get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if not delta:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(delta)
+                if on_token:
+                    on_token(delta)
+    finally:
+        response.close()
+
+    return "".join(parts).strip(), first_token
+
+@timed(EMBED_SECONDS)
 def embed_large_text(repo_info):
     """
     Prepares repo text, chunks it, and returns embeddings with metadata.
@@ -104,6 +188,7 @@ def embed_large_text(repo_info):
             "text_chunk": chunk,
             "embedding": emb
         })
+    EMBED_CHUNKS.inc(len(embeddings_data))
     
     return embeddings_data
 
@@ -113,30 +198,27 @@ def embed_large_text(repo_info):
 # Store chunks in DB
 # -------------------------------
 def store_chunks_in_db(repo_info, embeddings_data):
-    conn, cur = connect_db()
-    for chunk in embeddings_data:
-        insert_repo_chunk_embedding(
-            cur=cur,
-            repo_name=chunk["repo_name"],
-            commit_hash=repo_info.get("commit_hash",""),
-            commit_messages=repo_info.get("commit_messages",""),
-            chunk_index=chunk["chunk_index"],
-            file_path=chunk.get("file_path",""),
-            text_chunk=chunk["text_chunk"],
-            embedding=chunk["embedding"]
-        )
-    conn.commit()
-    cur.close()
-    conn.close()
+    with db_cursor(commit=True) as cur:
+        for chunk in embeddings_data:
+            insert_repo_chunk_embedding(
+                cur=cur,
+                repo_name=chunk["repo_name"],
+                commit_hash=repo_info.get("commit_hash",""),
+                commit_messages=repo_info.get("commit_messages",""),
+                chunk_index=chunk["chunk_index"],
+                file_path=chunk.get("file_path",""),
+                text_chunk=chunk["text_chunk"],
+                embedding=chunk["embedding"]
+            )
 
 # -------------------------------
 # Question answering
 # -------------------------------
 def answer_question(question, top_k=5):
     """Answer questions using context from similar chunks."""
-    conn, cur = connect_db()
     q_emb = get_embedding(question)
-    chunks = query_similar_chunks(cur, q_emb, top_k=top_k)
+    with db_cursor() as cur:
+        chunks = query_similar_chunks(cur, q_emb, top_k=top_k)
     context = "\n\n".join([c["text_chunk"] for c in chunks])
 
     prompt = f"""
@@ -158,8 +240,6 @@ def answer_question(question, top_k=5):
     )
     result = response.json()
     answer = result["choices"][0]["message"]["content"].strip()
-    cur.close()
-    conn.close()
     return answer
 
 
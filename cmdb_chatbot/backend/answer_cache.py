@@ -0,0 +1,160 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from .shared_cache import shared_cache, make_key, KEY_SEPARATOR
+
+# -------------------------------
+# Answer cache
+# -------------------------------
+ANSWER_CACHE_SIZE = 2000          # max cached answers across all repos
+ANSWER_CACHE_TTL = 24 * 3600      # seconds before an answer is recomputed
+SIMILARITY_THRESHOLD = 0.95       # cosine similarity for near-duplicate phrasings
+
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace so trivial rephrasings share a key."""
+    question = re.sub(r"[^\w\s]", " ", (question or "").lower())
+    return " ".join(question.split())
+
+
+class AnswerCache:
+    """
+    LRU cache of final answers keyed by (repo, repo version, normalized question).
+
+    The repo version is the last indexed commit, so a re-ingested repo never
+    serves answers computed from its old chunks. Each entry also keeps the
+    question embedding, which allows near-duplicate phrasings to hit through
+    a cosine-similarity scan over the entries of that repo version.
+
+    With a shared tier, exact-match entries are also written through to it so
+    other workers and restarted processes can serve them.
+    """
+
+    def __init__(self, max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 similarity_threshold=SIMILARITY_THRESHOLD, shared=None):
+        self.max_size = max_size
+        self.shared = shared
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def _expired(self, entry):
+        return time.time() - entry["created"] > self.ttl
+
+    def _check_version(self, repo_name, version):
+        """Drop a repo's entries as soon as a newer indexed version is seen."""
+        if self.versions.get(repo_name) != version:
+            self._drop_repo(repo_name)
+            self.versions[repo_name] = version
+
+    def _drop_repo(self, repo_name):
+        for key in [k for k in self.entries if k[0] == repo_name]:
+            del self.entries[key]
+        self.versions.pop(repo_name, None)
+
+    def get(self, repo_name, version, question):
+        """Exact lookup on the normalized question. Returns the entry dict or None."""
+        key = (repo_name, version, normalize_question(question))
+        with self.lock:
+            self._check_version(repo_name, version)
+            entry = self.entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+
+        if self.shared is None:
+            return None
+        stored = self.shared.get("answers", make_key(*key))
+        if stored is None:
+            return None
+        self._put_local(key, stored["question"], stored["answer"], stored["embedding"], stored["created"])
+        return self.entries.get(key)
+
+    def get_similar(self, repo_name, version, embedding):
+        """
+        Embedding lookup for near-duplicate questions.
+
+        Returns:
+            The best entry with cosine similarity above the threshold, or None.
+        """
+        if embedding is None:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if not query_norm:
+            return None
+
+        with self.lock:
+            self._check_version(repo_name, version)
+            keys = [k for k, e in self.entries.items()
+                    if k[0] == repo_name and e["embedding"] is not None and not self._expired(e)]
+            if not keys:
+                return None
+
+            matrix = np.stack([self.entries[k]["embedding"] for k in keys])
+            scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * query_norm)
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+
+            self.entries.move_to_end(keys[best])
+            return dict(self.entries[keys[best]], similarity=float(scores[best]))
+
+    def put(self, repo_name, version, question, answer, embedding=None):
+        key = (repo_name, version, normalize_question(question))
+        created = time.time()
+        self._put_local(key, question, answer, embedding, created)
+        if self.shared is not None:
+            self.shared.set("answers", make_key(*key), {
+                "question": question,
+                "answer": answer,
+                "embedding": list(map(float, embedding)) if embedding is not None else None,
+                "created": created,
+            }, ttl=self.ttl)
+
+    def _put_local(self, key, question, answer, embedding, created):
+        entry = {
+            "question": question,
+            "answer": answer,
+            "embedding": np.asarray(embedding, dtype=np.float32) if embedding is not None else None,
+            "created": created,
+        }
+        with self.lock:
+            self._check_version(key[0], key[1])
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate_repo(self, repo_name):
+        """Evict every cached answer for a repo. Called by ingestion."""
+        with self.lock:
+            self._drop_repo(repo_name)
+        if self.shared is not None:
+            self.shared.delete_prefix("answers", f"{repo_name}{KEY_SEPARATOR}")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+def label_cached(entry):
+    """Prefix a cached answer with a note saying where it came from."""
+    age_min = int((time.time() - entry["created"]) // 60)
+    if "similarity" in entry:
+        source = f'similar question "{entry["question"]}" ({entry["similarity"]:.2f} match)'
+    else:
+        source = "an identical question"
+    note = f"> ⚡ **Cached answer** from {source}, computed {age_min} min ago."
+    return f"{note}\n\n{entry['answer']}"
+
+
+answer_cache = AnswerCache(shared=shared_cache)
@@ -0,0 +1,104 @@
+import os
+from .ai_utils import ENCODER
+
+# -------------------------------
+# Prompt context packing
+# -------------------------------
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))  # whole user+system prompt
+MIN_TRUNCATED_TOKENS = 200   # don't bother adding a truncated chunk smaller than this
+DUPLICATE_OVERLAP = 0.8      # share of shingles two chunks must have in common to be duplicates
+SHINGLE_SIZE = 8             # tokens per shingle used for duplicate detection
+
+SECTIONS = ("doc", "code", "other")
+
+
+def count_tokens(text):
+    return len(ENCODER.encode(text or ""))
+
+
+def chunk_section(chunk):
+    """Prompt section a retrieved chunk belongs to."""
+    metadata = chunk.get("metadata", {})
+    if metadata.get("is_code"):
+        return "code"
+    if metadata.get("is_doc"):
+        return "doc"
+    return "other"
+
+
+def format_context_entry(chunk, text=None):
+    return f"""
+        Source: {chunk['file_path']} (Relevance: {chunk['final_score']:.2f})
+        Content: {chunk['text_chunk'] if text is None else text}
+        """
+
+
+def _shingles(tokens):
+    if len(tokens) <= SHINGLE_SIZE:
+        return {tuple(tokens)}
+    return {tuple(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def _is_duplicate(shingles, selected):
+    """A chunk is a duplicate when most of the smaller of the two chunks overlaps."""
+    for other in selected:
+        smaller = min(len(shingles), len(other))
+        if smaller and len(shingles & other) / smaller >= DUPLICATE_OVERLAP:
+            return True
+    return False
+
+
+def pack_context(context_chunks, budget):
+    """
+    Greedily fill a token budget with the highest scoring, non-duplicate chunks.
+
+    Args:
+        context_chunks: Retrieved chunks with final_score and metadata
+        budget: Tokens available for context entries
+
+    Returns:
+        Tuple of (sections, report). sections maps "doc", "code" and "other"
+        to lists of formatted entries; report holds tokens used per section
+        and how many chunks were dropped as duplicates or for lack of budget.
+    """
+    sections = {name: [] for name in SECTIONS}
+    report = {name: 0 for name in SECTIONS}
+    report.update({"budget": budget, "duplicates": 0, "over_budget": 0, "truncated": 0})
+
+    selected_shingles = []
+    remaining = budget
+    ranked = sorted(context_chunks, key=lambda c: c.get("final_score", 0), reverse=True)
+
+    for chunk in ranked:
+        text_tokens = ENCODER.encode(chunk.get("text_chunk") or "")
+        shingles = _shingles(text_tokens)
+        if _is_duplicate(shingles, selected_shingles):
+            report["duplicates"] += 1
+            continue
+
+        entry = format_context_entry(chunk)
+        cost = count_tokens(entry)
+        if cost > remaining:
+            # Keep the head of an oversized chunk if a useful amount still fits
+            overhead = cost - len(text_tokens)
+            room = remaining - overhead
+            if room < MIN_TRUNCATED_TOKENS:
+                report["over_budget"] += 1
+                continue
+            entry = format_context_entry(chunk, ENCODER.decode(text_tokens[:room]))
+            cost = count_tokens(entry)
+            while cost > remaining:
+                # Decoding and re-encoding can merge tokens differently
+                room -= cost - remaining
+                entry = format_context_entry(chunk, ENCODER.decode(text_tokens[:room]))
+                cost = count_tokens(entry)
+            report["truncated"] += 1
+
+        section = chunk_section(chunk)
+        sections[section].append(entry)
+        report[section] += cost
+        remaining -= cost
+        selected_shingles.append(shingles)
+
+    report["total"] = budget - remaining
+    return sections, report
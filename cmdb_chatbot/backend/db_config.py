@@ -11,3 +11,16 @@ DB_USER = os.getenv("DB_USER", "postgres")
 DB_PSSWRD = os.getenv("DB_PASSWORD")  # Get from .env
 DB_PORT = int(os.getenv("DB_PORT", "5433"))
 SCHEMA = os.getenv("DB_SCHEMA", "general")
+
+# Connection pool configuration
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_CHECK_IDLE = float(os.getenv("DB_POOL_CHECK_IDLE", "30"))  # ping connections idle longer than this
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Slow query log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))  # statements slower than this are logged
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))  # share of slow SELECTs that get an EXPLAIN
+SLOW_QUERY_EXPLAINS_PER_MIN = int(os.getenv("SLOW_QUERY_EXPLAINS_PER_MIN", "6"))  # EXPLAIN ANALYZE budget per process
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "logs/slow_queries.jsonl")
@@ -1,32 +1,259 @@
 import re
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import Json
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import PoolError
 from .db_config import DB_HOST, DB_NAME, DB_PSSWRD, DB_PORT, DB_USER
 from .db_config import SCHEMA
+from .db_config import DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_CHECK_IDLE, DB_STATEMENT_TIMEOUT_MS
+from .metrics import timed, VECTOR_SEARCH_SECONDS, DB_POOL_WAIT_SECONDS, DB_POOL_TIMEOUTS
+from .query_log import InstrumentedCursor, slow_query_log
+from .manifests import package_aliases
 
 
 TABLE = f'{SCHEMA}.reposvectorial'
+METRICS_VIEW = f'{TABLE}_metrics_mv'
+LANGUAGES_VIEW = f'{TABLE}_languages_mv'
+ACTIVITY_TABLE = f'{TABLE}_activity'
+AUTHORS_TABLE = f'{TABLE}_authors'
+FILE_CHURN_TABLE = f'{TABLE}_file_churn'
+INGEST_STATE_TABLE = f'{TABLE}_ingest_state'
+DEPENDENCIES_TABLE = f'{TABLE}_dependencies'
+LANGUAGE_PROFILE_TABLE = f'{TABLE}_language_profile'
+REPO_EMBEDDINGS_TABLE = f'{TABLE}_repo_embeddings'
+# Every table ingestion writes per repo_name; a new per-repo table belongs here too
+REPO_TABLES = (TABLE, f'{TABLE}_chunks', ACTIVITY_TABLE, AUTHORS_TABLE, FILE_CHURN_TABLE,
+               INGEST_STATE_TABLE, DEPENDENCIES_TABLE, LANGUAGE_PROFILE_TABLE, REPO_EMBEDDINGS_TABLE)
+
+# Author names match whole words of a question: lowercased, other characters collapsed to one space
+_AUTHOR_NAME_KEY = "trim(regexp_replace(lower(author_name), '[^[:alnum:]]+', ' ', 'g'))"
+_NAME_WORD = re.compile(r"[^\W_]+")
+MAX_AUTHOR_NAME_WORDS = 4  # longest author name, in words, matched in a question
 
 # -------------------------------
 # Database helper functions
 # -------------------------------
+def _open_connection(cursor_factory=InstrumentedCursor):
+    return psycopg2.connect(
+        host=DB_HOST,
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PSSWRD,
+        port=DB_PORT,
+        options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+        cursor_factory=cursor_factory
+    )
+
+
+# EXPLAINs of slow queries run on a plain connection so they aren't timed themselves
+slow_query_log.connect = lambda: _open_connection(cursor_factory=psycopg2.extensions.cursor)
+
+
 def connect_db():
+    """Open a standalone connection. Application code should use db_cursor() instead."""
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PSSWRD,
-            port=DB_PORT
-        )
+        conn = _open_connection()
         cur = conn.cursor()
-        print("✅ Database connection successful!")
         return conn, cur
     except Exception as e:
         print("❌ Failed to connect to database:", e)
         raise e
 
 
+# -------------------------------
+# Connection pool
+# -------------------------------
+class ConnectionPool:
+    """
+    Thread-safe, blocking connection pool.
+
+    Holds between minconn and maxconn connections. Callers wait up to
+    `timeout` seconds for a free connection instead of failing immediately
+    like psycopg2's ThreadedConnectionPool. Connections that sat idle longer
+    than `check_idle` seconds are pinged on checkout and replaced if dead.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 check_idle=DB_POOL_CHECK_IDLE, connect=_open_connection):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.connect = connect
+        self.idle = deque()       # (connection, returned_at)
+        self.size = 0
+        self.cond = threading.Condition()
+        self.stats = {"checkouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+                      "timeouts": 0, "replaced": 0}
+
+        for _ in range(minconn):
+            self.idle.append((self.connect(), time.monotonic()))
+            self.size += 1
+
+    def _healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            create = False
+            with self.cond:
+                while not self.idle and self.size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        DB_POOL_TIMEOUTS.inc()
+                        raise PoolError(f"No database connection available after {self.timeout}s")
+                    self.cond.wait(remaining)
+                if self.idle:
+                    conn, returned_at = self.idle.pop()
+                else:
+                    self.size += 1
+                    create = True
+
+            if create:
+                try:
+                    conn = self.connect()
+                except Exception:
+                    with self.cond:
+                        self.size -= 1
+                        self.cond.notify()
+                    raise
+            elif not self._healthy(conn, returned_at):
+                self._discard(conn)
+                self.stats["replaced"] += 1
+                continue
+
+            waited = time.monotonic() - start
+            with self.cond:
+                self.stats["checkouts"] += 1
+                self.stats["wait_seconds_total"] += waited
+                self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], waited)
+            DB_POOL_WAIT_SECONDS.observe(waited)
+            return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self.cond:
+            self.size -= 1
+            self.cond.notify()
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                # Never hand out a connection with an open transaction
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed:
+            self._discard(conn)
+            return
+        with self.cond:
+            self.idle.append((conn, time.monotonic()))
+            self.cond.notify()
+
+    def closeall(self):
+        with self.cond:
+            while self.idle:
+                conn, _ = self.idle.pop()
+                conn.close()
+                self.size -= 1
+
+    def get_stats(self):
+        with self.cond:
+            return dict(self.stats, size=self.size, idle=len(self.idle),
+                        in_use=self.size - len(self.idle), max=self.maxconn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def close_pool():
+    """Close the pool's idle connections, e.g. in the gunicorn master before forking."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = None
+
+
+def forget_pool():
+    """
+    Drop the pool inherited from a parent process without closing its sockets.
+
+    Closing them in a forked worker would terminate the parent's sessions; the
+    worker opens its own connections on first use instead.
+    """
+    global _pool
+    _pool = None
+
+
+def get_pool_stats():
+    """Checkout count, wait time and size of the pool."""
+    return get_pool().get_stats()
+
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection; it is rolled back and returned on exit."""
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, discard=broken)
+
+
+@contextmanager
+def db_cursor(commit=False):
+    """
+    Borrow a pooled connection and yield a cursor on it.
+
+    Args:
+        commit: Commit the transaction when the block exits without error
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            yield cur
+            if commit:
+                conn.commit()
+        finally:
+            cur.close()
+
+
 
 
 def ensure_chunks_table_exists(cur):
@@ -52,6 +279,13 @@ def ensure_chunks_table_exists(cur):
             embedding vector(3072)
         );
     """)
+    # Two-level retrieval searches only the chunks of the best matching repos,
+    # and get_repo_version falls back to a repo's newest chunk
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS reposvectorial_chunks_repo_id
+        ON {TABLE}_chunks (repo_name, id DESC);
+    """)
+    cur.execute(f"DROP INDEX IF EXISTS {SCHEMA}.reposvectorial_chunks_repo_name;")
 
 
 
@@ -88,6 +322,487 @@ def ensure_table_exists(cur):
     """)
 
 
+def ensure_activity_table_exists(cur):
+    """
+    Weekly and monthly commit rollups per repo, written by ingestion.
+
+    The primary key serves per-repo reads; the (period, period_start) index
+    with included counts serves totals across repos as index-only scans.
+    """
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ACTIVITY_TABLE} (
+            repo_name TEXT NOT NULL,
+            period TEXT NOT NULL,
+            period_start DATE NOT NULL,
+            commits INT NOT NULL,
+            authors INT NOT NULL,
+            PRIMARY KEY (repo_name, period, period_start)
+        );
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS reposvectorial_activity_period
+        ON {ACTIVITY_TABLE} (period, period_start) INCLUDE (repo_name, commits, authors);
+    """)
+
+
+def ensure_authors_table_exists(cur):
+    """
+    Per-author contribution statistics per repo, written by ingestion.
+
+    The primary key serves lookups within a repo, the commits index serves
+    per-repo rankings, and the lower(author_email) and normalized name
+    indexes serve lookups across repos.
+    """
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {AUTHORS_TABLE} (
+            repo_name TEXT NOT NULL,
+            author_email TEXT NOT NULL,
+            author_name TEXT,
+            commits INT NOT NULL,
+            first_commit TIMESTAMPTZ,
+            last_commit TIMESTAMPTZ,
+            lines_added BIGINT NOT NULL DEFAULT 0,
+            lines_removed BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (repo_name, author_email)
+        );
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS reposvectorial_authors_commits
+        ON {AUTHORS_TABLE} (repo_name, commits DESC);
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS reposvectorial_authors_email
+        ON {AUTHORS_TABLE} (lower(author_email));
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS reposvectorial_authors_name
+        ON {AUTHORS_TABLE} ({_AUTHOR_NAME_KEY});
+    """)
+
+
+def ensure_file_churn_table_exists(cur):
+    """
+    Per-file change counts per repo, written by ingestion.
+
+    The partial index serves top-N hotspot reads over files that still
+    exist at HEAD.
+    """
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {FILE_CHURN_TABLE} (
+            repo_name TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            change_count INT NOT NULL,
+            lines_added BIGINT NOT NULL DEFAULT 0,
+            lines_removed BIGINT NOT NULL DEFAULT 0,
+            last_touched TIMESTAMPTZ,
+            in_head BOOLEAN NOT NULL DEFAULT TRUE,
+            PRIMARY KEY (repo_name, file_path)
+        );
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS reposvectorial_file_churn_hotspots
+        ON {FILE_CHURN_TABLE} (repo_name, change_count DESC) WHERE in_head;
+    """)
+
+
+def ensure_ingest_state_table_exists(cur):
+    """The HEAD each repo's history statistics were last computed at, for incremental ingestion."""
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {INGEST_STATE_TABLE} (
+            repo_name TEXT PRIMARY KEY,
+            head_commit TEXT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def ensure_dependencies_table_exists(cur):
+    """
+    Normalized dependency sets per repo, parsed from manifests by ingestion.
+
+    dependencies maps "ecosystem:name" to a version spec and aliases maps
+    short names of Maven and Go packages to those keys; the GIN indexes
+    serve "which repos use X" lookups with the ?| key operator.
+    """
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DEPENDENCIES_TABLE} (
+            repo_name TEXT PRIMARY KEY,
+            dependencies JSONB NOT NULL DEFAULT '{{}}'::jsonb,
+            manifests JSONB NOT NULL DEFAULT '[]'::jsonb,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS reposvectorial_dependencies_gin
+        ON {DEPENDENCIES_TABLE} USING GIN (dependencies);
+    """)
+    cur.execute(f"""
+        ALTER TABLE {DEPENDENCIES_TABLE} ADD COLUMN IF NOT EXISTS aliases JSONB NOT NULL DEFAULT '{{}}'::jsonb;
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS reposvectorial_dependencies_aliases_gin
+        ON {DEPENDENCIES_TABLE} USING GIN (aliases);
+    """)
+
+
+def ensure_language_profile_table_exists(cur):
+    """
+    Files, bytes and lines of code per language and repo, written by ingestion.
+
+    The language index serves "which repos use Go" across repos.
+    """
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LANGUAGE_PROFILE_TABLE} (
+            repo_name TEXT NOT NULL,
+            language TEXT NOT NULL,
+            files INT NOT NULL,
+            bytes BIGINT NOT NULL,
+            lines BIGINT NOT NULL,
+            PRIMARY KEY (repo_name, language)
+        );
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS reposvectorial_language_profile_language
+        ON {LANGUAGE_PROFILE_TABLE} (language) INCLUDE (repo_name, lines);
+    """)
+
+
+def ensure_repo_embeddings_table_exists(cur):
+    """
+    One centroid embedding per repo, the first level of two-level retrieval.
+
+    Written by ingestion; on creation it is filled from the newest
+    reposvectorial row of each repo, so existing repos rank before they
+    are re-ingested.
+    """
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {REPO_EMBEDDINGS_TABLE} (
+            repo_name TEXT PRIMARY KEY,
+            embedding vector(3072) NOT NULL,
+            chunk_count INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    # The one-time filter skips the scan of the base table once any row exists
+    cur.execute(f"""
+        INSERT INTO {REPO_EMBEDDINGS_TABLE} (repo_name, embedding)
+        SELECT DISTINCT ON (repo_name) repo_name, embedding
+        FROM {TABLE}
+        WHERE embedding IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {REPO_EMBEDDINGS_TABLE})
+        ORDER BY repo_name, id DESC
+        ON CONFLICT (repo_name) DO NOTHING;
+    """)
+
+
+def ensure_metrics_views_exist(cur):
+    """
+    Create the materialized views behind the analytics tab and the
+    aggregate question templates.
+
+    Both views only use the newest row of each repo, so re-ingested repos
+    are not counted twice. The unique indexes allow concurrent refreshes.
+    """
+    cur.execute(f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {METRICS_VIEW} AS
+        SELECT DISTINCT ON (repo_name)
+            repo_name, total_commits, files_count, last_commit_date
+        FROM {TABLE}
+        ORDER BY repo_name, id DESC;
+    """)
+    cur.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS reposvectorial_metrics_mv_repo
+        ON {METRICS_VIEW} (repo_name);
+    """)
+    # Rankings and activity windows of the aggregate question templates
+    for column in ("total_commits", "files_count", "last_commit_date"):
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS reposvectorial_metrics_mv_{column}
+            ON {METRICS_VIEW} ({column});
+        """)
+
+    cur.execute(f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {LANGUAGES_VIEW} AS
+        SELECT latest.repo_name, lang.key AS language, lang.value::int AS file_count
+        FROM (
+            SELECT DISTINCT ON (repo_name) repo_name, languages
+            FROM {TABLE}
+            ORDER BY repo_name, id DESC
+        ) latest,
+        jsonb_each_text(COALESCE(latest.languages, '{{}}'::jsonb)) AS lang;
+    """)
+    cur.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS reposvectorial_languages_mv_repo_lang
+        ON {LANGUAGES_VIEW} (repo_name, language);
+    """)
+
+
+def refresh_metrics_views(cur):
+    """Refresh the analytics views after ingestion without blocking readers."""
+    cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {METRICS_VIEW};")
+    cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {LANGUAGES_VIEW};")
+
+
+def replace_activity_rollups(cur, repo_name, rollups):
+    """Store a repo's rollups from compute_activity_rollups, replacing the previous ingestion's."""
+    cur.execute(f"DELETE FROM {ACTIVITY_TABLE} WHERE repo_name = %s", (repo_name,))
+    if rollups:
+        execute_values(cur, f"""
+            INSERT INTO {ACTIVITY_TABLE} (repo_name, period, period_start, commits, authors)
+            VALUES %s
+        """, [(repo_name, *rollup) for rollup in rollups])
+
+
+def get_activity_rollups(cur, repo_name, period="week", since=None):
+    """
+    A repo's rollups in date order.
+
+    Returns:
+        List of (period_start, commits, authors) tuples
+    """
+    cur.execute(f"""
+        SELECT period_start, commits, authors
+        FROM {ACTIVITY_TABLE}
+        WHERE repo_name = %s AND period = %s AND period_start >= COALESCE(%s, '-infinity'::date)
+        ORDER BY period_start
+    """, (repo_name, period, since))
+    return cur.fetchall()
+
+
+def get_ingested_head(cur, repo_name):
+    """HEAD commit of the repo's last ingestion, or None."""
+    cur.execute(f"SELECT head_commit FROM {INGEST_STATE_TABLE} WHERE repo_name = %s", (repo_name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def set_ingested_head(cur, repo_name, head_commit):
+    cur.execute(f"""
+        INSERT INTO {INGEST_STATE_TABLE} (repo_name, head_commit)
+        VALUES (%s, %s)
+        ON CONFLICT (repo_name) DO UPDATE SET head_commit = EXCLUDED.head_commit, updated_at = now()
+    """, (repo_name, head_commit))
+
+
+def store_author_stats(cur, repo_name, author_stats, incremental=False):
+    """
+    Store a repo's per-author statistics from scan_history.
+
+    A full scan replaces the previous ingestion's rows; an incremental one
+    adds the new commits onto them.
+    """
+    if not incremental:
+        cur.execute(f"DELETE FROM {AUTHORS_TABLE} WHERE repo_name = %s", (repo_name,))
+    if author_stats:
+        execute_values(cur, f"""
+            INSERT INTO {AUTHORS_TABLE} AS a
+            (repo_name, author_email, author_name, commits, first_commit, last_commit, lines_added, lines_removed)
+            VALUES %s
+            ON CONFLICT (repo_name, author_email) DO UPDATE SET
+                author_name = EXCLUDED.author_name,
+                commits = a.commits + EXCLUDED.commits,
+                first_commit = LEAST(a.first_commit, EXCLUDED.first_commit),
+                last_commit = GREATEST(a.last_commit, EXCLUDED.last_commit),
+                lines_added = a.lines_added + EXCLUDED.lines_added,
+                lines_removed = a.lines_removed + EXCLUDED.lines_removed
+        """, [(repo_name, a["author_email"], a["author_name"], a["commits"], a["first_commit"],
+               a["last_commit"], a["lines_added"], a["lines_removed"]) for a in author_stats])
+
+
+def store_file_churn(cur, repo_name, file_churn, files_at_head, incremental=False):
+    """
+    Store a repo's per-file churn from scan_history, like store_author_stats,
+    then flag which files still exist at HEAD.
+    """
+    if not incremental:
+        cur.execute(f"DELETE FROM {FILE_CHURN_TABLE} WHERE repo_name = %s", (repo_name,))
+    if file_churn:
+        execute_values(cur, f"""
+            INSERT INTO {FILE_CHURN_TABLE} AS f
+            (repo_name, file_path, change_count, lines_added, lines_removed, last_touched)
+            VALUES %s
+            ON CONFLICT (repo_name, file_path) DO UPDATE SET
+                change_count = f.change_count + EXCLUDED.change_count,
+                lines_added = f.lines_added + EXCLUDED.lines_added,
+                lines_removed = f.lines_removed + EXCLUDED.lines_removed,
+                last_touched = GREATEST(f.last_touched, EXCLUDED.last_touched)
+        """, [(repo_name, f["file_path"], f["change_count"], f["lines_added"], f["lines_removed"],
+               f["last_touched"]) for f in file_churn], page_size=1000)
+    cur.execute(f"""
+        UPDATE {FILE_CHURN_TABLE}
+        SET in_head = (file_path = ANY(%s))
+        WHERE repo_name = %s AND in_head IS DISTINCT FROM (file_path = ANY(%s))
+    """, (files_at_head, repo_name, files_at_head))
+
+
+def store_repo_embedding(cur, repo_name, embedding, chunk_count):
+    """Store a repo's centroid embedding, replacing the previous ingestion's."""
+    cur.execute(f"""
+        INSERT INTO {REPO_EMBEDDINGS_TABLE} (repo_name, embedding, chunk_count)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (repo_name) DO UPDATE SET
+            embedding = EXCLUDED.embedding,
+            chunk_count = EXCLUDED.chunk_count,
+            updated_at = now()
+    """, (repo_name, embedding, chunk_count))
+
+
+def replace_language_profile(cur, repo_name, profile):
+    """Store a repo's profile from profile_languages, replacing the previous ingestion's."""
+    cur.execute(f"DELETE FROM {LANGUAGE_PROFILE_TABLE} WHERE repo_name = %s", (repo_name,))
+    if profile:
+        execute_values(cur, f"""
+            INSERT INTO {LANGUAGE_PROFILE_TABLE} (repo_name, language, files, bytes, lines)
+            VALUES %s
+        """, [(repo_name, language, entry["files"], entry["bytes"], entry["lines"])
+              for language, entry in profile.items()])
+
+
+def get_language_profile(cur, repo_name):
+    """
+    A repo's languages, most lines first.
+
+    Returns:
+        List of (language, files, bytes, lines) tuples
+    """
+    cur.execute(f"""
+        SELECT language, files, bytes, lines
+        FROM {LANGUAGE_PROFILE_TABLE}
+        WHERE repo_name = %s
+        ORDER BY lines DESC
+    """, (repo_name,))
+    return cur.fetchall()
+
+
+def store_dependencies(cur, repo_name, dependencies, manifests):
+    """Store a repo's dependency set from extract_dependencies, replacing the previous one."""
+    cur.execute(f"""
+        INSERT INTO {DEPENDENCIES_TABLE} (repo_name, dependencies, manifests, aliases)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (repo_name) DO UPDATE SET
+            dependencies = EXCLUDED.dependencies,
+            manifests = EXCLUDED.manifests,
+            aliases = EXCLUDED.aliases,
+            updated_at = now()
+    """, (repo_name, Json(dependencies), Json(manifests), Json(package_aliases(dependencies))))
+
+
+def get_repo_dependencies(cur, repo_name):
+    """
+    Returns:
+        (dependencies, manifests) of a repo, or None if it has no stored set
+    """
+    cur.execute(f"SELECT dependencies, manifests FROM {DEPENDENCIES_TABLE} WHERE repo_name = %s", (repo_name,))
+    return cur.fetchone()
+
+
+def find_repos_using(cur, package_keys):
+    """
+    Repos depending on any of the given "ecosystem:name" keys, through the GIN indexes.
+
+    Keys also match Maven artifacts and Go modules by their short name.
+
+    Returns:
+        List of (repo_name, package_key, version) tuples
+    """
+    cur.execute(f"""
+        SELECT d.repo_name, dep.key, dep.value
+        FROM {DEPENDENCIES_TABLE} d, jsonb_each_text(d.dependencies) dep
+        WHERE (d.dependencies ?| %(keys)s OR d.aliases ?| %(keys)s)
+          AND (dep.key = ANY(%(keys)s)
+               OR EXISTS (SELECT 1 FROM unnest(%(keys)s::text[]) k WHERE (d.aliases -> k) ? dep.key))
+        ORDER BY d.repo_name, dep.key
+    """, {"keys": list(package_keys)})
+    return cur.fetchall()
+
+
+def get_file_hotspots(cur, repo_names=None, limit=10):
+    """
+    Files that still exist at HEAD with the most changes, in some repos or all of them.
+
+    Returns:
+        List of (repo_name, file_path, change_count, lines_added,
+        lines_removed, last_touched) tuples
+    """
+    cur.execute(f"""
+        SELECT repo_name, file_path, change_count, lines_added, lines_removed, last_touched
+        FROM {FILE_CHURN_TABLE}
+        WHERE in_head AND (%(repos)s IS NULL OR repo_name = ANY(%(repos)s))
+        ORDER BY change_count DESC, lines_added + lines_removed DESC
+        LIMIT %(limit)s
+    """, {"repos": repo_names, "limit": limit})
+    return cur.fetchall()
+
+
+# Authors are grouped by email, so across repos one row sums all their repos
+_AUTHOR_STATS_COLUMNS = """
+    author_email,
+    MAX(author_name),
+    SUM(commits),
+    MIN(first_commit),
+    MAX(last_commit),
+    SUM(lines_added),
+    SUM(lines_removed),
+    COUNT(*)
+"""
+
+
+def get_top_authors(cur, repo_name=None, limit=5):
+    """
+    Authors with the most commits in a repo, or across all repos when repo_name is None.
+
+    Returns:
+        List of (email, name, commits, first_commit, last_commit, lines_added,
+        lines_removed, repo_count, total_commits) tuples, where total_commits
+        counts every author in scope
+    """
+    cur.execute(f"""
+        SELECT {_AUTHOR_STATS_COLUMNS}, SUM(SUM(commits)) OVER ()
+        FROM {AUTHORS_TABLE}
+        WHERE %(repo)s IS NULL OR repo_name = %(repo)s
+        GROUP BY author_email
+        ORDER BY SUM(commits) DESC, author_email
+        LIMIT %(limit)s
+    """, {"repo": repo_name, "limit": limit})
+    return cur.fetchall()
+
+
+def count_authors(cur, repo_name=None):
+    """Distinct authors of a repo, or across all repos when repo_name is None."""
+    cur.execute(f"""
+        SELECT COUNT(DISTINCT author_email)
+        FROM {AUTHORS_TABLE}
+        WHERE %(repo)s IS NULL OR repo_name = %(repo)s
+    """, {"repo": repo_name})
+    return cur.fetchone()[0]
+
+
+def author_name_candidates(question):
+    """Word n-grams of a question in the form of _AUTHOR_NAME_KEY, so names only match whole words."""
+    words = _NAME_WORD.findall(question.lower())
+    grams = {" ".join(words[i:i + n]) for n in range(1, MAX_AUTHOR_NAME_WORDS + 1)
+             for i in range(len(words) - n + 1)}
+    return sorted(gram for gram in grams if len(gram) >= 3)
+
+
+def find_author_stats(cur, question, repo_name=None):
+    """
+    Statistics of the authors a question mentions by email or by name.
+
+    Returns:
+        The same tuples as get_top_authors without total_commits, most commits first
+    """
+    emails = [email.lower() for email in re.findall(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*", question)]
+    cur.execute(f"""
+        SELECT {_AUTHOR_STATS_COLUMNS}
+        FROM {AUTHORS_TABLE}
+        WHERE (%(repo)s IS NULL OR repo_name = %(repo)s)
+          AND (lower(author_email) = ANY(%(emails)s) OR {_AUTHOR_NAME_KEY} = ANY(%(names)s))
+        GROUP BY author_email
+        ORDER BY SUM(commits) DESC
+    """, {"repo": repo_name, "emails": emails, "names": author_name_candidates(question)})
+    return cur.fetchall()
+
+
 def insert_repo_metadata(cur, repo_info, embedding):
     """Insert a single repo's metadata into the table"""
     cur.execute(f"""
@@ -110,6 +825,11 @@ def insert_repo_metadata(cur, repo_info, embedding):
         embedding
     ))
 
+def delete_repo_chunks(cur, repo_name):
+    """Remove a repo's chunks before re-ingesting it, so stale chunks don't compete in retrieval."""
+    cur.execute(f"DELETE FROM {TABLE}_chunks WHERE repo_name = %s", (repo_name,))
+
+
 def insert_repo_chunk_embedding(cur, repo_name, commit_hash, commit_messages,chunk_index ,file_path, text_chunk, embedding):
     cur.execute(f"""
         INSERT INTO {TABLE}_chunks (
@@ -154,7 +874,8 @@ def insert_repo_metadata_with_embedding(cur, repo_info, embedding):
 # Query Functions
 # -------------------------------
 
-def query_similar_chunks(cur, query_embedding, top_k=5, similarity_threshold=0.8):
+@timed(VECTOR_SEARCH_SECONDS)
+def query_similar_chunks(cur, query_embedding, top_k=5, similarity_threshold=0.8, repo_names=None):
     """
     Query most similar chunks using enhanced ranking and filtering.
     
@@ -163,11 +884,15 @@ def query_similar_chunks(cur, query_embedding, top_k=5, similarity_threshold=0.8
         query_embedding: Vector embedding of the query
         top_k: Number of chunks to return
         similarity_threshold: Minimum similarity score (0-1) for chunks
+        repo_names: Optional list of repos to search; every chunk is scanned when omitted
     
     Returns:
         List of chunks with metadata and relevance scores
     """
     vector_literal = f"ARRAY{query_embedding}::vector"
+    repo_filter, repo_params = "", []
+    if repo_names is not None:
+        repo_filter, repo_params = "AND c.repo_name = ANY(%s)", [list(repo_names)]
     
     # Enhanced query with metadata and multiple ranking factors
     cur.execute(f"""
@@ -197,6 +922,7 @@ def query_similar_chunks(cur, query_embedding, top_k=5, similarity_threshold=0.8
                 
             FROM {TABLE}_chunks c
             WHERE 1 - (c.embedding <-> {vector_literal}) > %s
+            {repo_filter}
         )
         SELECT 
             id,
@@ -211,7 +937,7 @@ def query_similar_chunks(cur, query_embedding, top_k=5, similarity_threshold=0.8
         FROM ranked_chunks
         ORDER BY final_score DESC
         LIMIT %s;
-    """, (similarity_threshold, top_k))
+    """, (similarity_threshold, *repo_params, top_k))
 
     results = cur.fetchall()
     
@@ -236,6 +962,27 @@ def query_similar_chunks(cur, query_embedding, top_k=5, similarity_threshold=0.8
     ]
 
 
+def rank_similar_repos(cur, query_embedding, limit=5):
+    """
+    Repos whose repo-level embedding is closest to the query, best first.
+
+    Reads the one-row-per-repo centroid table, not reposvectorial. The
+    centroid is the mean of the repo's chunk embeddings, so it is compared by
+    cosine distance; a mean vector's length says nothing about relevance.
+
+    Returns:
+        List of repo names
+    """
+    vector_literal = f"ARRAY{query_embedding}::vector"
+    cur.execute(f"""
+        SELECT repo_name
+        FROM {REPO_EMBEDDINGS_TABLE}
+        ORDER BY embedding <=> {vector_literal}
+        LIMIT %s;
+    """, (limit,))
+    return [r[0] for r in cur.fetchall()]
+
+
 def get_all_commits(cur, repo_name):
     """
     Get all commit messages for a given repo.
@@ -256,6 +1003,45 @@ def get_all_commits(cur, repo_name):
             commits.append(row[0])
     return commits
 
+def get_repo_version(cur, repo_name):
+    """
+    Return an identifier of the last indexed state of a repo.
+
+    Combines the ingested HEAD with the time of the ingestion, read from the
+    repo's ingest state row, so it changes whenever the repo is re-ingested.
+    Repos ingested before ingest state existed use their newest chunk.
+    """
+    cur.execute(f"""
+        SELECT head_commit, extract(epoch FROM updated_at)
+        FROM {INGEST_STATE_TABLE}
+        WHERE repo_name = %s
+    """, (repo_name,))
+    row = cur.fetchone()
+    if row:
+        return f"{row[0]}@{row[1]:.6f}"
+
+    cur.execute(f"""
+        SELECT commit_hash, id
+        FROM {TABLE}_chunks
+        WHERE repo_name = %s
+        ORDER BY id DESC
+        LIMIT 1
+    """, (repo_name,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    return f"{row[0] or ''}@{row[1]}"
+
+def get_hot_repos(cur, limit=10):
+    """Most recently active repos, used to warm caches at startup."""
+    cur.execute(f"""
+        SELECT repo_name FROM {METRICS_VIEW}
+        ORDER BY last_commit_date DESC NULLS LAST, total_commits DESC
+        LIMIT %s
+    """, (limit,))
+    return [row[0] for row in cur.fetchall()]
+
+
 def get_all_repo_names(cur):
     """
     Return a list of all repo names in your main table.
@@ -1,14 +1,27 @@
 import os
-from git import Repo
-from collections import Counter
+from datetime import datetime, timedelta, timezone
+from git import Repo, GitCommandError
+from collections import Counter, defaultdict
+from .manifests import is_manifest_path, extract_dependencies
+from .language_profiler import profile_languages
 
 
 # -------------------------------
 # Git analysis functions
 # -------------------------------
-def analyze_repo(repo_path):
+def analyze_repo(repo_path, since_commit=None):
+    """
+    Collect a repo's metadata and history statistics.
+
+    Args:
+        repo_path: Path of the git checkout
+        since_commit: HEAD of the previous ingestion; when it is still an
+            ancestor of HEAD, author_stats and file_churn only cover the
+            newer commits and history_incremental is True
+    """
     repo = Repo(repo_path)
     commits = list(repo.iter_commits())
+    author_stats, file_churn, incremental = scan_history(repo, since_commit) if commits else ([], [], False)
     
     repo_info = {
         "repo_name": os.path.basename(repo_path),
@@ -21,7 +34,13 @@ def analyze_repo(repo_path):
         "last_commit_date": None,
         "languages": None,
         "files_count": 0,
-        "commit_messages": [c.message.strip() for c in commits]
+        "commit_hash": commits[0].hexsha if commits else "",
+        "commit_messages": [c.message.strip() for c in commits],
+        "activity_rollups": compute_activity_rollups(commits),
+        "author_stats": author_stats,
+        "file_churn": file_churn,
+        "files_at_head": [path for path in repo.git.ls_files("-z").split("\0") if path],
+        "history_incremental": incremental
     }
 
     # Most active contributor
@@ -34,8 +53,10 @@ def analyze_repo(repo_path):
         repo_info["first_commit_date"] = commits[-1].committed_datetime
         repo_info["last_commit_date"] = commits[0].committed_datetime
     
-    # Files and languages
+    # Files, languages, lines of code and dependency manifests
     file_extensions = Counter()
+    manifest_paths = []
+    relative_paths = []
     for root, _, files in os.walk(repo_path):
         if ".git" in root:
             continue
@@ -44,11 +65,113 @@ def analyze_repo(repo_path):
             ext = os.path.splitext(f)[-1]
             if ext:
                 file_extensions[ext] += 1
+            relative_path = os.path.relpath(os.path.join(root, f), repo_path)
+            relative_paths.append(relative_path)
+            if is_manifest_path(relative_path):
+                manifest_paths.append(relative_path)
     repo_info["languages"] = dict(file_extensions.most_common(5))
+    repo_info["language_profile"] = profile_languages(repo_path, relative_paths)
+    repo_info["dependencies"], repo_info["manifests"] = extract_dependencies(repo_path, manifest_paths)
     
     return repo_info
 
 
+def compute_activity_rollups(commits):
+    """
+    Weekly and monthly commit and author counts, in one pass over the history.
+
+    Weeks start on Monday and months on the 1st, both in UTC.
+
+    Returns:
+        List of (period, period_start, commits, authors) tuples where
+        period is "week" or "month"
+    """
+    buckets = defaultdict(lambda: [0, set()])
+    for commit in commits:
+        day = commit.committed_datetime.astimezone(timezone.utc).date()
+        for key in (("week", day - timedelta(days=day.weekday())), ("month", day.replace(day=1))):
+            bucket = buckets[key]
+            bucket[0] += 1
+            bucket[1].add(commit.author.email)
+
+    return [(period, start, count, len(authors))
+            for (period, start), (count, authors) in sorted(buckets.items())]
+
+
+def scan_history(repo, since_commit=None):
+    """
+    Per-author and per-file statistics from one streaming `git log --numstat` pass.
+
+    Only the commits after since_commit are read when it is an ancestor of
+    HEAD; after a force push or without it, the whole history is. Renames
+    count as a delete plus an add, merge commits count as commits but add no
+    lines, and binary files get a change but no lines.
+
+    Returns:
+        (author_stats, file_churn, incremental) where author_stats is a list of
+        dicts with author_email, author_name, commits, first_commit,
+        last_commit, lines_added and lines_removed, most commits first, and
+        file_churn a list of dicts with file_path, change_count, lines_added,
+        lines_removed and last_touched, most changes first
+    """
+    incremental = False
+    if since_commit:
+        try:
+            incremental = repo.is_ancestor(since_commit, "HEAD")
+        except GitCommandError:
+            pass  # unknown commit, e.g. history was rewritten and gc'd
+    revision = f"{since_commit}..HEAD" if incremental else "HEAD"
+
+    authors, files = {}, {}
+    author = committed = None
+    process = repo.git(c="core.quotepath=off").log(
+        revision, "--numstat", "--no-renames", "--format=%x1e%ae%x1f%an%x1f%ct", as_process=True)
+    for raw in process.stdout:
+        line = raw.decode("utf-8", "replace").rstrip("\n")
+        if line.startswith("\x1e"):
+            email, name, timestamp = line[1:].split("\x1f")
+            committed = datetime.fromtimestamp(int(timestamp), timezone.utc)
+            author = authors.get(email)
+            if author is None:
+                # History is newest first, so this keeps the latest spelling of the name
+                author = authors[email] = {
+                    "author_email": email, "author_name": name, "commits": 0,
+                    "first_commit": committed, "last_commit": committed,
+                    "lines_added": 0, "lines_removed": 0,
+                }
+            author["commits"] += 1
+            author["first_commit"] = min(author["first_commit"], committed)
+            author["last_commit"] = max(author["last_commit"], committed)
+        elif line and author is not None:
+            added, removed, path = line.split("\t", 2)
+            entry = files.get(path)
+            if entry is None:
+                entry = files[path] = {"file_path": path, "change_count": 0, "lines_added": 0,
+                                       "lines_removed": 0, "last_touched": committed}
+            entry["change_count"] += 1
+            entry["last_touched"] = max(entry["last_touched"], committed)
+            if added != "-":
+                added, removed = int(added), int(removed)
+                author["lines_added"] += added
+                author["lines_removed"] += removed
+                entry["lines_added"] += added
+                entry["lines_removed"] += removed
+    process.wait()
+
+    return (sorted(authors.values(), key=lambda a: a["commits"], reverse=True),
+            sorted(files.values(), key=lambda f: f["change_count"], reverse=True),
+            incremental)
+
+
+def format_language_shares(profile, limit=8):
+    """Language shares by lines of code from a language profile, e.g. "Go 91.2%, YAML 4.0%"."""
+    total = sum(entry["lines"] for entry in profile.values())
+    if not total:
+        return ""
+    return ', '.join(f"{language} {entry['lines'] / total * 100:.1f}%"
+                     for language, entry in list(profile.items())[:limit])
+
+
 def prepare_text_for_embedding(repo_info, max_commits=50):
     """
     Prepare a rich textual summary of a repository for embedding.
@@ -62,6 +185,7 @@ def prepare_text_for_embedding(repo_info, max_commits=50):
     """
     # Top 5 file types with counts
     top_file_types = ', '.join(f"{ext}({count})" for ext, count in repo_info.get('languages', {}).items())
+    language_lines = format_language_shares(repo_info.get('language_profile') or {})
     
     # Contributors info
     total_contributors = len(repo_info.get('contributors', []))
@@ -84,6 +208,7 @@ Total commits: {total_commits}
 First commit date: {first_commit}
 Last commit date: {last_commit}
 Top file types: {top_file_types}
+Languages by lines of code: {language_lines or 'N/A'}
 Total files: {repo_info.get('files_count', 0)}
 Recent commit messages: {recent_commits}
 """
@@ -1,52 +1,93 @@
 
 import os
+import time
 import numpy as np
 import pandas as pd
 from .git_utils import analyze_repo
-from .db_utils import connect_db, ensure_table_exists, insert_repo_metadata, insert_repo_metadata_with_embedding,insert_repo_chunk_embedding, ensure_chunks_table_exists
+from .db_utils import db_cursor, ensure_table_exists, insert_repo_metadata, insert_repo_metadata_with_embedding,insert_repo_chunk_embedding, ensure_chunks_table_exists
+from .db_utils import ensure_metrics_views_exist, refresh_metrics_views
+from .db_utils import ensure_activity_table_exists, replace_activity_rollups
+from .db_utils import ensure_authors_table_exists, ensure_file_churn_table_exists, ensure_ingest_state_table_exists
+from .db_utils import store_author_stats, store_file_churn, get_ingested_head, set_ingested_head, delete_repo_chunks
+from .db_utils import ensure_dependencies_table_exists, store_dependencies
+from .db_utils import ensure_language_profile_table_exists, replace_language_profile
+from .db_utils import ensure_repo_embeddings_table_exists, store_repo_embedding
 from .ai_utils import embed_large_text, get_embedding, answer_question, store_chunks_in_db
+from .repo_index import refresh_repo_index
+from .answer_cache import answer_cache
+from .shared_cache import shared_cache, METRICS_VIEWS_VERSION_KEY
 
 
 
 def analyze_repos(base_folder):
     data = []
-    conn, cur = connect_db()
-    ensure_table_exists(cur)
-    ensure_chunks_table_exists(cur)
-
-    for name in os.listdir(base_folder):
-        path = os.path.join(base_folder, name)
-        if os.path.isdir(path) and os.path.exists(os.path.join(path, ".git")):
-            print(f"Analyzing {name}...")
-            repo_info = analyze_repo(path)
-
-
-            # Get chunked embeddings
-            embeddings_data = embed_large_text(repo_info)
-
-
-            embedding = np.mean([chunk["embedding"]for chunk in embeddings_data], axis=0)
-            embedding_list = embedding.tolist()
-
-            # Insert metadata & embeddings into Postgres
-            insert_repo_metadata(cur, repo_info, embedding_list)
-            for chunk_data in embeddings_data:
-                insert_repo_chunk_embedding(
-                    cur=cur,
-                    repo_name=repo_info["repo_name"],  # ✅ use the repo_info, not chunk_data
-                    commit_hash=repo_info.get("commit_hash",""),
-                    commit_messages=repo_info.get("commit_messages",""),  # ✅ add commit message
-                    chunk_index=chunk_data["chunk_index"],
-                    file_path=chunk_data.get("file_path",""),
-                    text_chunk=chunk_data["text_chunk"],
-                    embedding=chunk_data["embedding"]
-                    )
+    with db_cursor(commit=True) as cur:
+        ensure_table_exists(cur)
+        ensure_chunks_table_exists(cur)
+        ensure_metrics_views_exist(cur)
+        ensure_activity_table_exists(cur)
+        ensure_authors_table_exists(cur)
+        ensure_file_churn_table_exists(cur)
+        ensure_ingest_state_table_exists(cur)
+        ensure_dependencies_table_exists(cur)
+        ensure_language_profile_table_exists(cur)
+        ensure_repo_embeddings_table_exists(cur)
+
+        for name in os.listdir(base_folder):
+            path = os.path.join(base_folder, name)
+            if os.path.isdir(path) and os.path.exists(os.path.join(path, ".git")):
+                print(f"Analyzing {name}...")
+                # History statistics only scan the commits since the last ingestion
+                repo_info = analyze_repo(path, since_commit=get_ingested_head(cur, name))
+
+
+                # Get chunked embeddings
+                embeddings_data = embed_large_text(repo_info)
+
+
+                embedding = np.mean([chunk["embedding"]for chunk in embeddings_data], axis=0)
+                embedding_list = embedding.tolist()
+
+                # Insert metadata & embeddings into Postgres
+                insert_repo_metadata(cur, repo_info, embedding_list)
+                # First level of two-level retrieval ranks repos by this centroid
+                store_repo_embedding(cur, repo_info["repo_name"], embedding_list, len(embeddings_data))
+                delete_repo_chunks(cur, repo_info["repo_name"])
+                for chunk_data in embeddings_data:
+                    insert_repo_chunk_embedding(
+                        cur=cur,
+                        repo_name=repo_info["repo_name"],  # ✅ use the repo_info, not chunk_data
+                        commit_hash=repo_info.get("commit_hash",""),
+                        commit_messages=repo_info.get("commit_messages",""),  # ✅ add commit message
+                        chunk_index=chunk_data["chunk_index"],
+                        file_path=chunk_data.get("file_path",""),
+                        text_chunk=chunk_data["text_chunk"],
+                        embedding=chunk_data["embedding"]
+                        )
+
+                # History statistics behind trend, author and hotspot questions; kept out of the CSV
+                replace_activity_rollups(cur, repo_info["repo_name"], repo_info.pop("activity_rollups"))
+                incremental = repo_info.pop("history_incremental")
+                store_author_stats(cur, repo_info["repo_name"], repo_info.pop("author_stats"), incremental)
+                store_file_churn(cur, repo_info["repo_name"], repo_info.pop("file_churn"),
+                                 repo_info.pop("files_at_head"), incremental)
+                set_ingested_head(cur, repo_info["repo_name"], repo_info["commit_hash"])
+                store_dependencies(cur, repo_info["repo_name"], repo_info.pop("dependencies"),
+                                   repo_info.pop("manifests"))
+                replace_language_profile(cur, repo_info["repo_name"], repo_info.pop("language_profile"))
             
-            data.append(repo_info)
+                # Answers computed from the previous ingestion are stale now
+                answer_cache.invalidate_repo(repo_info["repo_name"])
+                data.append(repo_info)
+
+        # Analytics read the materialized views, not the base table
+        refresh_metrics_views(cur)
+
+        # New names become resolvable without waiting for the index TTL
+        refresh_repo_index(cur=cur)
 
-    conn.commit()
-    cur.close()
-    conn.close()
+    # Once committed, dashboard figures every worker memoized are rebuilt from the refreshed views
+    shared_cache.set("versions", METRICS_VIEWS_VERSION_KEY, time.time())
 
     # Save CSV
     df = pd.DataFrame(data)
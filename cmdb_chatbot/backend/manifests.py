@@ -0,0 +1,314 @@
+import os
+import re
+import json
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+import xml.etree.ElementTree as ET
+from fnmatch import fnmatch
+from functools import lru_cache
+
+MAX_MANIFEST_BYTES = 2 * 1024 * 1024  # larger files are skipped, they are generated or vendored
+SKIP_DIRS = {"node_modules", "vendor", "venv", ".venv", "site-packages", "bower_components", "third_party"}
+
+# -------------------------------
+# Parser registry
+# -------------------------------
+MANIFEST_PARSERS = []  # (file name pattern, ecosystem, parser), first match wins
+
+
+def manifest_parser(ecosystem, *patterns):
+    """
+    Register a function that parses a manifest's text into (name, version) pairs.
+
+    Args:
+        ecosystem: Package ecosystem the names belong to, e.g. "pypi"
+        patterns: File name patterns (fnmatch) the parser handles
+    """
+    def register(func):
+        for pattern in patterns:
+            MANIFEST_PARSERS.append((pattern, ecosystem, func))
+        return func
+    return register
+
+
+@lru_cache(maxsize=4096)
+def find_manifest_parser(filename):
+    """(ecosystem, parser) for a file name, or None if it isn't a known manifest."""
+    # Cached because ingestion asks for every file of every repo; parsers register at import
+    for pattern, ecosystem, parser in MANIFEST_PARSERS:
+        if fnmatch(filename, pattern):
+            return ecosystem, parser
+    return None
+
+
+def is_manifest_path(relative_path):
+    """Whether a repo file is a manifest of the repo itself rather than of vendored code."""
+    parts = relative_path.split(os.sep)
+    return find_manifest_parser(parts[-1]) is not None and not SKIP_DIRS.intersection(parts[:-1])
+
+
+# -------------------------------
+# Package names
+# -------------------------------
+def normalize_package(ecosystem, name):
+    """Canonical package name, so spellings from different manifests share one key."""
+    name = name.strip()
+    if ecosystem == "pypi":
+        return re.sub(r"[-_.]+", "-", name).lower()  # PEP 503
+    if ecosystem in ("npm", "cargo", "rubygems", "composer"):
+        return name.lower()
+    return name  # maven group:artifact and go module paths are case sensitive
+
+
+def package_key(ecosystem, name):
+    return f"{ecosystem}:{normalize_package(ecosystem, name)}"
+
+
+_GO_MAJOR_VERSION = re.compile(r"^v\d+$")
+
+
+def artifact_name(ecosystem, name):
+    """
+    Short name of a qualified package, or None when the name is already short.
+
+    Maven "group:artifact" gives the artifact and Go module paths their last
+    segment, skipping a /vN major version suffix.
+    """
+    if ecosystem == "maven" and ":" in name:
+        return name.rsplit(":", 1)[1]
+    if ecosystem == "go" and "/" in name:
+        segments = name.rstrip("/").split("/")
+        if len(segments) > 1 and _GO_MAJOR_VERSION.match(segments[-1]):
+            segments.pop()
+        return segments[-1]
+    return None
+
+
+def package_aliases(dependencies):
+    """
+    Map the "ecosystem:short name" of qualified dependencies to their stored keys.
+
+    Lets "which repos use junit" or "use gin" find "maven:junit:junit" and
+    "go:github.com/gin-gonic/gin" without the full name.
+    """
+    aliases = {}
+    for key in dependencies:
+        ecosystem, name = key.split(":", 1)
+        short = artifact_name(ecosystem, name)
+        if short:
+            aliases.setdefault(package_key(ecosystem, short), []).append(key)
+    return aliases
+
+
+def candidate_keys(name):
+    """Keys a bare package name could be stored under, one per ecosystem."""
+    ecosystems = sorted({ecosystem for _, ecosystem, _ in MANIFEST_PARSERS})
+    return [package_key(ecosystem, name) for ecosystem in ecosystems]
+
+
+# -------------------------------
+# Python
+# -------------------------------
+_PEP508 = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*([^;]*)")
+
+
+def _parse_requirement(line):
+    match = _PEP508.match(line)
+    if not match:
+        return None
+    spec = match.group(2).strip()
+    return match.group(1), "" if spec.startswith("@") else spec
+
+
+@manifest_parser("pypi", "requirements*.txt", "requirements*.in")
+def parse_requirements(text):
+    for line in text.splitlines():
+        line = line.split(" #", 1)[0].strip()
+        if not line or line.startswith(("#", "-")) or "://" in line:
+            continue  # comments, pip options (-r, -e, --index-url) and bare URLs
+        requirement = _parse_requirement(line)
+        if requirement:
+            yield requirement
+
+
+def _poetry_version(value):
+    return value if isinstance(value, str) else value.get("version", "") if isinstance(value, dict) else ""
+
+
+@manifest_parser("pypi", "pyproject.toml")
+def parse_pyproject(text):
+    data = tomllib.loads(text)
+    project = data.get("project", {})
+    requirements = list(project.get("dependencies", []))
+    for group in project.get("optional-dependencies", {}).values():
+        requirements.extend(group)
+    for group in data.get("dependency-groups", {}).values():
+        requirements.extend(item for item in group if isinstance(item, str))
+    for requirement in map(_parse_requirement, requirements):
+        if requirement:
+            yield requirement
+
+    poetry = data.get("tool", {}).get("poetry", {})
+    tables = [poetry.get("dependencies", {}), poetry.get("dev-dependencies", {})]
+    tables += [group.get("dependencies", {}) for group in poetry.get("group", {}).values()]
+    for table in tables:
+        for name, value in table.items():
+            if name.lower() != "python":
+                yield name, _poetry_version(value)
+
+
+@manifest_parser("pypi", "Pipfile")
+def parse_pipfile(text):
+    data = tomllib.loads(text)
+    for section in ("packages", "dev-packages"):
+        for name, value in data.get(section, {}).items():
+            version = _poetry_version(value)
+            yield name, "" if version == "*" else version
+
+
+# -------------------------------
+# JavaScript and PHP
+# -------------------------------
+@manifest_parser("npm", "package.json")
+def parse_package_json(text):
+    data = json.loads(text)
+    for section in ("dependencies", "devDependencies", "peerDependencies", "optionalDependencies"):
+        for name, version in (data.get(section) or {}).items():
+            yield name, str(version)
+
+
+@manifest_parser("composer", "composer.json")
+def parse_composer_json(text):
+    data = json.loads(text)
+    for section in ("require", "require-dev"):
+        for name, version in (data.get(section) or {}).items():
+            if name != "php" and not name.startswith("ext-"):  # platform requirements
+                yield name, str(version)
+
+
+# -------------------------------
+# JVM
+# -------------------------------
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(element, name):
+    for child in element:
+        if _local(child.tag) == name:
+            return (child.text or "").strip()
+    return ""
+
+
+@manifest_parser("maven", "pom.xml")
+def parse_pom(text):
+    root = ET.fromstring(text)
+    properties = {"project.version": _child_text(root, "version")}
+    for element in root:
+        if _local(element.tag) == "properties":
+            properties.update({_local(prop.tag): (prop.text or "").strip() for prop in element})
+
+    def resolve(value):
+        return re.sub(r"\$\{([^}]+)\}", lambda m: properties.get(m.group(1), m.group(0)), value)
+
+    for element in root.iter():
+        if _local(element.tag) != "dependency":
+            continue
+        group, artifact = _child_text(element, "groupId"), _child_text(element, "artifactId")
+        if group and artifact:
+            yield f"{resolve(group)}:{resolve(artifact)}", resolve(_child_text(element, "version"))
+
+
+_GRADLE_DEPENDENCY = re.compile(
+    r"""\b(?:implementation|api|compile|compileOnly|runtimeOnly|testImplementation|testCompile|"""
+    r"""testRuntimeOnly|annotationProcessor|kapt)\s*\(?\s*['"]([^:'"\s]+):([^:'"\s]+)(?::([^'"\s]+))?['"]""")
+
+
+@manifest_parser("maven", "build.gradle", "build.gradle.kts")
+def parse_gradle(text):
+    for group, artifact, version in _GRADLE_DEPENDENCY.findall(text):
+        yield f"{group}:{artifact}", version
+
+
+# -------------------------------
+# Go, Rust and Ruby
+# -------------------------------
+@manifest_parser("go", "go.mod")
+def parse_go_mod(text):
+    in_block = False
+    for line in text.splitlines():
+        line = line.split("//", 1)[0].strip()
+        if line.startswith("require ("):
+            in_block = True
+            continue
+        if in_block and line == ")":
+            in_block = False
+            continue
+        if line.startswith("require "):
+            line = line[len("require "):]
+        elif not in_block:
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            yield parts[0], parts[1]
+
+
+@manifest_parser("cargo", "Cargo.toml")
+def parse_cargo_toml(text):
+    data = tomllib.loads(text)
+    tables = [data]
+    tables += [target for target in data.get("target", {}).values() if isinstance(target, dict)]
+    for table in tables:
+        for section in ("dependencies", "dev-dependencies", "build-dependencies"):
+            for name, value in table.get(section, {}).items():
+                if isinstance(value, dict):
+                    name = value.get("package", name)  # renamed dependency
+                yield name, _poetry_version(value)
+
+
+_GEM = re.compile(r"""^\s*gem\s+['"]([^'"]+)['"](?:\s*,\s*['"]([^'"]+)['"])?""", re.M)
+
+
+@manifest_parser("rubygems", "Gemfile")
+def parse_gemfile(text):
+    for name, version in _GEM.findall(text):
+        yield name, version
+
+
+# -------------------------------
+# Extraction
+# -------------------------------
+def extract_dependencies(repo_path, manifest_paths):
+    """
+    Parse a repo's manifests into one normalized dependency set.
+
+    Args:
+        repo_path: Path of the checkout
+        manifest_paths: Manifest paths relative to repo_path, see is_manifest_path
+
+    Returns:
+        (dependencies, manifests): dependencies maps "ecosystem:name" to a
+        version spec ("" when unpinned), with manifests closest to the repo
+        root winning; manifests lists the files that parsed
+    """
+    dependencies, manifests = {}, []
+    for relative_path in sorted(manifest_paths, key=lambda p: (p.count(os.sep), p)):
+        path = os.path.join(repo_path, relative_path)
+        ecosystem, parser = find_manifest_parser(os.path.basename(relative_path))
+        try:
+            if os.path.getsize(path) > MAX_MANIFEST_BYTES:
+                continue
+            with open(path, encoding="utf-8", errors="replace") as f:
+                packages = list(parser(f.read()))
+        except Exception as e:
+            print(f"⚠️ Could not parse {relative_path}:", e)
+            continue
+
+        manifests.append(relative_path)
+        for name, version in packages:
+            key = package_key(ecosystem, name)
+            if not dependencies.get(key):
+                dependencies[key] = (version or "").strip()
+    return dependencies, manifests
@@ -0,0 +1,105 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (Counter, Histogram, CollectorRegistry, REGISTRY,
+                               generate_latest, CONTENT_TYPE_LATEST)
+from prometheus_client import multiprocess
+
+# -------------------------------
+# Prometheus metrics
+# -------------------------------
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR makes every worker write its
+# samples to that folder and /metrics aggregates them (see gunicorn.conf.py).
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Seconds; covers fast cache lookups up to slow chat completions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+QA_STAGE_SECONDS = Histogram(
+    "cmdb_qa_stage_seconds", "Time spent in each stage of answering a question",
+    ["stage", "repo", "intent"], buckets=LATENCY_BUCKETS)
+QA_ANSWER_SECONDS = Histogram(
+    "cmdb_qa_answer_seconds", "End-to-end time to answer a question",
+    ["repo", "intent", "outcome"], buckets=LATENCY_BUCKETS)
+QA_ERRORS = Counter(
+    "cmdb_qa_errors_total", "Failed pipeline stages", ["stage"])
+
+LLM_TOKENS = Counter(
+    "cmdb_llm_tokens_total", "Tokens sent to and received from the chat model",
+    ["kind", "repo"])
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "cmdb_llm_first_token_seconds", "Time from sending a streamed completion to its first token",
+    buckets=LATENCY_BUCKETS)
+
+CACHE_REQUESTS = Counter(
+    "cmdb_cache_requests_total", "Cache lookups by cache and result",
+    ["cache", "result"])
+
+EMBED_SECONDS = Histogram(
+    "cmdb_embed_large_text_seconds", "Time to chunk and embed one repo during ingestion",
+    buckets=LATENCY_BUCKETS)
+EMBED_CHUNKS = Counter(
+    "cmdb_embedded_chunks_total", "Chunks embedded during ingestion")
+
+VECTOR_SEARCH_SECONDS = Histogram(
+    "cmdb_vector_search_seconds", "Time of query_similar_chunks", buckets=LATENCY_BUCKETS)
+
+DB_STATEMENT_SECONDS = Histogram(
+    "cmdb_db_statement_seconds", "Duration of SQL statements by normalized query fingerprint",
+    ["fingerprint"], buckets=LATENCY_BUCKETS)
+DB_STATEMENT_ROWS = Histogram(
+    "cmdb_db_statement_rows", "Rows returned or affected by SQL statements",
+    ["fingerprint"], buckets=(0, 1, 10, 100, 1000, 10_000, 100_000))
+DB_SLOW_STATEMENTS = Counter(
+    "cmdb_db_slow_statements_total", "Statements slower than SLOW_QUERY_MS", ["fingerprint"])
+
+DB_POOL_WAIT_SECONDS = Histogram(
+    "cmdb_db_pool_wait_seconds", "Time waited to check out a pooled database connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+DB_POOL_TIMEOUTS = Counter(
+    "cmdb_db_pool_timeouts_total", "Checkouts that found no free connection within DB_POOL_TIMEOUT")
+
+DASHBOARD_SECONDS = Histogram(
+    "cmdb_dashboard_figures_seconds", "Time to build the analytics figures on a cache miss",
+    buckets=LATENCY_BUCKETS)
+
+
+@contextmanager
+def timed(histogram, error_stage=None, **labels):
+    """
+    Observe the duration of the block on histogram.
+
+    Args:
+        histogram: Histogram to observe
+        error_stage: When set, exceptions raised by the block increment QA_ERRORS
+        **labels: Label values of the histogram
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if error_stage:
+            QA_ERRORS.labels(stage=error_stage).inc()
+        raise
+    finally:
+        metric = histogram.labels(**labels) if labels else histogram
+        metric.observe(time.perf_counter() - start)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render_metrics():
+    """
+    Current metrics in the Prometheus text format.
+
+    Returns:
+        Tuple of (payload bytes, content type)
+    """
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,8 +1,43 @@
+import re
+
 # -------------------------------
 # Intent extraction
 # -------------------------------
+_PEOPLE = r"(?:contributors|authors|committers|developers)"
+# "top 5 contributors" is a ranking whatever else the question says; "how many contributors" is a count
+_TOP_N_PEOPLE = re.compile(rf"\btop\s+\d+\s+{_PEOPLE}\b|\b\d+\s+(?:most active|biggest|top)\s+{_PEOPLE}\b")
+_PEOPLE_COUNT = re.compile(rf"\b(?:how many|number of|count of)\s+(?:\w+\s+)?{_PEOPLE}\b")
+
+
+def asks_contributor_count(question):
+    return bool(_PEOPLE_COUNT.search(question.lower()))
+
+
 def extract_intent(question):
     patterns = {
+        'contribution_trend': [
+            'contribution trend', 'commit trend', 'activity trend',
+            'commit history', 'contribution history','how active is development',
+            'show me development activity',
+            'tell me about commit patterns',
+            'development timeline',
+            'project activity',
+            'how often are commits made',
+            'frequency of updates',
+            'development progress',
+            'velocity', 'commits per week', 'commits per month', 'weekly commits', 'monthly commits'
+        ],
+        'hotspots': [
+            'hotspot', 'hot spot', 'churn', 'change most', 'changed most', 'changes most',
+            'most changed', 'most modified', 'most edited', 'frequently changed',
+            'changed the most', 'modified the most', 'files change', 'touched most'
+        ],
+        # Before commit_count so "how many commits did alice make" is about alice
+        'author_stats': [
+            'commits did', 'commits by', 'commits from', 'lines did',
+            'contributions of', 'contributions by', 'contributions from',
+            'how much did', 'stats for', 'statistics for'
+        ],
         'commit_count': [
             'how many commits', 'total commits', 'number of commits',
             'commit count', 'commits are there','tell me the commits', 'show me commit count'
@@ -12,7 +47,9 @@ def extract_intent(question):
         'most_active': [
             'most commits', 'top contributor', 'who contributed most',
             'most active', 'who made the most', 'who has contributed','biggest contributor',
-            'primary contributor', 'main developer', 'who leads the development','who wrote the most amount of codes'
+            'primary contributor', 'main developer', 'who leads the development','who wrote the most amount of codes',
+            'top authors', 'top committers', 'leaderboard', 'rank contributors', 'list contributors', 'list committers',
+            'list the contributors', 'show contributors', 'show the contributors'
         ],
         'languages': [
             'what languages', 'programming languages', 'tech stack',
@@ -29,6 +66,12 @@ def extract_intent(question):
             'what files', 'show files', 'list files',
             'what documents', 'file structure', 'repository contents'
         ],
+        # Before version so package names like "django-taggit" aren't version questions
+        'dependencies': [
+            'dependencies', 'dependency', 'packages', 'libraries', 'frameworks',
+            'repos use', 'repositories use', 'repos that use', 'repositories that use', 'repos using', 'repositories using',
+            'depend on', 'depends on', 'depending on'
+        ],
         'version': [
             'version', 'release', 'tag', 'tagged version','what version is it',
             'tell me about versions',
@@ -39,20 +82,6 @@ def extract_intent(question):
             'release history',
             'version information'
         ],
-        'dependencies': [ #not yet
-            'dependencies', 'packages', 'libraries', 'frameworks'
-        ],
-        'contribution_trend': [
-            'contribution trend', 'commit trend', 'activity trend',
-            'commit history', 'contribution history','how active is development',
-            'show me development activity',
-            'tell me about commit patterns',
-            'development timeline',
-            'project activity',
-            'how often are commits made',
-            'frequency of updates',
-            'development progress'
-        ],
         'last_commit': [
             'last commit', 'recent commit', 'latest commit',
             'most recent change'
@@ -60,7 +89,50 @@ def extract_intent(question):
     }
     
     question = question.lower()
-    for intent, phrases in patterns.items():
-        if any(phrase in question for phrase in phrases):
-            return intent
-    return None
+    if _PEOPLE_COUNT.search(question):
+        return 'commit_count'
+    if _TOP_N_PEOPLE.search(question):
+        return 'most_active'
+    intent = next((intent for intent, phrases in patterns.items()
+                   if any(phrase in question for phrase in phrases)), None)
+    # Time windows only make a trend question when nothing more specific matched;
+    # "how many commits last month" is one, "most active contributor last month" isn't
+    if intent in (None, 'commit_count') and any(phrase in question for phrase in TREND_WINDOW_PHRASES):
+        return 'contribution_trend'
+    return intent
+
+
+TREND_WINDOW_PHRASES = ['trend', 'per week', 'per month', 'weekly', 'monthly', 'last week',
+                        'last month', 'last quarter', 'this quarter', 'last year']
+
+
+ALL_REPOS_PHRASES = ['all repos', 'all repositories', 'across repos', 'across repositories',
+                     'every repo', 'any repo', 'overall', 'organization', 'company-wide']
+
+
+def mentions_all_repos(question):
+    """Whether a question is about every repo rather than the one it resolved to."""
+    question = question.lower()
+    return any(phrase in question for phrase in ALL_REPOS_PHRASES)
+
+
+_PACKAGE_QUESTION = re.compile(
+    r"\b(?:uses?|using|depends? on|depending on|requires?|requiring|imports?)\s+"
+    r"(?:the\s+)?(?:package\s+|library\s+|module\s+)?[`'\"]?([\w@][\w.@/:+-]*)")
+
+
+def extract_package_name(question):
+    """The package in "which repos use X" style questions, or None."""
+    match = _PACKAGE_QUESTION.search(question)
+    if not match:
+        return None
+    name = match.group(1).rstrip(".:")
+    return None if name.lower() in ('it', 'this', 'that', 'them', 'what', 'which') else name
+
+
+def extract_top_n(question, default=5, maximum=50):
+    """The N of "top N" / "N most active", capped at maximum."""
+    match = re.search(r'\btop\s+(\d+)\b|\b(\d+)\s+(?:most|top|biggest)\b', question.lower())
+    if not match:
+        return default
+    return max(1, min(int(match.group(1) or match.group(2)), maximum))
@@ -1,10 +1,33 @@
-from .db_utils import connect_db, query_similar_chunks, get_all_repo_names ,TABLE
-from .ai_utils import get_embedding, API_KEY, BASE_URL, CHAT_MODEL
+from .db_utils import db_cursor, query_similar_chunks, rank_similar_repos, get_repo_version, get_activity_rollups ,TABLE
+from .db_utils import get_top_authors, find_author_stats, count_authors, get_file_hotspots
+from .db_utils import get_repo_dependencies, find_repos_using, get_language_profile
+from .manifests import candidate_keys
+from .aggregate_queries import parse_aggregate_question, run_aggregate_query
+from .ai_utils import get_question_embedding, stream_chat_completion, AnswerCancelled, API_KEY, BASE_URL, CHAT_MODEL
+from .repo_index import RepoNameIndex, get_repo_index
+from .answer_cache import answer_cache, label_cached, normalize_question
+from .single_flight import SingleFlight
+from .shared_cache import shared_cache, make_key
+from concurrent.futures import ThreadPoolExecutor
+from .context_packer import pack_context, count_tokens, PROMPT_TOKEN_BUDGET
+from .metrics import record_cache, QA_STAGE_SECONDS, QA_ANSWER_SECONDS, QA_ERRORS, LLM_TOKENS, LLM_FIRST_TOKEN_SECONDS
+import os
+import time
+import logging
 import re
+import asyncio
+from datetime import date, timedelta
+import functools
 import requests
 import json
-from difflib import get_close_matches 
-from .nlp_utils import extract_intent as nlp_extract_intent
+from .nlp_utils import extract_intent as nlp_extract_intent, mentions_all_repos, extract_top_n, extract_package_name
+from .nlp_utils import asks_contributor_count
+
+logger = logging.getLogger("cmdb_chatbot.qa")
+
+MAX_LISTED_DEPENDENCIES = 50  # per ecosystem in dependency answers
+TWO_LEVEL_REPOS = int(os.getenv("TWO_LEVEL_REPOS", "5"))  # repos searched for questions naming none; 0 searches every chunk
+AI_ERROR_MESSAGE = "I apologize, but I encountered an error while processing your question. Please try again."
 
 def extract_intent(question):
     return nlp_extract_intent(question)
@@ -12,25 +35,108 @@ def extract_intent(question):
 # -------------------------------
 # Repo name extraction with fallback
 # -------------------------------
-def extract_repo_name(question, known_repos=None):
-    if known_repos is None:
-        known_repos = get_all_repo_names()  # Fetch from DB
-    
-    match = re.search(r"in repo (\S+)", question.lower())
-    if match:
-        repo_candidate = match.group(1)
-        if repo_candidate in known_repos:
-            return repo_candidate
+def extract_repo_name(question, known_repos=None, cur=None):
+    """
+    Resolve the repo a question refers to using the prebuilt name index.
+
+    Args:
+        question: The user's question
+        known_repos: Optional explicit list of candidate names
+        cur: Optional cursor used if the shared index has to be (re)built
+    """
+    named = find_repo_mention(question, known_repos, cur)
+    if named:
+        return named
+
+    index = RepoNameIndex(known_repos) if known_repos is not None else get_repo_index(cur)
+    return index.names[0] if len(index) else "default_repo_name"
+
+
+def find_repo_mention(question, known_repos=None, cur=None):
+    """The repo a question names, or None when it names none."""
+    index = RepoNameIndex(known_repos) if known_repos is not None else get_repo_index(cur)
+    candidates = index.search(question, limit=1)
+    return candidates[0][0] if candidates else None
+
+# -------------------------------
+# Activity trend from rollups
+# -------------------------------
+TREND_WEEKS = 12   # weeks averaged for the velocity
+TREND_MONTHS = 12  # months listed month by month
 
-    for repo in known_repos:
-        if repo.lower() in question.lower():
-            return repo
 
-    closest = get_close_matches(question, known_repos, n=1, cutoff=0.5)
-    if closest:
-        return closest[0]
+def _quarter_start(day):
+    return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+
+
+def format_activity_trend(weekly, monthly, today=None):
+    """
+    Describe recent velocity from the weekly and monthly rollups of a repo.
 
-    return known_repos[0] if known_repos else "default_repo_name"
+    Args:
+        weekly: (week_start, commits, authors) rows in date order
+        monthly: (month_start, commits, authors) rows in date order
+        today: Reference date, defaults to today
+    """
+    if not weekly:
+        return ""
+    today = today or date.today()
+    lines = []
+
+    current_week = today - timedelta(days=today.weekday())
+    recent = [row for row in weekly if row[0] > current_week - timedelta(weeks=TREND_WEEKS)]
+    commits = sum(row[1] for row in recent)
+    authors = sum(row[2] for row in recent)
+    lines.append(f"- Weekly velocity (last {TREND_WEEKS} weeks): {commits / TREND_WEEKS:.1f} commits/week, "
+                 f"{authors / TREND_WEEKS:.1f} active authors/week on average")
+
+    busiest = max(weekly, key=lambda row: row[1])
+    lines.append(f"- Busiest week: {busiest[0]:%Y-%m-%d} with {busiest[1]} commits by {busiest[2]} authors")
+
+    this_quarter = _quarter_start(today)
+    last_quarter = _quarter_start(this_quarter - timedelta(days=1))
+    for label, start, end in (("This quarter so far", this_quarter, today),
+                              ("Last quarter", last_quarter, this_quarter - timedelta(days=1))):
+        months = [row for row in monthly if start <= row[0] <= end]
+        lines.append(f"- {label} ({start:%Y-%m-%d} to {end:%Y-%m-%d}): {sum(row[1] for row in months)} commits, "
+                     f"up to {max((row[2] for row in months), default=0)} authors in a month")
+
+    first_month = date(today.year - 1, today.month, 1)
+    by_month = {row[0]: row for row in monthly if row[0] > first_month}
+    if by_month:
+        lines.append(f"- Commits per month (last {TREND_MONTHS} months):")
+        month = first_month
+        for _ in range(TREND_MONTHS):
+            month = (month + timedelta(days=32)).replace(day=1)
+            _, count, month_authors = by_month.get(month, (month, 0, 0))
+            lines.append(f"    - {month:%Y-%m}: {count} commits, {month_authors} authors")
+
+    return "\n    " + "\n    ".join(lines)
+
+# -------------------------------
+# Author statistics
+# -------------------------------
+def format_author(row):
+    """One line for a get_top_authors / find_author_stats row."""
+    email, name, commits, first, last, added, removed, repo_count = row[:8]
+    line = (f"{name} <{email}>: {commits} commits, +{added}/-{removed} lines, "
+            f"active {first:%Y-%m-%d} to {last:%Y-%m-%d}")
+    if repo_count > 1:
+        line += f" across {repo_count} repos"
+    return line
+
+
+def format_author_ranking(rows, repo_name=None):
+    scope = f"in {repo_name}" if repo_name else "across all repositories"
+    total = rows[0][8] or 0
+    top = rows[0]
+    lines = [f"Most active contributor {scope}: {top[0]} with {top[2]} commits "
+             f"({top[2] / total * 100 if total else 0:.1f}% of total commits)"]
+    if len(rows) > 1:
+        lines.append(f"\nTop {len(rows)} contributors {scope}:")
+        lines.extend(f"{rank}. {format_author(row)} ({row[2] / total * 100 if total else 0:.1f}%)"
+                     for rank, row in enumerate(rows, 1))
+    return "\n".join(lines)
 
 # -------------------------------
 # Structured question handler
@@ -39,36 +145,58 @@ def handle_structured_question(question, cur, repo_name):
     # First try to extract intent
     intent = extract_intent(question)
     
+    # Questions about one author; without a known author they are commit counts
+    if intent == 'author_stats':
+        scope = None if mentions_all_repos(question) else repo_name
+        authors = find_author_stats(cur, question, scope)
+        if not authors and scope:
+            scope = None
+            authors = find_author_stats(cur, question)
+        if authors:
+            heading = f"Contributions in {scope}:" if scope else "Contributions across all repositories:"
+            return "\n".join([heading] + [f"- {format_author(row)}" for row in authors])
+        intent = 'commit_count'
 
     # Use intent if available, otherwise fallback to keyword matching
     if intent == 'commit_count':
         cur.execute(f"SELECT total_commits FROM {TABLE} WHERE repo_name=%s", (repo_name,))
         row = cur.fetchone()
+        if asks_contributor_count(question):
+            scope = None if mentions_all_repos(question) else repo_name
+            contributors = count_authors(cur, scope)
+            if contributors:
+                answer = f"Contributors {f'in {scope}' if scope else 'across all repositories'}: {contributors}"
+                return f"{answer}\nTotal commits: {row[0]}" if row and scope else answer
         if row:
             return f"Total commits: {row[0]}"
         return "No commit information found"
 
     # Most active contributor
     elif intent=='most_active':
-        cur.execute(f"""
-        WITH contributor_stats AS (
-            SELECT 
-                most_active_contributor,
-                total_commits,
-                (SELECT jsonb_array_length(contributors)) as contributor_count
-            FROM {TABLE}
-            WHERE repo_name = %s
-        )
-        SELECT most_active_contributor, contributor_count, total_commits
-        FROM contributor_stats;
-    """, (repo_name,))
+        scope = None if mentions_all_repos(question) else repo_name
+        authors = get_top_authors(cur, scope, limit=extract_top_n(question))
+        if authors:
+            return format_author_ranking(authors, scope)
+
+        # Repos ingested before per-author statistics only know the top email
+        cur.execute(f"SELECT most_active_contributor FROM {TABLE} WHERE repo_name = %s", (repo_name,))
         row = cur.fetchone()
         if row and row[0]:
-            email = row[0]
-            commit_count = row[1] or 0  # In case it's NULL
-            total_commits = row[2]
-            percentage = (commit_count / total_commits * 100) if total_commits > 0 else 0
-            return f"Most active contributor: {email} with {commit_count} commits ({percentage:.1f}% of total commits)"
+            return f"Most active contributor: {row[0]}"
+
+    # Most frequently changed files
+    elif intent == 'hotspots':
+        scope = None if mentions_all_repos(question) else repo_name
+        hotspots = get_file_hotspots(cur, [scope] if scope else None, limit=extract_top_n(question, default=10))
+        if hotspots:
+            heading = f"in {scope}" if scope else "across all repositories"
+            lines = [f"Top {len(hotspots)} hotspots {heading} (files changed most often):"]
+            for rank, (repo, path, changes, added, removed, touched) in enumerate(hotspots, 1):
+                name = path if scope else f"{repo}: {path}"
+                lines.append(f"{rank}. {name}: {changes} changes, {added + removed} lines churned "
+                             f"(+{added}/-{removed}), last touched {touched:%Y-%m-%d}")
+            return "\n".join(lines)
+        return "No file change history found"
 
     # Languages and files count
     elif intent =='languages':
@@ -82,7 +210,18 @@ def handle_structured_question(question, cur, repo_name):
             languages = row[0]  # This is JSONB
             files_count = row[1]
             lang_list = "\n".join([f"- {lang}: {count} files" for lang, count in languages.items()])
-            return f"Repository contains {files_count} files:\n\nLanguage breakdown:\n{lang_list}"
+            answer = f"Repository contains {files_count} files:\n\nLanguage breakdown:\n{lang_list}"
+
+            # Lines of code say more about the main language than file counts
+            profile = get_language_profile(cur, repo_name)
+            total_lines = sum(entry[3] for entry in profile)
+            if total_lines:
+                loc_list = "\n".join(f"- {language}: {lines:,} lines ({lines / total_lines * 100:.1f}%), "
+                                     f"{files} files, {size / 1024:,.0f} KiB"
+                                     for language, files, size, lines in profile)
+                answer = (f"Main language: {profile[0][0]}\n\nLines of code by language:\n{loc_list}"
+                          f"\n\n{answer}")
+            return answer
         return "No language or file information found"
 
     # Version information
@@ -112,35 +251,33 @@ def handle_structured_question(question, cur, repo_name):
             return "\n".join(response_parts)
         return "No version information found"
 
-    # Dependencies check using languages
+    # Dependencies parsed from manifests at ingestion
     elif intent =='dependencies':
-        cur.execute(f"""
-        SELECT languages 
-        FROM {TABLE} 
-        WHERE repo_name = %s
-    """, (repo_name,))
-        row = cur.fetchone()
+        package = extract_package_name(question)
+        if package:
+            rows = find_repos_using(cur, candidate_keys(package))
+            if not rows:
+                return f"No repository declares a dependency on {package}"
+            repos = sorted({row[0] for row in rows})
+            lines = [f"{len(repos)} repositories depend on {package}:"]
+            lines += [f"- {repo}: {key} {version or '(unpinned)'}" for repo, key, version in rows]
+            return "\n".join(lines)
+
+        row = get_repo_dependencies(cur, repo_name)
         if row and row[0]:
-            languages = row[0]
-            response = ["Likely dependencies based on project languages:"]
-            
-            if "java" in languages:
-                response.append("Java dependencies (check pom.xml or build.gradle):")
-                response.append("- Spring Framework")
-                response.append("- Maven/Gradle build system")
-                
-            if "python" in languages or "py" in languages:
-                response.append("\nPython dependencies (check requirements.txt or setup.py):")
-                response.append("- Python packages")
-                response.append("- pip package manager")
-                
-            if "javascript" in languages or "js" in languages:
-                response.append("\nJavaScript dependencies (check package.json):")
-                response.append("- npm packages")
-                response.append("- Node.js runtime")
-                
+            dependencies, manifests = row
+            by_ecosystem = {}
+            for key, version in sorted(dependencies.items()):
+                ecosystem, name = key.split(":", 1)
+                by_ecosystem.setdefault(ecosystem, []).append(f"{name} {version}".strip())
+            response = [f"{repo_name} declares {len(dependencies)} dependencies in {', '.join(manifests)}:"]
+            for ecosystem, packages in by_ecosystem.items():
+                response.append(f"\n{ecosystem} ({len(packages)}):")
+                response.extend(f"- {package}" for package in packages[:MAX_LISTED_DEPENDENCIES])
+                if len(packages) > MAX_LISTED_DEPENDENCIES:
+                    response.append(f"- ... and {len(packages) - MAX_LISTED_DEPENDENCIES} more")
             return "\n".join(response)
-        return "No language information found"
+        return f"No dependency manifests found for {repo_name}"
 
     # Contribution trend
     elif intent == 'contribution_trend':
@@ -160,12 +297,15 @@ def handle_structured_question(question, cur, repo_name):
             days_diff = (last_date - first_date).days
             avg_commits = total / days_diff if days_diff > 0 else 0
         
-            return f"""Contribution trend for {repo_name}:
+            summary = f"""Contribution trend for {repo_name}:
     - First commit: {first_date.strftime('%Y-%m-%d')}
     - Last commit: {last_date.strftime('%Y-%m-%d')}
     - Total commits: {total}
     - Repository age: {days_diff} days
     - Average commits per day: {avg_commits:.2f}"""
+            weekly = get_activity_rollups(cur, repo_name, "week")
+            monthly = get_activity_rollups(cur, repo_name, "month")
+            return summary + format_activity_trend(weekly, monthly)
         return "No contribution data found"
 
     # Last commit message
@@ -263,7 +403,7 @@ def validate_response(answer, confidence_score,repo_name):
     
     return formatted_answer
 
-def process_with_ai(question, context_chunks, repo_data,repo_name):
+def process_with_ai(question, context_chunks, repo_data,repo_name, on_token=None, should_cancel=None):
     """
     Process a question using AI with enhanced context handling and answer synthesis.
     
@@ -271,6 +411,9 @@ def process_with_ai(question, context_chunks, repo_data,repo_name):
         question: The user's question
         context_chunks: List of context chunks with metadata and relevance scores
         repo_data: Repository metadata
+        on_token: Optional callback; when given the completion is streamed and
+            every token is passed to it as it arrives
+        should_cancel: Optional callable that aborts the streamed completion
     Returns:
         Validated and formatted response with confidence scoring
     """
@@ -310,36 +453,19 @@ def process_with_ai(question, context_chunks, repo_data,repo_name):
     - Release Tags: {', '.join(repo_data['tags']) if repo_data['tags'] else 'N/A'}
     """
 
-    # Process and organize context chunks
-    organized_context = []
-    code_contexts = []
-    doc_contexts = []
-    
-    for chunk in context_chunks:
-        context_entry = f"""
-        Source: {chunk['file_path']} (Relevance: {chunk['final_score']:.2f})
-        Content: {chunk['text_chunk']}
-        """
-        if chunk['metadata']['is_code']:
-            code_contexts.append(context_entry)
-        elif chunk['metadata']['is_doc']:
-            doc_contexts.append(context_entry)
-        else:
-            organized_context.append(context_entry)
-
-    # Construct the enhanced prompt
-    prompt = f"""Based on the following repository information and context, please provide a comprehensive answer to the question.
+    def build_prompt(doc_contexts, code_contexts, organized_context):
+        return f"""Based on the following repository information and context, please provide a comprehensive answer to the question.
 
 {repo_context}
 
 Relevant Documentation:
-{chr(10).join(doc_contexts[:2]) if doc_contexts else "No relevant documentation found."}
+{chr(10).join(doc_contexts) if doc_contexts else "No relevant documentation found."}
 
 Relevant Code:
-{chr(10).join(code_contexts[:2]) if code_contexts else "No relevant code snippets found."}
+{chr(10).join(code_contexts) if code_contexts else "No relevant code snippets found."}
 
 Additional Context:
-{chr(10).join(organized_context[:2]) if organized_context else "No additional context available."}
+{chr(10).join(organized_context) if organized_context else "No additional context available."}
 
 Question: {question}
 
@@ -351,28 +477,57 @@ Please provide a detailed answer that:
 5. Synthesizes information from multiple sources when available
 """
 
-    # Make the API request
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": CHAT_MODEL,
-        "messages": [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.3  # Lower temperature for more focused responses
-    }
-    
-    response = requests.post(f"{BASE_URL}/chat/completions", json=payload, headers=headers)
-    
-    if response.status_code != 200:
-        return "I apologize, but I encountered an error while processing your question. Please try again."
-    
-    result = response.json()
-    raw_answer = result["choices"][0]["message"]["content"].strip()
+    # Fill whatever the fixed parts of the prompt leave of the token budget
+    fixed_tokens = count_tokens(system_message) + count_tokens(build_prompt([], [], []))
+    sections, report = pack_context(context_chunks, max(PROMPT_TOKEN_BUDGET - fixed_tokens, 0))
+    logger.debug("Prompt tokens: fixed=%d doc=%d code=%d other=%d (duplicates dropped=%d, over budget=%d, "
+                 "truncated=%d)", fixed_tokens, report["doc"], report["code"], report["other"],
+                 report["duplicates"], report["over_budget"], report["truncated"])
+    LLM_TOKENS.labels(kind="prompt", repo=repo_name or "").inc(
+        fixed_tokens + report["doc"] + report["code"] + report["other"])
+
+    # Construct the enhanced prompt
+    prompt = build_prompt(sections["doc"], sections["code"], sections["other"])
+
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": prompt}
+    ]
+
+    if on_token is not None:
+        try:
+            raw_answer, first_token = stream_chat_completion(messages, temperature=0.3, on_token=on_token,
+                                                             should_cancel=should_cancel)
+        except AnswerCancelled:
+            raise
+        except Exception:
+            logger.exception("Streaming completion failed")
+            QA_ERRORS.labels(stage="llm").inc()
+            return AI_ERROR_MESSAGE
+        if first_token is not None:
+            LLM_FIRST_TOKEN_SECONDS.observe(first_token)
+    else:
+        # Make the API request
+        headers = {
+            "Authorization": f"Bearer {API_KEY}",
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "model": CHAT_MODEL,
+            "messages": messages,
+            "temperature": 0.3  # Lower temperature for more focused responses
+        }
+
+        response = requests.post(f"{BASE_URL}/chat/completions", json=payload, headers=headers)
+
+        if response.status_code != 200:
+            QA_ERRORS.labels(stage="llm").inc()
+            return AI_ERROR_MESSAGE
+
+        result = response.json()
+        raw_answer = result["choices"][0]["message"]["content"].strip()
+    LLM_TOKENS.labels(kind="completion", repo=repo_name or "").inc(count_tokens(raw_answer))
     
     # Determine question type based on context and question
     question_type = 'code' if any(word in question.lower() for word in ['code', 'implementation', 'function', 'class']) else \
@@ -387,41 +542,241 @@ Please provide a detailed answer that:
     
     return final_answer
 
-def answer_hybrid(question, top_k=5, repo_name=None):
-    conn, cur = connect_db()
+# Identical questions asked concurrently share one pipeline run
+answer_flights = SingleFlight()
+
+# Seconds each pipeline stage may take before the question fails
+STAGE_TIMEOUTS = {
+    "aggregate": 10,
+    "resolve": 10,
+    "embedding": 30,
+    "metadata": 30,
+    "vector_search": 30,
+    "llm": 180,
+}
+CANCEL_POLL_INTERVAL = 0.1
+
+# Stages run here rather than in the loop's default executor, so asyncio.run
+# doesn't block on a timed-out or cancelled stage that is still finishing
+_stage_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="qa-stage")
+
+
+async def _run_stage(stage, func, *args, cancel_check=None, labels=None, **kwargs):
+    """
+    Run a blocking stage in a worker thread, bounded by its timeout.
+
+    While waiting, cancel_check is polled so a cancelled question stops at
+    once; the worker thread's result is then discarded. The stage duration is
+    recorded with the repo and intent given in labels.
+    """
+    if cancel_check and cancel_check():
+        raise AnswerCancelled()
 
+    labels = labels or {"repo": "", "intent": ""}
+    start = time.perf_counter()
     try:
-        # Get known repos from DB
-        cur.execute(f"SELECT repo_name FROM {TABLE};")
-        known_repos = [row[0] for row in cur.fetchall()]
+        return await _wait_stage(stage, func, args, kwargs, cancel_check)
+    except AnswerCancelled:
+        raise
+    except Exception:
+        QA_ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        QA_STAGE_SECONDS.labels(stage=stage, **labels).observe(time.perf_counter() - start)
+
+
+async def _wait_stage(stage, func, args, kwargs, cancel_check):
+    loop = asyncio.get_running_loop()
+    task = loop.run_in_executor(_stage_executor, functools.partial(func, *args, **kwargs))
+    deadline = loop.time() + STAGE_TIMEOUTS[stage]
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            task.cancel()
+            raise TimeoutError(f"{stage} stage timed out after {STAGE_TIMEOUTS[stage]}s")
+        done, _ = await asyncio.wait({task}, timeout=min(CANCEL_POLL_INTERVAL, remaining))
+        if done:
+            return task.result()
+        if cancel_check and cancel_check():
+            task.cancel()
+            raise AnswerCancelled()
+
+
+def _resolve_repo(question, repo_name):
+    """(repo, indexed version, whether the repo was selected or named in the question)."""
+    with db_cursor() as cur:
+        scoped = bool(repo_name) or find_repo_mention(question, cur=cur) is not None
+        repo_name = repo_name or extract_repo_name(question, cur=cur)
+        return repo_name, get_repo_version(cur, repo_name), scoped
+
+
+def get_cached_repo_context(cur, repo_name, version):
+    """get_repo_context through the shared cache, keyed by the indexed repo version."""
+    key = make_key("repo_context", repo_name, version)
+    repo_data = shared_cache.get("metadata", key)
+    if repo_data is None:
+        repo_data = get_repo_context(cur, repo_name)
+        shared_cache.set("metadata", key, repo_data)
+    return repo_data
+
+
+def warm_repo_metadata(repo_names):
+    """Preload the shared metadata cache for the given repos."""
+    with db_cursor() as cur:
+        for repo_name in repo_names:
+            get_cached_repo_context(cur, repo_name, get_repo_version(cur, repo_name))
 
-        # Extract repo from question
-        repo_name = repo_name or extract_repo_name(question, known_repos)
 
-        # Try structured queries first
+def _load_repo_metadata(question, repo_name, version=None):
+    with db_cursor() as cur:
         structured_answer = handle_structured_question(question, cur, repo_name=repo_name)
-        
-        # Get context and repo data for AI processing
-        repo_data = get_repo_context(cur, repo_name)
-        q_emb = get_embedding(question)
-        context_chunks = query_similar_chunks(cur, q_emb, top_k=top_k)
-
-        # If we have a structured answer, add it as a high-confidence context
-        if structured_answer:
-            context_chunks.insert(0, {
-                "text_chunk": structured_answer,
-                "file_path": "structured_query_result",
-                "final_score": 1.0,
-                "metadata": {
-                    "is_code": False,
-                    "is_doc": True,
-                    "file_type": "txt"
-                }
-            })
-        
-        # Process with AI using enhanced context
-        return process_with_ai(question, context_chunks, repo_data,repo_name)
+        repo_data = get_cached_repo_context(cur, repo_name, version)
+    return structured_answer, repo_data
+
+
+def _run_aggregate(slots):
+    with db_cursor() as cur:
+        return run_aggregate_query(cur, slots)
 
+
+def _vector_search(q_emb, top_k, repo_name=None):
+    """
+    Chunks closest to the question, from repo_name only when one is given.
+
+    Otherwise retrieval is two-level: repos are ranked by their repo-level
+    embedding, a table of one row per repo, and only the chunks of the
+    TWO_LEVEL_REPOS best are searched instead of every chunk of the fleet.
+    """
+    with db_cursor() as cur:
+        if repo_name:
+            repo_names = [repo_name]
+        elif TWO_LEVEL_REPOS > 0:
+            repo_names = rank_similar_repos(cur, q_emb, limit=TWO_LEVEL_REPOS) or None
+        else:
+            repo_names = None
+        return query_similar_chunks(cur, q_emb, top_k=top_k, repo_names=repo_names)
+
+
+async def answer_hybrid_async(question, top_k=5, repo_name=None, use_cache=True, on_token=None,
+                              should_cancel=None):
+    """
+    Async pipeline behind answer_hybrid.
+
+    The question embedding and the structured/metadata queries don't depend on
+    each other, so they run concurrently on separate pooled connections; the
+    critical path is resolve -> embed -> vector search -> LLM. Blocking
+    psycopg2 and requests calls run in worker threads. AnswerCancelled is
+    raised as soon as should_cancel() returns True.
+
+    Every stage and the whole answer are timed with repo and intent labels
+    (see backend/metrics.py).
+    """
+    start = time.perf_counter()
+    labels = {"repo": repo_name or "", "intent": extract_intent(question) or "none"}
+    QA_STAGE_SECONDS.labels(stage="intent", **labels).observe(time.perf_counter() - start)
+
+    outcome = "error"
+    try:
+        answer, outcome = await _answer_pipeline(question, top_k, repo_name, use_cache, on_token,
+                                                 should_cancel, labels)
+        return answer
+    except AnswerCancelled:
+        outcome = "cancelled"
+        raise
+    finally:
+        QA_ANSWER_SECONDS.labels(outcome=outcome, **labels).observe(time.perf_counter() - start)
+
+
+async def _answer_pipeline(question, top_k, repo_name, use_cache, on_token, should_cancel, labels):
+    """Run the stages of answer_hybrid_async. Returns (answer, outcome)."""
+    # Cross-repo aggregates are answered by SQL templates, without retrieval or the LLM
+    slots = parse_aggregate_question(question)
+    if slots:
+        labels["intent"] = "aggregate"
+        answer = await _run_stage("aggregate", _run_aggregate, slots, cancel_check=should_cancel, labels=labels)
+        return answer, "aggregate"
+
+    # Extract repo from question
+    repo_name, version, scoped = await _run_stage("resolve", _resolve_repo, question, repo_name,
+                                          cancel_check=should_cancel, labels=labels)
+    labels["repo"] = repo_name
+
+    # Repeated questions about an unchanged repo skip the whole pipeline
+    if use_cache:
+        cached = answer_cache.get(repo_name, version, question)
+        record_cache("answers_exact", cached)
+        if cached:
+            return label_cached(cached), "cached"
+
+    metadata_task = asyncio.ensure_future(_run_stage("metadata", _load_repo_metadata, question, repo_name, version,
+                                                     cancel_check=should_cancel, labels=labels))
+    try:
+        q_emb = await _run_stage("embedding", get_question_embedding, question, cancel_check=should_cancel,
+                                 labels=labels)
+        if use_cache:
+            cached = answer_cache.get_similar(repo_name, version, q_emb)
+            record_cache("answers_similar", cached)
+            if cached:
+                return label_cached(cached), "cached"
+
+        context_chunks = await _run_stage("vector_search", _vector_search, q_emb, top_k,
+                                          repo_name if scoped else None,
+                                          cancel_check=should_cancel, labels=labels)
+        structured_answer, repo_data = await metadata_task
     finally:
-        cur.close()
-        conn.close()
+        if not metadata_task.done():
+            metadata_task.cancel()
+
+    # If we have a structured answer, add it as a high-confidence context
+    if structured_answer:
+        context_chunks.insert(0, {
+            "text_chunk": structured_answer,
+            "file_path": "structured_query_result",
+            "final_score": 1.0,
+            "metadata": {
+                "is_code": False,
+                "is_doc": True,
+                "file_type": "txt"
+            }
+        })
+    
+    # Process with AI using enhanced context
+    answer = await _run_stage("llm", process_with_ai, question, context_chunks, repo_data, repo_name,
+                              on_token=on_token, should_cancel=should_cancel,
+                              cancel_check=should_cancel, labels=labels)
+    if answer == AI_ERROR_MESSAGE:
+        return answer, "error"
+    if use_cache:
+        answer_cache.put(repo_name, version, question, answer, q_emb)
+    return answer, "ok"
+
+
+def answer_hybrid(question, top_k=5, repo_name=None, use_cache=True, on_token=None, cancel_event=None):
+    """
+    Answer a question about a repo from structured data, retrieved chunks and the LLM.
+
+    Synchronous wrapper around answer_hybrid_async for existing callers.
+    Concurrent calls with the same repo, normalized question and options are
+    coalesced into one run whose tokens and result every caller receives.
+
+    Args:
+        question: The user's question
+        top_k: Number of similar chunks to retrieve
+        repo_name: Repo to answer about; resolved from the question when omitted
+        use_cache: Serve and store answers through the answer cache
+        on_token: Optional callback receiving LLM tokens as they are generated
+        cancel_event: Optional threading.Event; setting it raises AnswerCancelled.
+            The shared run itself stops only once every caller has cancelled.
+    """
+    key = [repo_name or "", normalize_question(question), top_k, use_cache]
+
+    def run(publish, should_cancel):
+        return asyncio.run(answer_hybrid_async(question, top_k=top_k, repo_name=repo_name,
+                                               use_cache=use_cache, on_token=publish,
+                                               should_cancel=should_cancel))
+
+    answer = answer_flights.do(tuple(key), run, on_token=on_token, cancel_event=cancel_event,
+                               cancelled_error=AnswerCancelled())
+    if cancel_event is not None and cancel_event.is_set():
+        raise AnswerCancelled()
+    return answer
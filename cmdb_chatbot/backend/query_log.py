@@ -0,0 +1,265 @@
+"""
+Per-statement timing and a slow query log with sampled EXPLAIN plans.
+
+Report the worst statements from the cmdb_chatbot folder:
+    python -m backend.query_log --top 10
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import queue
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+import psycopg2
+import psycopg2.extensions
+from .db_config import SLOW_QUERY_MS, SLOW_QUERY_SAMPLE_RATE, SLOW_QUERY_EXPLAINS_PER_MIN, SLOW_QUERY_LOG
+from .metrics import DB_STATEMENT_SECONDS, DB_STATEMENT_ROWS, DB_SLOW_STATEMENTS
+
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+EXPLAIN_INTERVAL = 300   # seconds before the same fingerprint is explained again
+EXPLAIN_QUEUE_SIZE = 20  # pending EXPLAINs; more slow queries are logged without a plan
+MAX_LOGGED_QUERY = 2000  # characters of the normalized query kept per log entry
+
+# -------------------------------
+# Query fingerprints
+# -------------------------------
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_ARRAYS = re.compile(r"ARRAY\s*\[[^\]]*\]", re.I)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?(?:e[-+]?\d+)?\b", re.I)
+_IN_LISTS = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_SPACES = re.compile(r"\s+")
+_READ_ONLY = re.compile(r"^(select|with)\b", re.I)
+_WRITES = re.compile(r"\b(insert|update|delete|merge|refresh|create|alter|drop|truncate)\b", re.I)
+
+
+def normalize_query(sql):
+    """Strip comments and literals so every run of a statement shares one text."""
+    # Inlined vectors differ on every call; dropping them first keeps the cache small
+    return _normalize(_ARRAYS.sub("ARRAY[?]", sql))
+
+
+@lru_cache(maxsize=512)
+def _normalize(sql):
+    sql = _COMMENTS.sub(" ", sql)
+    sql = _STRINGS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _IN_LISTS.sub("(?)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _is_explainable(normalized):
+    """EXPLAIN ANALYZE runs the statement, so only plain reads qualify."""
+    return bool(_READ_ONLY.match(normalized)) and not _WRITES.search(normalized)
+
+
+# -------------------------------
+# Slow query log
+# -------------------------------
+class SlowQueryLog:
+    """
+    Times every statement and writes the slow ones to a rotating JSON lines log.
+
+    Slow reads are re-run under EXPLAIN (ANALYZE, BUFFERS) on a background
+    thread with its own connection, so the request that hit the slow query
+    doesn't wait twice. Plans are sampled (sample_rate), limited per process
+    (explains_per_min) and taken at most once per EXPLAIN_INTERVAL for the
+    same fingerprint.
+    """
+
+    def __init__(self, threshold_ms=SLOW_QUERY_MS, sample_rate=SLOW_QUERY_SAMPLE_RATE,
+                 explains_per_min=SLOW_QUERY_EXPLAINS_PER_MIN, path=SLOW_QUERY_LOG, connect=None):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.explains_per_min = explains_per_min
+        self.path = path
+        self.connect = connect  # opens an uninstrumented connection for EXPLAIN
+        self.logger = None
+        self.explained_at = {}
+        self.explain_times = []
+        self.pending = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self.worker = None
+        self.lock = threading.Lock()
+
+    def record(self, cur, template, seconds):
+        """Called by InstrumentedCursor after every statement."""
+        template = template.decode("utf-8", "replace") if isinstance(template, bytes) else str(template)
+        normalized = normalize_query(template)
+        key = fingerprint(normalized)
+        DB_STATEMENT_SECONDS.labels(fingerprint=key).observe(seconds)
+        if cur.rowcount >= 0:
+            DB_STATEMENT_ROWS.labels(fingerprint=key).observe(cur.rowcount)
+
+        if seconds < self.threshold or normalized.upper().startswith("EXPLAIN"):
+            return
+        DB_SLOW_STATEMENTS.labels(fingerprint=key).inc()
+        entry = {
+            "ts": time.time(),
+            "fingerprint": key,
+            "duration_ms": round(seconds * 1000, 1),
+            "rows": cur.rowcount,
+            "query": normalized[:MAX_LOGGED_QUERY],
+        }
+        if _is_explainable(normalized) and cur.query and self._take_explain(key):
+            try:
+                self.pending.put_nowait((entry, cur.query))
+                self._ensure_worker()
+                return
+            except queue.Full:
+                pass
+        self._write(entry)
+
+    def _take_explain(self, key):
+        if self.connect is None or random.random() >= self.sample_rate:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            if now - self.explained_at.get(key, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+                return False
+            self.explain_times = [t for t in self.explain_times if now - t < 60]
+            if len(self.explain_times) >= self.explains_per_min:
+                return False
+            self.explain_times.append(now)
+            self.explained_at[key] = now
+            return True
+
+    def _ensure_worker(self):
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._explain_loop, name="slow-query-explain", daemon=True)
+                self.worker.start()
+
+    def _explain_loop(self):
+        conn = None
+        while True:
+            entry, bound_query = self.pending.get()
+            try:
+                if conn is None or conn.closed:
+                    conn = self.connect()
+                with conn.cursor() as cur:
+                    cur.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + bound_query)
+                    entry["plan"] = "\n".join(row[0] for row in cur.fetchall())
+                conn.rollback()
+            except psycopg2.Error as e:
+                entry["plan_error"] = str(e).strip()
+                if conn is not None:
+                    conn.close()
+            self._write(entry)
+
+    def _write(self, entry):
+        with self.lock:
+            if self.logger is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                handler = RotatingFileHandler(self.path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self.logger = logging.getLogger("cmdb_chatbot.slow_queries")
+                self.logger.propagate = False
+                self.logger.setLevel(logging.INFO)
+                self.logger.addHandler(handler)
+        self.logger.info(json.dumps(entry, default=str))
+
+
+slow_query_log = SlowQueryLog()
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """psycopg2 cursor that reports the duration and row count of each statement."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, time.perf_counter() - start)
+
+    def _record(self, query, seconds):
+        try:
+            slow_query_log.record(self, query, seconds)
+        except Exception as e:
+            print("❌ Failed to record query timing:", e)
+
+
+# -------------------------------
+# Report
+# -------------------------------
+def read_log(path=SLOW_QUERY_LOG):
+    """Entries of the log and its rotated backups, oldest file first."""
+    entries = []
+    for file_path in sorted(glob.glob(f"{path}*"), reverse=True):
+        with open(file_path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def summarize(entries):
+    """Group entries by fingerprint, worst total time first."""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry["fingerprint"], {
+            "fingerprint": entry["fingerprint"], "query": entry["query"], "durations": [],
+            "rows": 0, "last_seen": 0, "plan": None,
+        })
+        group["durations"].append(entry["duration_ms"])
+        group["rows"] = max(group["rows"], entry.get("rows") or 0)
+        group["last_seen"] = max(group["last_seen"], entry["ts"])
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]
+
+    summary = []
+    for group in groups.values():
+        durations = sorted(group.pop("durations"))
+        summary.append(dict(group, count=len(durations), total_ms=sum(durations),
+                            p95_ms=durations[min(int(len(durations) * 0.95), len(durations) - 1)],
+                            max_ms=durations[-1]))
+    return sorted(summary, key=lambda g: g["total_ms"], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top slow queries from the slow query log")
+    parser.add_argument("--log", default=SLOW_QUERY_LOG)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--plans", action="store_true", help="Print the latest plan of each query")
+    args = parser.parse_args()
+
+    summary = summarize(read_log(args.log))[:args.top]
+    if not summary:
+        print(f"No slow queries logged in {args.log}")
+        return
+    for rank, group in enumerate(summary, 1):
+        last_seen = time.strftime("%Y-%m-%d %H:%M", time.localtime(group["last_seen"]))
+        print(f"{rank}. [{group['fingerprint']}] count={group['count']} total={group['total_ms']:,.0f}ms "
+              f"p95={group['p95_ms']:,.0f}ms max={group['max_ms']:,.0f}ms rows<={group['rows']} "
+              f"last={last_seen}")
+        print(f"   {group['query'][:300]}")
+        if args.plans and group["plan"]:
+            print("   " + group["plan"].replace("\n", "\n   "))
+        print()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import re
+import time
+import bisect
+import threading
+from collections import defaultdict
+from .db_utils import db_cursor, get_all_repo_names, TABLE
+
+# -------------------------------
+# Repo name index
+# -------------------------------
+MAX_NAME_TOKENS = 6        # longest repo name (in tokens) matched verbatim
+FUZZY_CUTOFF = 0.5         # minimum trigram similarity for a fuzzy candidate
+SUGGEST_CUTOFF = 0.3       # looser cutoff for search-box suggestions
+COMMON_GRAM_RATIO = 0.01   # trigrams shared by more names than this are not used to find candidates
+REPO_INDEX_TTL = 30        # seconds between staleness checks against the DB
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Question words that never name a repo, skipped by the fuzzy lookup
+STOPWORDS = {
+    "the", "and", "for", "how", "many", "much", "what", "which", "who", "whom",
+    "when", "where", "why", "does", "did", "are", "was", "were", "has", "have",
+    "made", "make", "show", "tell", "list", "about", "with", "from", "into",
+    "repo", "repos", "repository", "repositories", "project", "this", "that",
+    "there", "most", "last", "latest", "recent", "commit", "commits",
+}
+
+
+def tokenize_name(text):
+    """Lowercase text and split it on anything that is not a letter or digit."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def trigrams(text):
+    """Return the set of padded character trigrams of text."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class RepoNameIndex:
+    """
+    Prebuilt lookup structure for resolving repo names mentioned in a question.
+
+    Exact mentions are found by looking up the question's token n-grams in a
+    dict of normalized names, so the cost depends on the question length and
+    not on the number of repos. Misspelled names fall back to a trigram
+    inverted index scored with the Dice coefficient.
+    """
+
+    def __init__(self, repo_names):
+        self.names = sorted(set(n for n in repo_names if n))
+        self.by_key = {}
+        self.by_lower = {}
+        self.grams = []
+        self.postings = defaultdict(list)
+        self.common_limit = max(100, int(len(self.names) * COMMON_GRAM_RATIO))
+        self.sorted_lower = sorted((name.lower(), name) for name in self.names)
+        self.lower_keys = [lower for lower, _ in self.sorted_lower]
+        self.token_names = defaultdict(list)
+
+        for idx, name in enumerate(self.names):
+            for token in set(tokenize_name(name)):
+                self.token_names[token].append(name)
+            key = " ".join(tokenize_name(name))
+            self.by_key.setdefault(key, name)
+            self.by_lower.setdefault(name.lower(), name)
+            grams = frozenset(trigrams(key))
+            self.grams.append(grams)
+            for gram in grams:
+                self.postings[gram].append(idx)
+        self.sorted_tokens = sorted(self.token_names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def exact_matches(self, question):
+        """Return repos whose full token sequence appears in the question, longest first."""
+        tokens = tokenize_name(question)
+        found = {}
+        for n in range(min(MAX_NAME_TOKENS, len(tokens)), 0, -1):
+            for i in range(len(tokens) - n + 1):
+                name = self.by_key.get(" ".join(tokens[i:i + n]))
+                if name and name not in found:
+                    found[name] = n
+        return sorted(found, key=lambda name: (-found[name], -len(name)))
+
+    def fuzzy_matches(self, text, limit=5, cutoff=FUZZY_CUTOFF):
+        """Return (repo_name, score) pairs ranked by trigram similarity to text."""
+        query = trigrams(" ".join(tokenize_name(text)))
+        if not query:
+            return []
+
+        # Candidates come from the selective trigrams only, then every
+        # candidate is scored exactly against its full trigram set
+        candidates = set()
+        for gram in query:
+            posting = self.postings.get(gram, ())
+            if len(posting) <= self.common_limit:
+                candidates.update(posting)
+
+        scored = []
+        for idx in candidates:
+            grams = self.grams[idx]
+            score = 2.0 * len(query & grams) / (len(query) + len(grams))
+            if score >= cutoff:
+                scored.append((self.names[idx], score))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+    def _prefix_range(self, keys, prefix):
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + "\uffff")
+        return lo, hi
+
+    def suggest(self, query, limit=50, offset=0):
+        """
+        Page of names for a search box.
+
+        Names starting with the query come first, then names with a token
+        starting with it, then fuzzy matches.
+
+        Returns:
+            Tuple of (names, has_more)
+        """
+        query = (query or "").strip().lower()
+        wanted = offset + limit + 1
+        if not query:
+            page = self.names[offset:offset + limit]
+            return page, len(self.names) > offset + limit
+
+        results = []
+        seen = set()
+
+        def add(name):
+            if name not in seen:
+                seen.add(name)
+                results.append(name)
+            return len(results) >= wanted
+
+        lo, hi = self._prefix_range(self.lower_keys, query)
+        for _, name in self.sorted_lower[lo:hi]:
+            if add(name):
+                break
+
+        if len(results) < wanted:
+            lo, hi = self._prefix_range(self.sorted_tokens, query)
+            for token in self.sorted_tokens[lo:hi]:
+                if any(add(name) for name in self.token_names[token]):
+                    break
+
+        if len(results) < wanted and len(query) >= 3:
+            for name, _ in self.fuzzy_matches(query, limit=wanted, cutoff=SUGGEST_CUTOFF):
+                if add(name):
+                    break
+
+        return results[offset:offset + limit], len(results) > offset + limit
+
+    def search(self, question, limit=5, cutoff=FUZZY_CUTOFF):
+        """
+        Rank candidate repos for a question.
+
+        Returns:
+            List of (repo_name, score) tuples. Exact mentions score 1.0 and
+            come first; fuzzy candidates follow with their trigram score.
+        """
+        match = re.search(r"in repo (\S+)", question.lower())
+        if match and match.group(1) in self.by_lower:
+            return [(self.by_lower[match.group(1)], 1.0)]
+
+        ranked = [(name, 1.0) for name in self.exact_matches(question)[:limit]]
+        if ranked:
+            return ranked
+
+        # Score each question token (and adjacent pairs) separately, a whole
+        # question compared against a short name would never pass the cutoff
+        tokens = [t for t in tokenize_name(question) if len(t) >= 3 and t not in STOPWORDS]
+        windows = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        best = {}
+        for window in windows:
+            for name, score in self.fuzzy_matches(window, limit=limit, cutoff=cutoff):
+                if score > best.get(name, 0):
+                    best[name] = score
+        return sorted(best.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+# -------------------------------
+# Shared index instance
+# -------------------------------
+_index = None
+_index_signature = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def _table_signature(cur):
+    """Cheap fingerprint of the repo table used to detect ingestion from other processes."""
+    cur.execute(f"SELECT COUNT(*), COALESCE(MAX(id), 0) FROM {TABLE}")
+    return tuple(cur.fetchone())
+
+
+def refresh_repo_index(cur=None, repo_names=None):
+    """
+    Rebuild the shared index. Called by ingestion once new repos are stored.
+
+    Args:
+        cur: Database cursor; a pooled connection is borrowed when omitted
+        repo_names: Optional explicit list of names, skips the DB read
+    """
+    global _index, _index_signature, _index_checked_at
+
+    signature = None
+    if repo_names is None:
+        if cur is None:
+            with db_cursor() as own_cur:
+                return refresh_repo_index(cur=own_cur)
+        signature = _table_signature(cur)
+        repo_names = get_all_repo_names(cur)
+    index = RepoNameIndex(repo_names)
+
+    with _index_lock:
+        _index = index
+        _index_signature = signature
+        _index_checked_at = time.monotonic()
+    return index
+
+
+def is_repo_index_loaded():
+    return _index is not None
+
+
+def get_repo_index(cur=None):
+    """
+    Return the shared index, building it on first use.
+
+    At most once every REPO_INDEX_TTL seconds the repo table signature is
+    compared against the one the index was built from, so repos ingested by
+    another process are picked up without a restart.
+    """
+    global _index_checked_at
+
+    if _index is None:
+        return refresh_repo_index(cur=cur)
+
+    if time.monotonic() - _index_checked_at < REPO_INDEX_TTL:
+        return _index
+
+    if cur is None:
+        with db_cursor() as own_cur:
+            return get_repo_index(cur=own_cur)
+
+    with _index_lock:
+        _index_checked_at = time.monotonic()
+    if _table_signature(cur) != _index_signature:
+        return refresh_repo_index(cur=cur)
+    return _index
@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from .metrics import record_cache
+
+# -------------------------------
+# Shared on-disk cache tier
+# -------------------------------
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "cmdb_chatbot_cache.sqlite3"))
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "1") != "0"
+PRUNE_EVERY = 500  # writes between sweeps of expired rows
+
+# Default time-to-live per namespace, in seconds
+NAMESPACE_TTLS = {
+    "answers": 24 * 3600,
+    "embeddings": 7 * 24 * 3600,
+    "metadata": 300,
+    "streams": 600,
+    "versions": 30 * 24 * 3600,
+}
+
+# Bumped by ingestion once the analytics views are refreshed; memoized figures built before are stale
+METRICS_VIEWS_VERSION_KEY = "metrics_views"
+
+KEY_SEPARATOR = "\x1f"
+
+
+def make_key(*parts):
+    return KEY_SEPARATOR.join(str(p) for p in parts)
+
+
+class SharedCache:
+    """
+    Small key/value store shared by every worker process on a host.
+
+    Backed by one SQLite file in WAL mode, so gunicorn workers (and restarted
+    workers) see each other's answers, question embeddings, repo metadata and
+    answer streams.
+    Values are stored as JSON. Failures are logged and treated as misses so
+    the cache can never break a request.
+    """
+
+    def __init__(self, path=SHARED_CACHE_PATH, enabled=SHARED_CACHE_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self.local = threading.local()
+        self.writes = 0
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                ) WITHOUT ROWID
+            """)
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace, key):
+        if not self.enabled:
+            return None
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print("❌ Shared cache read failed:", e)
+            return None
+        hit = row is not None and row[1] >= time.time()
+        record_cache(f"shared_{namespace}", hit)
+        return json.loads(row[0]) if hit else None
+
+    def set(self, namespace, key, value, ttl=None):
+        if not self.enabled:
+            return
+        ttl = ttl if ttl is not None else NAMESPACE_TTLS.get(namespace, 3600)
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), time.time() + ttl)
+            )
+        except (sqlite3.Error, TypeError) as e:
+            print("❌ Shared cache write failed:", e)
+            return
+
+        self.writes += 1
+        if self.writes % PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete_prefix(self, namespace, prefix):
+        """Delete every key in a namespace starting with prefix (e.g. all answers of a repo)."""
+        if not self.enabled:
+            return
+        try:
+            self._conn().execute(
+                "DELETE FROM cache WHERE namespace = ? AND substr(key, 1, ?) = ?",
+                (namespace, len(prefix), prefix)
+            )
+        except sqlite3.Error as e:
+            print("❌ Shared cache delete failed:", e)
+
+    def prune(self):
+        try:
+            self._conn().execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+        except sqlite3.Error as e:
+            print("❌ Shared cache prune failed:", e)
+
+
+shared_cache = SharedCache()
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescing stays within one process
+    fcntl = None
+
+# -------------------------------
+# Request coalescing
+# -------------------------------
+SINGLE_FLIGHT_DIR = os.getenv("SINGLE_FLIGHT_DIR", os.path.join(tempfile.gettempdir(), "cmdb_chatbot_flights"))
+SHARED_RESULT_TTL = 30    # seconds a finished result is handed to waiters in other workers
+FLIGHT_WAIT_TIMEOUT = 300 # seconds to wait for another worker before computing anyway
+LOCK_POLL_INTERVAL = 0.05
+PRUNE_EVERY = 200         # result writes between sweeps of expired result files
+
+
+WAIT_POLL_INTERVAL = 0.1
+
+
+class Flight:
+    """One in-flight computation; followers wait on it and receive its tokens."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.tokens = []
+        self.subscribers = []
+        self.cancel_events = []
+        self.lock = threading.Lock()
+
+    def join(self, cancel_event):
+        """Register a caller; None means the caller can never cancel."""
+        with self.lock:
+            self.cancel_events.append(cancel_event)
+
+    def cancelled(self):
+        """True once every caller interested in this flight has cancelled."""
+        with self.lock:
+            return all(e is not None and e.is_set() for e in self.cancel_events)
+
+    def subscribe(self, on_token):
+        """Replay the tokens produced so far, then forward new ones."""
+        if on_token is None:
+            return
+        with self.lock:
+            for token in self.tokens:
+                on_token(token)
+            self.subscribers.append(on_token)
+
+    def publish(self, token):
+        with self.lock:
+            self.tokens.append(token)
+            subscribers = list(self.subscribers)
+        for on_token in subscribers:
+            try:
+                on_token(token)
+            except Exception as e:
+                print("❌ Token subscriber failed:", e)
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+    def wait(self, cancel_event=None, cancelled_error=None):
+        while not self.done.wait(WAIT_POLL_INTERVAL):
+            if cancel_event is not None and cancel_event.is_set():
+                raise cancelled_error or RuntimeError("Cancelled")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one computation.
+
+    Within a process, duplicates wait on the first caller's Flight and share
+    its tokens and result. Across worker processes on the same host, the
+    leader holds an flock on a per-key lock file while computing and writes
+    the result next to it; a leader in another worker blocks on that lock and
+    reuses the fresh result instead of computing it again.
+    """
+
+    def __init__(self, lock_dir=SINGLE_FLIGHT_DIR, cross_process=True):
+        self.lock_dir = lock_dir
+        self.cross_process = cross_process and fcntl is not None
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.writes = 0
+        if self.cross_process:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, func, on_token=None, cancel_event=None, cancelled_error=None):
+        """
+        Run func(publish, should_cancel) once per key and return its result to every caller.
+
+        Args:
+            key: Hashable, JSON-serializable identity of the request
+            func: Called by the leader only, with a publish(token) callback and
+                a should_cancel() callable that turns True once every caller
+                waiting on this key has cancelled
+            on_token: Optional callback receiving the leader's tokens
+            cancel_event: Optional threading.Event set when this caller gives up
+            cancelled_error: Exception a cancelled follower raises
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = Flight()
+                self.flights[key] = flight
+            flight.join(cancel_event)
+        flight.subscribe(on_token)
+
+        if not leader:
+            return flight.wait(cancel_event, cancelled_error)
+
+        try:
+            result = self._lead(key, flight, func)
+        except BaseException as e:
+            flight.finish(error=e)
+            raise
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+        flight.finish(result=result)
+        return result
+
+    def _lead(self, key, flight, func):
+        if not self.cross_process:
+            return func(flight.publish, flight.cancelled)
+
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+        lock_path = os.path.join(self.lock_dir, f"{digest}.lock")
+        result_path = os.path.join(self.lock_dir, f"{digest}.json")
+
+        while True:
+            handle = open(lock_path, "a+")
+            locked, waited = self._acquire(handle, flight.cancelled)
+            if not locked or self._same_file(handle, lock_path):
+                break
+            # _prune removed the file between our open and flock; lock the new one instead
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+        with handle:
+            try:
+                # Only reuse a result when this call overlapped another worker's
+                shared = self._read_result(result_path) if waited else None
+                if shared is not None:
+                    return shared
+                result = func(flight.publish, flight.cancelled)
+                if locked:
+                    self._write_result(result_path, result)
+                return result
+            finally:
+                if locked:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _same_file(handle, path):
+        try:
+            return os.fstat(handle.fileno()).st_ino == os.stat(path).st_ino
+        except OSError:
+            return False
+
+    def _acquire(self, handle, should_cancel):
+        """
+        Wait for another worker's computation of the same key, up to FLIGHT_WAIT_TIMEOUT.
+
+        Returns:
+            Tuple of (lock acquired, had to wait for another worker)
+        """
+        deadline = time.monotonic() + FLIGHT_WAIT_TIMEOUT
+        waited = False
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True, waited
+            except BlockingIOError:
+                # Give up waiting; func sees should_cancel() and stops at once
+                if time.monotonic() >= deadline or should_cancel():
+                    return False, True
+                waited = True
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    def _read_result(self, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - data.get("created", 0) > SHARED_RESULT_TTL:
+            return None
+        return data.get("result")
+
+    def _write_result(self, path, result):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"created": time.time(), "result": result}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            print("❌ Failed to share result with other workers:", e)
+
+        self.writes += 1
+        if self.writes % PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune(self):
+        """Remove expired result files and the lock files no worker holds."""
+        cutoff = time.time() - SHARED_RESULT_TTL
+        for name in os.listdir(self.lock_dir):
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                if name.endswith(".json"):
+                    os.remove(path)
+                elif name.endswith(".lock"):
+                    self._remove_unheld_lock(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _remove_unheld_lock(path):
+        # A leader that opened the file before the removal notices in _lead and reopens it
+        with open(path, "a+") as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                os.remove(path)
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
@@ -0,0 +1,297 @@
+"""
+Ingestion benchmarks over synthetic repositories.
+
+Run from the cmdb_chatbot folder:
+    python -m benchmarks.bench_ingest                       # run and compare with baseline.json
+    python -m benchmarks.bench_ingest --save-baseline       # record a new baseline
+    python -m benchmarks.bench_ingest --only analyze_repo chunk_text_by_tokens
+
+Each benchmark runs in a fresh process so its peak RSS is its own. The DB
+benchmarks need the database from db_config and are skipped when it is not
+reachable; they only touch rows of the generated bench_repo_* repos. The
+embedding API is replaced by deterministic random vectors unless
+--real-embeddings is given, so the numbers measure ingestion, not the API.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.synthetic_repos import generate_repos, parse_languages
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+REGRESSION_TOLERANCE = 0.2  # relative slowdown (or RSS growth) reported as a regression
+EMBEDDING_DIM = 3072        # matches vector(3072) in the chunks table
+REPO_PREFIX = "bench_repo"
+
+# Higher is better for throughput, lower is better for memory
+THROUGHPUT_KEYS = ("commits_per_sec", "repos_per_sec", "chunks_per_sec", "mb_per_sec")
+MEMORY_KEYS = ("peak_rss_mb",)
+
+
+def fake_embedding(text):
+    """Deterministic stand-in for the embedding API."""
+    seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:4], "little")
+    return np.random.default_rng(seed).random(EMBEDDING_DIM, dtype=np.float32).tolist()
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _repo_paths(repos_folder):
+    return sorted(os.path.join(repos_folder, name) for name in os.listdir(repos_folder)
+                  if name.startswith(REPO_PREFIX))
+
+
+def _analyzed(repos_folder):
+    from backend.git_utils import analyze_repo
+    return [analyze_repo(path) for path in _repo_paths(repos_folder)]
+
+
+# -------------------------------
+# Benchmarks
+# -------------------------------
+def bench_analyze_repo(repos_folder, options):
+    from backend.git_utils import analyze_repo
+    paths = _repo_paths(repos_folder)
+    start = time.perf_counter()
+    commits = sum(analyze_repo(path)["total_commits"] for path in paths)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "commits_per_sec": commits / elapsed, "repos_per_sec": len(paths) / elapsed}
+
+
+def bench_language_profile(repos_folder, options):
+    """Lines-of-code profiling alone, over the files analyze_repo would walk."""
+    from backend.language_profiler import profile_languages
+    trees = []
+    for path in _repo_paths(repos_folder):
+        files = [os.path.relpath(os.path.join(root, f), path)
+                 for root, _, names in os.walk(path) if ".git" not in root for f in names]
+        trees.append((path, files))
+    for path, files in trees:
+        profile_languages(path, files)  # warm the page cache so the numbers measure counting, not the disk
+
+    rounds = options["rounds"]
+    start = time.perf_counter()
+    size = sum(entry["bytes"] for _ in range(rounds) for path, files in trees
+               for entry in profile_languages(path, files).values())
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "mb_per_sec": size / (1024 * 1024) / elapsed,
+            "repos_per_sec": rounds * len(trees) / elapsed}
+
+
+def bench_prepare_text_for_embedding(repos_folder, options):
+    from backend.git_utils import prepare_text_for_embedding
+    infos = _analyzed(repos_folder)
+    rounds = options["rounds"]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for info in infos:
+            prepare_text_for_embedding(info)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "repos_per_sec": rounds * len(infos) / elapsed}
+
+
+def bench_chunk_text_by_tokens(repos_folder, options):
+    from backend.git_utils import prepare_text_for_embedding
+    from backend.ai_utils import chunk_text_by_tokens
+    texts = [prepare_text_for_embedding(info) for info in _analyzed(repos_folder)]
+    rounds = options["rounds"]
+    start = time.perf_counter()
+    chunks = sum(len(chunk_text_by_tokens(text)) for _ in range(rounds) for text in texts)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "chunks_per_sec": chunks / elapsed, "repos_per_sec": rounds * len(texts) / elapsed}
+
+
+def bench_db_write(repos_folder, options):
+    """Insert metadata and chunk rows in one transaction, then roll it back."""
+    from backend.db_utils import db_connection, insert_repo_metadata, insert_repo_chunk_embedding
+    infos = _analyzed(repos_folder)
+    chunks_per_repo = options["chunks_per_repo"]
+    embedding = fake_embedding("db_write")
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            for info in infos:
+                insert_repo_metadata(cur, info, embedding)
+                for i in range(chunks_per_repo):
+                    insert_repo_chunk_embedding(cur, info["repo_name"], info["commit_hash"],
+                                                info["commit_messages"], i, "", f"chunk {i}", embedding)
+            elapsed = time.perf_counter() - start
+        conn.rollback()
+    chunks = len(infos) * chunks_per_repo
+    return {"seconds": elapsed, "chunks_per_sec": chunks / elapsed, "repos_per_sec": len(infos) / elapsed}
+
+
+def bench_analyze_repos(repos_folder, options):
+    """End-to-end ingestion; the bench_repo_* rows it writes are deleted afterwards."""
+    from backend import ai_utils
+    from backend.main_back import analyze_repos
+    from backend.db_utils import db_cursor, refresh_metrics_views, REPO_TABLES
+
+    if not options["real_embeddings"]:
+        ai_utils.get_embedding = fake_embedding
+
+    # analyze_repos writes its CSV export to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench_csv_"))
+    try:
+        start = time.perf_counter()
+        df = analyze_repos(repos_folder)
+        elapsed = time.perf_counter() - start
+    finally:
+        with db_cursor(commit=True) as cur:
+            # Leftover ingest state would make the next run take the incremental path
+            for table in REPO_TABLES:
+                cur.execute(f"DELETE FROM {table} WHERE repo_name LIKE %s", (f"{REPO_PREFIX}_%",))
+            refresh_metrics_views(cur)
+
+    return {"seconds": elapsed, "commits_per_sec": int(df["total_commits"].sum()) / elapsed,
+            "repos_per_sec": len(df) / elapsed}
+
+
+BENCHMARKS = {
+    "analyze_repo": (bench_analyze_repo, False),
+    "language_profile": (bench_language_profile, False),
+    "prepare_text_for_embedding": (bench_prepare_text_for_embedding, False),
+    "chunk_text_by_tokens": (bench_chunk_text_by_tokens, False),
+    "db_write": (bench_db_write, True),
+    "analyze_repos": (bench_analyze_repos, True),
+}
+
+
+def _run_in_child(name, repos_folder, options):
+    func, _ = BENCHMARKS[name]
+    result = func(repos_folder, options)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _database_available():
+    try:
+        from backend.db_utils import db_cursor
+        with db_cursor() as cur:
+            cur.execute("SELECT 1")
+        return True
+    except Exception as e:
+        print("⚠️ Database not reachable, skipping DB benchmarks:", e)
+        return False
+
+
+def run_benchmarks(repos_folder, names, options):
+    """Run each named benchmark in its own spawned process and collect the results."""
+    db_ok = None
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        if BENCHMARKS[name][1]:
+            db_ok = _database_available() if db_ok is None else db_ok
+            if not db_ok:
+                continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                results[name] = pool.submit(_run_in_child, name, repos_folder, options).result()
+            except Exception as e:
+                print(f"❌ Benchmark {name} failed:", e)
+                continue
+        print(f"⏱ {name}: " + ", ".join(f"{k}={v:,.2f}" for k, v in results[name].items()))
+    return results
+
+
+# -------------------------------
+# Baseline comparison
+# -------------------------------
+def compare_with_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compare results with a stored baseline.
+
+    Returns:
+        List of regression messages; empty when nothing regressed
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for key, value in metrics.items():
+            if key not in base or not base[key]:
+                continue
+            change = value / base[key] - 1
+            if key in THROUGHPUT_KEYS and change < -tolerance:
+                regressions.append(f"{name}.{key}: {value:,.2f} vs baseline {base[key]:,.2f} ({change:+.0%})")
+            elif key in MEMORY_KEYS and change > tolerance:
+                regressions.append(f"{name}.{key}: {value:,.2f} vs baseline {base[key]:,.2f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark repository ingestion")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument("--repos", type=int, default=5)
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=20)
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--languages", default="py:5,js:3,md:1")
+    parser.add_argument("--rounds", type=int, default=20, help="Repetitions of the fast text benchmarks")
+    parser.add_argument("--chunks-per-repo", type=int, default=20)
+    parser.add_argument("--real-embeddings", action="store_true", help="Call the embedding API")
+    parser.add_argument("--repos-folder", help="Reuse repos generated by benchmarks.synthetic_repos")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    shape = {"repos": args.repos, "commits": args.commits, "authors": args.authors,
+             "files": args.files, "languages": args.languages}
+    options = {"rounds": args.rounds, "chunks_per_repo": args.chunks_per_repo,
+               "real_embeddings": args.real_embeddings}
+
+    repos_folder = args.repos_folder
+    if repos_folder is None:
+        repos_folder = tempfile.mkdtemp(prefix="bench_repos_")
+        generate_repos(repos_folder, count=args.repos, prefix=REPO_PREFIX, commits=args.commits,
+                       authors=args.authors, files=args.files, languages=parse_languages(args.languages))
+    try:
+        results = run_benchmarks(repos_folder, args.only or list(BENCHMARKS), options)
+    finally:
+        if args.repos_folder is None:
+            shutil.rmtree(repos_folder, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"shape": shape, "options": options, "results": results}, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ No baseline found, run with --save-baseline to record one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("shape") != shape:
+        print("⚠️ Baseline was recorded with a different repo shape, numbers are not comparable")
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    for message in regressions:
+        print("❌ Regression:", message)
+    if regressions:
+        sys.exit(1)
+    print("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Routing check of extract_intent against a table of known questions.
+
+Run from the cmdb_chatbot folder:
+    python -m benchmarks.eval_intents
+
+Each case pins the intent a question must reach, and for rankings the N
+that extract_top_n reads. Phrase lists overlap, so a new phrase for one
+intent can take questions away from another; add the question that
+motivated a change here. Exits non-zero when any case is routed wrongly.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backend.nlp_utils import extract_intent, extract_top_n
+
+# (question, expected intent, expected top N or None when not a ranking)
+ROUTING_CASES = [
+    # Rankings of people, with and without N
+    ("top 5 contributors", "most_active", 5),
+    ("who are the top 5 contributors", "most_active", 5),
+    ("top 10 authors in foo", "most_active", 10),
+    ("3 most active developers in foo", "most_active", 3),
+    ("who is the top contributor of foo", "most_active", 5),
+    ("who was the most active contributor last month", "most_active", 5),
+    ("leaderboard for foo", "most_active", 5),
+    # Counts are never rankings
+    ("how many contributors does foo have", "commit_count", None),
+    ("number of committers in foo", "commit_count", None),
+    ("how many commits does foo have", "commit_count", None),
+    # One author
+    ("how many commits did alice make", "author_stats", None),
+    ("contributions of bob@example.com", "author_stats", None),
+    # Time windows only when nothing more specific matched
+    ("how many commits last month", "contribution_trend", None),
+    ("show the commit trend of foo", "contribution_trend", None),
+    ("what version was released last year", "version", None),
+    ("which files changed most last quarter", "hotspots", None),
+    # Dependencies
+    ("how many repos use django", "dependencies", None),
+    ("which repos depend on numpy", "dependencies", None),
+    ("what languages is foo written in", "languages", None),
+]
+
+
+def main():
+    failures = 0
+    for question, intent, top_n in ROUTING_CASES:
+        got = extract_intent(question)
+        got_n = extract_top_n(question) if intent == "most_active" else None
+        if got != intent or got_n != top_n:
+            failures += 1
+            print(f"❌ {question!r}: intent {got} (expected {intent}), top N {got_n} (expected {top_n})")
+    print(f"{len(ROUTING_CASES) - failures}/{len(ROUTING_CASES)} routing cases pass")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Recall and latency evaluation of chunk retrieval, exact vs approximate.
+
+Run from the cmdb_chatbot folder:
+    python -m benchmarks.eval_retrieval --synthetic 200
+    python -m benchmarks.eval_retrieval --labels labeled.jsonl --top-k 5 10 20 --thresholds 0 0.5 0.8 \\
+        --index exact "hnsw:m=16,ef_construction=64,ef_search=40" "hnsw:m=16,ef_construction=64,ef_search=100" \\
+        "ivfflat:lists=100,probes=10" "two_level:repos=5"
+
+Labeled sets are JSON lines: {"question": "...", "relevant_ids": [chunk ids]}.
+Synthetic sets are sampled from the ingested chunks: "noise" queries are a
+chunk's own embedding plus gaussian noise (no API calls), "text" queries
+embed a random passage of the chunk. Either way the source chunk is the
+relevant one.
+
+"exact" runs query_similar_chunks unchanged. ANN indexes can't be built on
+vector(3072) (pgvector indexes stop at 2000 dimensions), so approximate runs
+index embedding::halfvec(3072). Each index is built inside a transaction
+that is rolled back, so nothing is left behind, but the chunks table is
+locked against writes while an index is evaluated.
+
+"two_level" ranks repos by their repo-level embedding and searches only the
+chunks of the best `repos` of them, as questions that name no repo do; its
+overlap shows how often the exact answer lies outside those repos.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backend.db_utils import db_connection, query_similar_chunks, rank_similar_repos, TABLE
+
+DEFAULT_TOP_K = [5, 10, 20]
+DEFAULT_THRESHOLDS = [0.0, 0.8]
+DEFAULT_INDEXES = ["exact", "hnsw:m=16,ef_construction=64,ef_search=40",
+                   "hnsw:m=16,ef_construction=64,ef_search=100", "ivfflat:lists=100,probes=10", "two_level:repos=5"]
+CANDIDATE_FACTOR = 10   # ANN candidates fetched per requested result, before re-ranking
+PASSAGE_WORDS = 30      # words of a chunk used as a synthetic "text" question
+EMBEDDING_DIM = 3072
+
+# Build-time and query-time parameters of each index type, with pgvector's defaults
+INDEX_PARAMS = {
+    "hnsw": ({"m": 16, "ef_construction": 64}, {"ef_search": 40}),
+    "ivfflat": ({"lists": 100}, {"probes": 1}),
+    "two_level": ({}, {"repos": 5}),
+}
+
+
+# -------------------------------
+# Eval sets
+# -------------------------------
+def _parse_vector(text):
+    return json.loads(text) if isinstance(text, str) else list(text)
+
+
+def load_labeled_set(path):
+    """Read a JSON lines eval set and embed its questions."""
+    from backend.ai_utils import get_question_embedding
+    queries = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            queries.append({
+                "question": item["question"],
+                "embedding": item.get("embedding") or get_question_embedding(item["question"]),
+                "relevant_ids": set(item["relevant_ids"]),
+            })
+    return queries
+
+
+def generate_synthetic_set(cur, size, mode="noise", noise=0.3, seed=0):
+    """
+    Sample chunks and turn each into a query whose relevant answer is that chunk.
+
+    Args:
+        cur: Database cursor
+        size: Number of queries
+        mode: "noise" perturbs the chunk embedding, "text" embeds a passage of the chunk
+        noise: Standard deviation of the noise, relative to the embedding norm
+        seed: Random seed for sampling and noise
+    """
+    cur.execute("SELECT setseed(%s)", (seed / 2**31,))
+    cur.execute(f"SELECT id, text_chunk, embedding::text FROM {TABLE}_chunks ORDER BY random() LIMIT %s", (size,))
+    rows = cur.fetchall()
+    rng = np.random.default_rng(seed)
+    queries = []
+
+    for chunk_id, text, embedding in rows:
+        if mode == "text":
+            from backend.ai_utils import get_embedding
+            words = (text or "").split()
+            start = random.Random(seed + chunk_id).randint(0, max(len(words) - PASSAGE_WORDS, 0))
+            question = " ".join(words[start:start + PASSAGE_WORDS])
+            query = get_embedding(question)
+        else:
+            vector = np.asarray(_parse_vector(embedding), dtype=np.float32)
+            scale = noise * np.linalg.norm(vector) / np.sqrt(len(vector))
+            query = (vector + rng.normal(0, scale, len(vector))).tolist()
+            question = f"noisy chunk {chunk_id}"
+        queries.append({"question": question, "embedding": query, "relevant_ids": {chunk_id}})
+    return queries
+
+
+# -------------------------------
+# Retrieval
+# -------------------------------
+def parse_index_spec(spec):
+    """Parse "hnsw:m=16,ef_search=40" into (kind, build params, query params)."""
+    kind, _, params = spec.partition(":")
+    if kind == "exact":
+        return kind, {}, {}
+    if kind not in INDEX_PARAMS:
+        raise ValueError(f"Unknown index type '{kind}', expected exact, hnsw, ivfflat or two_level")
+    build, query = (dict(d) for d in INDEX_PARAMS[kind])
+    for pair in filter(None, params.split(",")):
+        key, _, value = pair.partition("=")
+        if key in build:
+            build[key] = int(value)
+        elif key in query:
+            query[key] = int(value)
+        else:
+            raise ValueError(f"Unknown {kind} parameter '{key}'")
+    return kind, build, query
+
+
+def create_ann_index(cur, kind, build):
+    """Build the index inside the current transaction; returns the build time in seconds."""
+    options = ", ".join(f"{key} = {int(value)}" for key, value in build.items())
+    start = time.perf_counter()
+    cur.execute(f"""
+        CREATE INDEX eval_chunks_ann ON {TABLE}_chunks
+        USING {kind} ((embedding::halfvec({EMBEDDING_DIM})) halfvec_l2_ops)
+        WITH ({options});
+    """)
+    return time.perf_counter() - start
+
+
+def query_similar_chunks_ann(cur, query_embedding, top_k=5, similarity_threshold=0.8):
+    """
+    query_similar_chunks with candidates taken from the halfvec ANN index.
+
+    The nearest CANDIDATE_FACTOR * top_k chunks by index order are re-scored
+    with the full-precision distance and ranked with the same boosts.
+    """
+    vector_literal = "[" + ",".join(map(str, query_embedding)) + "]"
+    cur.execute(f"""
+        WITH candidates AS (
+            SELECT id, file_path, chunk_index,
+                   1 - (embedding <-> %(q)s::vector) AS similarity_score
+            FROM {TABLE}_chunks
+            ORDER BY embedding::halfvec({EMBEDDING_DIM}) <-> %(q)s::halfvec({EMBEDDING_DIM})
+            LIMIT %(candidates)s
+        )
+        SELECT id, similarity_score
+            * CASE
+                WHEN file_path ~* '\\.(py|js|java|cpp|h|cs|go|rs|sql)$' THEN 1.2
+                WHEN file_path ~* '\\.(md|txt|rst|yaml|json|xml)$' THEN 1.1
+                ELSE 1.0
+              END
+            * CASE
+                WHEN chunk_index >= 0 THEN 1 + (0.1 * (1.0 / (chunk_index + 1)))
+                ELSE 1.0
+              END AS final_score
+        FROM candidates
+        WHERE similarity_score > %(threshold)s
+        ORDER BY final_score DESC
+        LIMIT %(top_k)s;
+    """, {"q": vector_literal, "candidates": top_k * CANDIDATE_FACTOR,
+          "threshold": similarity_threshold, "top_k": top_k})
+    return [{"id": r[0], "final_score": r[1]} for r in cur.fetchall()]
+
+
+def two_level_search(repos):
+    """query_similar_chunks restricted to the repos closest to the query, as in qa_utils._vector_search."""
+    def search(cur, query_embedding, top_k=5, similarity_threshold=0.8):
+        repo_names = rank_similar_repos(cur, query_embedding, limit=repos) or None
+        return query_similar_chunks(cur, query_embedding, top_k=top_k, similarity_threshold=similarity_threshold,
+                                    repo_names=repo_names)
+    return search
+
+
+# -------------------------------
+# Metrics
+# -------------------------------
+def recall_at_k(retrieved_ids, relevant_ids):
+    return len(set(retrieved_ids) & relevant_ids) / len(relevant_ids) if relevant_ids else 0.0
+
+
+def reciprocal_rank(retrieved_ids, relevant_ids):
+    for rank, chunk_id in enumerate(retrieved_ids, 1):
+        if chunk_id in relevant_ids:
+            return 1.0 / rank
+    return 0.0
+
+
+def run_config(cur, queries, search, top_k, threshold, exact_results=None):
+    """
+    Run every query with one setting.
+
+    Returns:
+        Tuple of (summary dict, list of retrieved id lists)
+    """
+    latencies, recalls, ranks, overlaps, retrieved = [], [], [], [], []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        rows = search(cur, query["embedding"], top_k=top_k, similarity_threshold=threshold)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        ids = [row["id"] for row in rows]
+        retrieved.append(ids)
+        recalls.append(recall_at_k(ids, query["relevant_ids"]))
+        ranks.append(reciprocal_rank(ids, query["relevant_ids"]))
+        if exact_results is not None:
+            # How much of the exact answer the approximate search returns
+            exact = set(exact_results[i])
+            overlaps.append(len(exact & set(ids)) / len(exact) if exact else 1.0)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    summary = {
+        "recall_at_k": float(np.mean(recalls)),
+        "mrr": float(np.mean(ranks)),
+        "exact_overlap": float(np.mean(overlaps)) if overlaps else 1.0,
+        "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+    }
+    return summary, retrieved
+
+
+def evaluate(conn, queries, top_ks, thresholds, index_specs):
+    """Sweep settings; exact results are kept as the reference for approximate runs."""
+    results = []
+    exact_reference = {}
+    report_exact = "exact" in index_specs
+    with conn.cursor() as cur:
+        for top_k in top_ks:
+            for threshold in thresholds:
+                summary, exact_reference[(top_k, threshold)] = run_config(
+                    cur, queries, query_similar_chunks, top_k, threshold)
+                if report_exact:
+                    results.append(dict(index="exact", top_k=top_k, threshold=threshold, **summary))
+
+        for spec in index_specs:
+            kind, build, query_params = parse_index_spec(spec)
+            if kind == "exact":
+                continue
+            try:
+                if kind == "two_level":
+                    build_seconds, search = 0.0, two_level_search(query_params["repos"])
+                else:
+                    build_seconds, search = create_ann_index(cur, kind, build), query_similar_chunks_ann
+                    for key, value in query_params.items():
+                        cur.execute(f"SET LOCAL {kind}.{key} = {int(value)}")
+                for top_k in top_ks:
+                    for threshold in thresholds:
+                        summary, _ = run_config(cur, queries, search, top_k, threshold,
+                                                exact_results=exact_reference[(top_k, threshold)])
+                        results.append(dict(index=spec, top_k=top_k, threshold=threshold,
+                                            build_s=build_seconds, **summary))
+            except Exception as e:
+                print(f"❌ Index {spec} failed:", e)
+            finally:
+                # Drops the index and the SET LOCAL settings
+                conn.rollback()
+    return results
+
+
+def print_results(results):
+    header = f"{'index':<48} {'top_k':>5} {'thresh':>6} {'recall':>7} {'mrr':>6} {'overlap':>7} " \
+             f"{'p50ms':>7} {'p95ms':>7} {'p99ms':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['index']:<48} {r['top_k']:>5} {r['threshold']:>6.2f} {r['recall_at_k']:>7.3f} "
+              f"{r['mrr']:>6.3f} {r['exact_overlap']:>7.3f} {r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} "
+              f"{r['p99_ms']:>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval recall and latency")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--labels", help="JSON lines file of questions and relevant chunk ids")
+    source.add_argument("--synthetic", type=int, help="Number of queries to sample from the chunks")
+    parser.add_argument("--mode", choices=["noise", "text"], default="noise", help="Synthetic query type")
+    parser.add_argument("--noise", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top-k", type=int, nargs="+", default=DEFAULT_TOP_K)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--index", nargs="+", default=DEFAULT_INDEXES,
+                        help='"exact", "hnsw:m=..,ef_construction=..,ef_search=..", "ivfflat:lists=..,probes=.." '
+                             'or "two_level:repos=.."')
+    parser.add_argument("--output", help="Write the results to a .json or .csv file")
+    args = parser.parse_args()
+
+    for spec in args.index:
+        parse_index_spec(spec)
+
+    with db_connection() as conn:
+        if args.labels:
+            queries = load_labeled_set(args.labels)
+        else:
+            with conn.cursor() as cur:
+                queries = generate_synthetic_set(cur, args.synthetic, args.mode, args.noise, args.seed)
+            conn.rollback()
+        if not queries:
+            print("❌ No queries to evaluate")
+            return
+        print(f"Evaluating {len(queries)} queries...")
+        results = evaluate(conn, queries, args.top_k, args.thresholds, args.index)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            if args.output.endswith(".csv"):
+                writer = csv.DictWriter(f, fieldnames=sorted({k for r in results for k in r}))
+                writer.writeheader()
+                writer.writerows(results)
+            else:
+                json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
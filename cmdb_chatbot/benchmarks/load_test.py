@@ -0,0 +1,269 @@
+"""
+Concurrent load test of the dashboard's Dash callback endpoint.
+
+Start the stub AI server and the app against it, then run from the cmdb_chatbot folder:
+    python -m benchmarks.stub_ai_server --port 8099 &
+    AI_BASE_URL=http://127.0.0.1:8099 gunicorn -c gunicorn.conf.py &
+    python -m benchmarks.load_test --url http://127.0.0.1:8050 --concurrency 20 --rate 5 --duration 60 \\
+        --output results/load_v2.json --compare results/load_v1.json
+
+Each simulated user either asks a question (ask-btn, then polls the answer
+panel the way the browser's interval does until the answer is done) or
+changes the analytics repo selection. Latency is measured from the
+scheduled start of a request, so queueing inside the load generator counts
+against the server when it can't keep up with the arrival rate.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+POLL_INTERVAL = 0.1   # matches the stream-interval component
+ASK_TIMEOUT = 300     # seconds before an unfinished answer counts as an error
+
+# (weight, question template); {repo} is replaced by a random repo
+DEFAULT_MIX = [
+    (3, "How many commits does {repo} have?"),
+    (2, "Who is the most active contributor in {repo}?"),
+    (2, "What languages is {repo} written in?"),
+    (2, "Explain what {repo} does"),
+    (1, "Summarize the recent changes in {repo}"),
+]
+DEFAULT_ANALYTICS_SHARE = 0.3  # users changing the analytics selection instead of asking
+
+
+class DashClient:
+    """Calls Dash callbacks over HTTP the way the dash renderer does."""
+
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.local = threading.local()
+        self.callbacks = {}
+        for callback in self._session().get(f"{self.url}/_dash-dependencies", timeout=timeout).json():
+            for item in callback["inputs"]:
+                self.callbacks[f"{item['id']}.{item['property']}"] = callback
+
+    def _session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    @staticmethod
+    def _outputs(output):
+        if not output.startswith(".."):
+            return {"id": output.split(".", 1)[0], "property": output.split(".", 1)[1]}
+        return [{"id": part.split(".", 1)[0], "property": part.split(".", 1)[1]}
+                for part in output[2:-2].split("...")]
+
+    def call(self, trigger, value, state=None):
+        """
+        Trigger the callback whose input is trigger ("component.property").
+
+        Args:
+            trigger: Input that changed
+            value: Its new value
+            state: Mapping of "component.property" to the State values to send
+
+        Returns:
+            The callback's response dict, keyed by component id
+        """
+        callback = self.callbacks[trigger]
+        state = state or {}
+        inputs = [{"id": item["id"], "property": item["property"],
+                   "value": value if f"{item['id']}.{item['property']}" == trigger else None}
+                  for item in callback["inputs"]]
+        states = [{"id": item["id"], "property": item["property"],
+                   "value": state.get(f"{item['id']}.{item['property']}")}
+                  for item in callback["state"]]
+        body = {"output": callback["output"], "outputs": self._outputs(callback["output"]),
+                "inputs": inputs, "changedPropIds": [trigger], "state": states}
+        response = self._session().post(f"{self.url}/_dash-update-component", json=body, timeout=self.timeout)
+        if response.status_code == 204:  # every output was no_update
+            return {}
+        response.raise_for_status()
+        return response.json().get("response", {})
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def add(self, route, seconds, ok):
+        with self.lock:
+            self.samples.setdefault(route, []).append((seconds, ok))
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            latencies = np.array([s for s, ok in samples if ok]) * 1000
+            errors = sum(1 for _, ok in samples if not ok)
+            routes[route] = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": errors / len(samples),
+                "throughput_rps": (len(samples) - errors) / elapsed,
+                "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+                "max_ms": float(latencies.max()) if len(latencies) else None,
+            }
+        return routes
+
+
+def _timed(recorder, route, scheduled, func):
+    try:
+        result = func()
+        recorder.add(route, time.perf_counter() - scheduled, True)
+        return result
+    except Exception as e:
+        recorder.add(route, time.perf_counter() - scheduled, False)
+        print(f"❌ {route} failed:", e)
+        return None
+
+
+def ask_question(client, recorder, scheduled, question, repo):
+    """One ask-btn click followed by polls until the answer is complete."""
+    def submit():
+        response = client.call("ask-btn.n_clicks", 1, {"question-input.value": question,
+                                                       "repo-dropdown.value": [repo]})
+        return response["answer-store"]["data"]
+
+    stream_id = _timed(recorder, "ask_submit", scheduled, submit)
+    if stream_id is None:
+        recorder.add("ask", time.perf_counter() - scheduled, False)
+        return
+
+    deadline = time.perf_counter() + ASK_TIMEOUT
+    version, polls = 0, 0
+    while time.perf_counter() < deadline:
+        time.sleep(POLL_INTERVAL)
+        polls += 1
+        response = _timed(recorder, "ask_poll", time.perf_counter(), lambda: client.call(
+            "stream-interval.n_intervals", polls,
+            {"answer-store.data": stream_id, "stream-index.data": version}))
+        if response is None:
+            continue
+        version = response.get("stream-index", {}).get("data", version)
+        if response.get("stream-interval", {}).get("disabled"):
+            recorder.add("ask", time.perf_counter() - scheduled, True)
+            return
+    recorder.add("ask", time.perf_counter() - scheduled, False)
+
+
+def change_analytics(client, recorder, scheduled, repos):
+    _timed(recorder, "analytics", scheduled, lambda: client.call(
+        "analytics-repo-dropdown.value", repos, {"figure-fingerprints.data": None}))
+
+
+def load_mix(path):
+    """Read a weighted question mix: JSON list of {"weight": 2, "question": "... {repo} ..."}."""
+    if not path:
+        return DEFAULT_MIX
+    with open(path) as f:
+        return [(item.get("weight", 1), item["question"]) for item in json.load(f)]
+
+
+def run(client, repos, mix, concurrency, rate, duration, analytics_share, seed=0):
+    """
+    Replay the mix for duration seconds.
+
+    Args:
+        rate: New users per second (Poisson arrivals); None keeps every
+            worker busy back to back (closed loop)
+        analytics_share: Share of users that change the analytics selection instead of asking
+    """
+    rng = random.Random(seed)
+    recorder = Recorder()
+    weights = [weight for weight, _ in mix]
+    questions = [question for _, question in mix]
+
+    def next_task():
+        if rng.random() < analytics_share:
+            selection = rng.sample(repos, min(len(repos), rng.randint(1, 5)))
+            return change_analytics, (selection,)
+        repo = rng.choice(repos)
+        return ask_question, (rng.choices(questions, weights)[0].format(repo=repo), repo)
+
+    start = time.perf_counter()
+    end = start + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if rate:
+            scheduled = start
+            while scheduled < end:
+                func, args = next_task()
+                pool.submit(func, client, recorder, scheduled, *args)
+                scheduled += rng.expovariate(rate)
+                time.sleep(max(0.0, scheduled - time.perf_counter()))
+        else:
+            def user():
+                while time.perf_counter() < end:
+                    func, args = next_task()
+                    func(client, recorder, time.perf_counter(), *args)
+            for _ in range(concurrency):
+                pool.submit(user)
+    return recorder.summary(time.perf_counter() - start)
+
+
+def print_summary(routes, previous=None):
+    print(f"{'route':<12} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50ms':>8} {'p99ms':>8}")
+    for route, stats in routes.items():
+        line = (f"{route:<12} {stats['requests']:>6} {stats['error_rate'] * 100:>5.1f}% "
+                f"{stats['throughput_rps']:>7.2f} {stats['p50_ms'] or 0:>8.0f} {stats['p99_ms'] or 0:>8.0f}")
+        before = (previous or {}).get(route)
+        if before and before.get("p99_ms") and stats["p99_ms"]:
+            line += f"   p99 {stats['p99_ms'] / before['p99_ms'] - 1:+.0%} vs previous"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dashboard callbacks")
+    parser.add_argument("--url", default="http://127.0.0.1:8050")
+    parser.add_argument("--concurrency", type=int, default=10, help="Max simultaneous users")
+    parser.add_argument("--rate", type=float, help="Users per second; omit for a closed loop")
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--analytics-share", type=float, default=DEFAULT_ANALYTICS_SHARE)
+    parser.add_argument("--mix", help="JSON file with a weighted question mix")
+    parser.add_argument("--repos", nargs="+", help="Repos to ask about; defaults to the dropdown's options")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Save the results as JSON")
+    parser.add_argument("--compare", help="Earlier results JSON to compare p99 latency with")
+    args = parser.parse_args()
+
+    client = DashClient(args.url)
+    repos = args.repos or [option["value"] for option in client.call("repo-dropdown.search_value", "", {})
+                           ["repo-dropdown"]["options"] if not option.get("disabled")]
+    if not repos:
+        print("❌ No repos to ask about")
+        return
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    print(f"Running {args.duration:.0f}s against {args.url} with {len(repos)} repos...")
+    routes = run(client, repos, load_mix(args.mix), args.concurrency, args.rate, args.duration,
+                 args.analytics_share, args.seed)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["routes"]
+    print_summary(routes, previous)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"timestamp": time.time(), "config": config, "routes": routes}, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Local stand-in for the embedding and chat completion API, for load tests.
+
+Run from the cmdb_chatbot folder, then start the app with AI_BASE_URL pointing at it:
+    python -m benchmarks.stub_ai_server --port 8099 --ttft 0.4 --tokens 150 --token-rate 60
+    AI_BASE_URL=http://127.0.0.1:8099 python -m frontend.app
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBEDDING_DIM = 3072
+WORDS = ["the", "repository", "uses", "python", "for", "its", "backend", "and", "has", "commits",
+         "from", "several", "contributors", "with", "tests", "in", "a", "separate", "folder"]
+
+
+class StubSettings:
+    embed_latency = 0.05   # seconds per embeddings request
+    ttft = 0.4             # seconds before the first streamed token
+    tokens = 150           # tokens per completion
+    token_rate = 60.0      # tokens per second after the first one
+    error_rate = 0.0       # share of requests answered with HTTP 500
+    requests = {"embeddings": 0, "chat": 0, "errors": 0}
+    lock = threading.Lock()
+
+
+def _count(kind):
+    with StubSettings.lock:
+        StubSettings.requests[kind] += 1
+
+
+def _fake_embedding(text):
+    seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:4], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def _answer_tokens(prompt):
+    rng = random.Random(hashlib.sha1(prompt.encode()).hexdigest())
+    return [rng.choice(WORDS) + " " for _ in range(StubSettings.tokens)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with StubSettings.lock:
+                return self._json(200, dict(StubSettings.requests))
+        self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if random.random() < StubSettings.error_rate:
+            _count("errors")
+            return self._json(500, {"error": "injected failure"})
+
+        if self.path.endswith("/embeddings"):
+            _count("embeddings")
+            time.sleep(StubSettings.embed_latency)
+            inputs = body.get("input", "")
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            return self._json(200, {"data": [{"index": i, "embedding": _fake_embedding(text)}
+                                             for i, text in enumerate(inputs)]})
+
+        if self.path.endswith("/chat/completions"):
+            _count("chat")
+            tokens = _answer_tokens(json.dumps(body.get("messages", [])))
+            if not body.get("stream"):
+                time.sleep(StubSettings.ttft + len(tokens) / StubSettings.token_rate)
+                return self._json(200, {"choices": [{"message": {"role": "assistant",
+                                                                 "content": "".join(tokens)}}]})
+            return self._stream(tokens)
+
+        self._json(404, {"error": "not found"})
+
+    def _stream(self, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        time.sleep(StubSettings.ttft)
+        try:
+            for token in tokens:
+                chunk = {"choices": [{"delta": {"content": token}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(1 / StubSettings.token_rate)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client cancelled
+
+
+def serve(host="127.0.0.1", port=8099):
+    """Start the stub in a background thread and return the server."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-ai-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub embedding and chat completion server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--embed-latency", type=float, default=StubSettings.embed_latency)
+    parser.add_argument("--ttft", type=float, default=StubSettings.ttft)
+    parser.add_argument("--tokens", type=int, default=StubSettings.tokens)
+    parser.add_argument("--token-rate", type=float, default=StubSettings.token_rate)
+    parser.add_argument("--error-rate", type=float, default=StubSettings.error_rate)
+    args = parser.parse_args()
+
+    StubSettings.embed_latency = args.embed_latency
+    StubSettings.ttft = args.ttft
+    StubSettings.tokens = args.tokens
+    StubSettings.token_rate = args.token_rate
+    StubSettings.error_rate = args.error_rate
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    print(f"✅ Stub AI server on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
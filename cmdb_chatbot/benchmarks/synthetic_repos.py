@@ -0,0 +1,130 @@
+"""
+Generate local git repositories with a known shape for ingestion benchmarks.
+
+Run from the cmdb_chatbot folder:
+    python -m benchmarks.synthetic_repos /tmp/bench_repos --repos 5 --commits 2000 --authors 20 --files 500 --languages py:5,js:3,md:1
+"""
+
+import os
+import random
+import argparse
+import subprocess
+
+# Extension -> line templates used to fill files of that language
+LANGUAGE_TEMPLATES = {
+    "py": ["def func_{n}(x):", "    return x * {n}", "import os", "# comment {n}"],
+    "js": ["function f{n}(x) {{", "  return x + {n};", "}}", "// comment {n}"],
+    "go": ["func F{n}(x int) int {{", "\treturn x * {n}", "}}", "// comment {n}"],
+    "java": ["public int m{n}(int x) {{", "    return x + {n};", "}}", "// comment {n}"],
+    "md": ["# Section {n}", "Some documentation line {n}.", "- item {n}", ""],
+    "sql": ["SELECT {n} AS value;", "-- query {n}"],
+    "yaml": ["key_{n}: value_{n}", "list_{n}:", "  - {n}"],
+}
+DEFAULT_LANGUAGES = {"py": 5, "js": 3, "md": 1}
+WORDS = ["fix", "add", "update", "refactor", "remove", "bump", "docs", "tests", "parser",
+         "config", "api", "cache", "login", "build", "deps", "typo", "handler", "query"]
+BASE_TIMESTAMP = 1_600_000_000  # commit dates start here and move forward
+FILES_PER_COMMIT = 3             # files modified by each commit after the initial one
+
+
+def parse_languages(spec):
+    """Parse "py:5,js:3" into {"py": 5, "js": 3}; weights default to 1."""
+    if not spec:
+        return dict(DEFAULT_LANGUAGES)
+    languages = {}
+    for part in spec.split(","):
+        ext, _, weight = part.strip().partition(":")
+        if ext not in LANGUAGE_TEMPLATES:
+            raise ValueError(f"Unknown language '{ext}', expected one of {sorted(LANGUAGE_TEMPLATES)}")
+        languages[ext] = float(weight or 1)
+    return languages
+
+
+def _file_content(rng, ext, lines=20):
+    templates = LANGUAGE_TEMPLATES[ext]
+    return "\n".join(rng.choice(templates).format(n=rng.randint(0, 10_000)) for _ in range(lines)) + "\n"
+
+
+def _data(payload):
+    raw = payload.encode()
+    return b"data %d\n%s\n" % (len(raw), raw)
+
+
+def generate_repo(path, commits=100, authors=5, files=50, languages=None, seed=0):
+    """
+    Create a git repository at path with the requested shape.
+
+    History is written with git fast-import, so repos with many thousands
+    of commits are generated in seconds. The working tree is checked out
+    because analyze_repo walks it to count files.
+
+    Args:
+        path: Folder to create; must not exist yet
+        commits: Number of commits (the first one adds every file)
+        authors: Number of distinct commit authors
+        files: Number of files in the tree
+        languages: Extension -> weight mapping, see parse_languages
+        seed: Random seed; the same arguments always give the same repo
+
+    Returns:
+        Dict describing the generated repo
+    """
+    rng = random.Random(seed)
+    languages = languages or dict(DEFAULT_LANGUAGES)
+    exts = rng.choices(list(languages), weights=list(languages.values()), k=files)
+    paths = [f"src/pkg{i % 10}/file_{i}.{ext}" for i, ext in enumerate(exts)]
+    people = [(f"Author {i}", f"author{i}@example.com") for i in range(authors)]
+
+    os.makedirs(path)
+    subprocess.run(["git", "init", "-q", "-b", "main", path], check=True)
+
+    stream = []
+    timestamp = BASE_TIMESTAMP
+    for n in range(commits):
+        name, email = rng.choice(people)
+        timestamp += rng.randint(60, 86_400)
+        touched = paths if n == 0 else rng.sample(paths, min(FILES_PER_COMMIT, len(paths)))
+        message = "initial commit" if n == 0 else " ".join(rng.sample(WORDS, 3)) + f" #{n}"
+
+        stream.append(b"commit refs/heads/main\n")
+        stream.append(f"author {name} <{email}> {timestamp} +0000\n".encode())
+        stream.append(f"committer {name} <{email}> {timestamp} +0000\n".encode())
+        stream.append(_data(message))
+        for file_path in touched:
+            stream.append(f"M 100644 inline {file_path}\n".encode())
+            stream.append(_data(_file_content(rng, file_path.rsplit(".", 1)[-1])))
+        stream.append(b"\n")
+
+    subprocess.run(["git", "fast-import", "--quiet"], input=b"".join(stream), cwd=path, check=True)
+    subprocess.run(["git", "checkout", "-q", "-f", "main"], cwd=path, check=True)
+
+    return {"path": path, "commits": commits, "authors": authors, "files": files,
+            "languages": languages, "seed": seed}
+
+
+def generate_repos(base_folder, count=3, prefix="bench_repo", seed=0, **shape):
+    """Generate count repos named {prefix}_000... under base_folder, with the same shape."""
+    os.makedirs(base_folder, exist_ok=True)
+    return [generate_repo(os.path.join(base_folder, f"{prefix}_{i:03d}"), seed=seed + i, **shape)
+            for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic git repos for benchmarks")
+    parser.add_argument("folder", help="Folder to create the repos in")
+    parser.add_argument("--repos", type=int, default=3)
+    parser.add_argument("--commits", type=int, default=100)
+    parser.add_argument("--authors", type=int, default=5)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--languages", default="", help='Language mix, e.g. "py:5,js:3,md:1"')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    repos = generate_repos(args.folder, count=args.repos, seed=args.seed, commits=args.commits,
+                           authors=args.authors, files=args.files,
+                           languages=parse_languages(args.languages))
+    print(f"✅ Generated {len(repos)} repos in {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,22 @@
 import dash
 import sys
 import os
-from dash import Input, Output, State, html, dcc, callback_context
+import gzip
+from flask import request, jsonify, Response
+from dash import Input, Output, State, html, dcc, callback_context, no_update, Patch
 import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from backend.qa_utils import answer_hybrid
-from backend.db_utils import get_all_repo_names, connect_db, ensure_chunks_table_exists, ensure_table_exists
+from backend.db_utils import db_cursor, ensure_chunks_table_exists, ensure_table_exists, ensure_metrics_views_exist
+from backend.db_utils import ensure_activity_table_exists, ensure_authors_table_exists
+from backend.db_utils import ensure_file_churn_table_exists, ensure_ingest_state_table_exists
+from backend.db_utils import ensure_dependencies_table_exists, ensure_language_profile_table_exists
+from backend.db_utils import ensure_repo_embeddings_table_exists
+from backend.repo_index import get_repo_index, is_repo_index_loaded
+from backend.metrics import render_metrics
 from frontend.layouts import create_main_layout
-from frontend.assets.theme import GRAPH_THEME
-from frontend.dataviz import repo_metrics_distribution
+from frontend.dataviz import repo_metrics_payload, PATCHED_TRACE_FIELDS
+from frontend.streaming import start_answer_stream, start_static_stream, get_stream, cancel_stream
 
 # Initialize Dash 
 external_stylesheets = [
@@ -29,72 +36,218 @@ app = dash.Dash(
 )
 server = app.server
 
-# Database setup
-conn, cur = connect_db()
-ensure_table_exists(cur)
-ensure_chunks_table_exists(cur)
+COMPRESS_MIN_BYTES = 1024  # smaller responses aren't worth gzipping
+COMPRESS_MIMETYPES = ('application/json', 'text/html', 'text/css', 'application/javascript')
 
-# Get repository options for dropdowns
-repo_options = [{"label": name, "value": name} for name in get_all_repo_names(cur)]
 
-# Close database connection
-cur.close()
-conn.close()
+@server.after_request
+def compress_response(response):
+    """Gzip callback payloads and assets when the browser accepts it."""
+    if (response.direct_passthrough
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES
+            or 'gzip' not in request.headers.get('Accept-Encoding', '')):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_database():
+    """Create the tables and analytics views the app reads from."""
+    with db_cursor(commit=True) as cur:
+        ensure_table_exists(cur)
+        ensure_chunks_table_exists(cur)
+        ensure_metrics_views_exist(cur)
+        ensure_activity_table_exists(cur)
+        ensure_authors_table_exists(cur)
+        ensure_file_churn_table_exists(cur)
+        ensure_ingest_state_table_exists(cur)
+        ensure_dependencies_table_exists(cur)
+        ensure_language_profile_table_exists(cur)
+        ensure_repo_embeddings_table_exists(cur)
+
+
+# Health checks for the process manager / load balancer. Neither calls the LLM.
+@server.route('/healthz')
+def healthz():
+    """Liveness: the worker is up and serving requests."""
+    return jsonify(status="ok", pid=os.getpid())
+
+
+@server.route('/readyz')
+def readyz():
+    """Readiness: the database answers and the repo index is loaded."""
+    checks = {"database": False, "repo_index": False}
+    try:
+        with db_cursor() as cur:
+            cur.execute("SELECT 1")
+            checks["database"] = cur.fetchone()[0] == 1
+            # Builds the index if warm-up in the master failed; cached once it succeeds
+            get_repo_index(cur)
+    except Exception as e:
+        print("❌ Readiness check failed:", e)
+    checks["repo_index"] = is_repo_index_loaded()
+
+    ready = all(checks.values())
+    return jsonify(status="ready" if ready else "not ready", checks=checks), 200 if ready else 503
+
+
+@server.route('/metrics')
+def metrics():
+    """Stage latencies, token counts, cache hit rates and errors in the Prometheus format."""
+    payload, content_type = render_metrics()
+    return Response(payload, content_type=content_type)
+
+
+# Dropdown options are served by the search callbacks below, so the initial
+# page doesn't embed every repo name
+DROPDOWN_PAGE_SIZE = 50
 
 # Set the application layout
 app.layout = html.Div([
     dcc.Store(id='answer-store', data=''),
     dcc.Store(id='stream-index', data=0),
-    dcc.Interval(id='stream-interval', interval=50, disabled=True),
-    create_main_layout(repo_options)
+    dcc.Interval(id='stream-interval', interval=100, disabled=True),
+    dcc.Store(id='figure-fingerprints', data=None),
+    create_main_layout([])
 ])
 
+
+def repo_dropdown_options(search_value, selected):
+    """One page of matching repos, always including the current selection."""
+    names, has_more = get_repo_index().suggest(search_value, limit=DROPDOWN_PAGE_SIZE)
+
+    if isinstance(selected, str):
+        selected = [selected]
+    selected = selected or []
+    options = [{"label": name, "value": name} for name in selected]
+    options += [{"label": name, "value": name} for name in names if name not in selected]
+    if has_more:
+        options.append({"label": f"Showing first {DROPDOWN_PAGE_SIZE} matches, type to narrow...",
+                        "value": "__more__", "disabled": True})
+    return options
+
+
+for dropdown_id in ("repo-dropdown", "analytics-repo-dropdown"):
+    @app.callback(
+        Output(dropdown_id, "options"),
+        Input(dropdown_id, "search_value"),
+        State(dropdown_id, "value")
+    )
+    def update_repo_options(search_value, selected):
+        """Serve prefix and fuzzy matches for the typed text from the repo index."""
+        return repo_dropdown_options(search_value, selected)
+
 # Callbacks
+def figure_patch(figure, sent, fingerprint):
+    """Patch of the trace arrays and title that differ from the figure the browser shows."""
+    spec = figure.to_plotly_json()
+    patch = Patch()
+    for i, (sent_arrays, arrays) in enumerate(zip(sent["arrays"], fingerprint["arrays"])):
+        for field, sent_hash, new_hash in zip(PATCHED_TRACE_FIELDS, sent_arrays, arrays):
+            if sent_hash != new_hash:
+                patch["data"][i][field] = spec["data"][i].get(field)
+    if sent["title"] != fingerprint["title"]:
+        patch["layout"]["title"] = spec["layout"].get("title")
+    return patch
+
+
 @app.callback(
     [Output("commits-dist", "figure"),
      Output("files-dist", "figure"),
      Output("commits-box", "figure"),
      Output("commits-violin", "figure"),
      Output("lang-heatmap", "figure"),
-     Output("metrics-corr", "figure")],
-    Input("analytics-repo-dropdown", "value")
+     Output("metrics-corr", "figure"),
+     Output("activity-trend", "figure"),
+     Output("file-hotspots", "figure"),
+     Output("figure-fingerprints", "data")],
+    Input("analytics-repo-dropdown", "value"),
+    State("figure-fingerprints", "data")
 )
-def update_analytics(selected_repos):
-    """Update all analytics graphs based on selected repositories."""
-    figures = repo_metrics_distribution(selected_repos) if selected_repos else repo_metrics_distribution()
-    
-    # Apply theme to all figures
-    for figure in figures:
-        if figure:
-            figure.update_layout(**GRAPH_THEME['layout'])
-    
-    return figures
+def update_analytics(selected_repos, sent_fingerprints):
+    """
+    Update the analytics graphs based on selected repositories.
+
+    Only figures that differ from what the browser already shows are sent;
+    when just data arrays or the title changed, a Patch sends only those.
+    """
+    figures, fingerprints = repo_metrics_payload(selected_repos)
+    if not sent_fingerprints or len(sent_fingerprints) != len(figures):
+        sent_fingerprints = [None] * len(figures)
+
+    outputs = []
+    for figure, fingerprint, sent in zip(figures, fingerprints, sent_fingerprints):
+        if sent == fingerprint:
+            outputs.append(no_update)
+        elif isinstance(sent, dict) and sent.get("shape") == fingerprint["shape"]:
+            outputs.append(figure_patch(figure, sent, fingerprint))
+        else:
+            outputs.append(figure)
+
+    return outputs + [fingerprints]
 
 
 @app.callback(
-    Output("answer-output", "children"),
+    [Output("answer-store", "data"),
+     Output("stream-index", "data"),
+     Output("stream-interval", "disabled")],
     Input("ask-btn", "n_clicks"),
     State("question-input", "value"),
     State("repo-dropdown", "value")
 )
 def get_answer(n_clicks, question, selected_repos):
-    """Get answer from the chatbot based on user input."""
+    """Start answering in the background; the answer panel is filled by poll_answer."""
     if not question or not selected_repos:
-        return "Please select repositories and ask a question!", 0, True
-    
-    if isinstance(selected_repos, list):
-        # Handle multiple repos
-        answers = []
-        for repo in selected_repos:
-            answer = answer_hybrid(question, repo_name=repo)
-            answers.append(f"For {repo}: {answer}")
-        return "\n\n\n".join(answers), 0, False
-    else:
-        # Handle single repo
-        answer = answer_hybrid(question, repo_name=selected_repos)
-        return answer, 0, False
+        return start_static_stream("Please select repositories and ask a question!"), 0, False
+
+    repos = selected_repos if isinstance(selected_repos, list) else [selected_repos]
+    return start_answer_stream(question, repos), 0, False
+
+
+@app.callback(
+    Output("stream-interval", "disabled", allow_duplicate=True),
+    Input("cancel-btn", "n_clicks"),
+    State("answer-store", "data"),
+    prevent_initial_call=True
+)
+def cancel_answer(n_clicks, stream_id):
+    """Cancel the running question; polling continues until the panel shows it."""
+    cancel_stream(stream_id)
+    return False
+
+
+@app.callback(
+    [Output("answer-output", "children"),
+     Output("stream-index", "data", allow_duplicate=True),
+     Output("stream-interval", "disabled", allow_duplicate=True)],
+    Input("stream-interval", "n_intervals"),
+    State("answer-store", "data"),
+    State("stream-index", "data"),
+    prevent_initial_call=True
+)
+def poll_answer(n_intervals, stream_id, rendered_version):
+    """Render tokens received since the last poll and stop polling once the answer is done."""
+    stream = get_stream(stream_id)
+    if stream is None:
+        return no_update, no_update, True
+
+    if stream.version == rendered_version:
+        return no_update, no_update, stream.done
+
+    version, done = stream.version, stream.done
+    return stream.render(), version, done
 
 
 if __name__ == '__main__':
+    init_database()
     app.run(host='0.0.0.0',debug=True, port=8050)
 
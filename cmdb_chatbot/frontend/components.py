@@ -107,6 +107,10 @@ def create_chatbot_section(title, repo_dropdown, question_input, ask_button):
                 create_form_group("Select a repository:", repo_dropdown),
                 create_form_group("Ask a question:", question_input),
                 create_button(ask_button.id, "Ask"),
+                create_button("cancel-btn", "Cancel", {
+                    'backgroundColor': THEME['colors']['accent'],
+                    'marginLeft': THEME['spacing']['xs']
+                }),
             ], className='chat-input-column'),
             
             # Right column
@@ -1,67 +1,315 @@
 import sys
 import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
 
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 
-from backend.db_utils import connect_db, get_all_commits, TABLE
+from backend.db_utils import db_cursor, get_file_hotspots, METRICS_VIEW, LANGUAGES_VIEW, ACTIVITY_TABLE
+from backend.shared_cache import shared_cache, METRICS_VIEWS_VERSION_KEY
+from backend.metrics import timed, record_cache, DASHBOARD_SECONDS
+from frontend.assets.theme import GRAPH_THEME
+
+FIGURE_CACHE_SIZE = 64   # number of repo selections whose figures are kept
+FIGURE_CACHE_TTL = 300   # seconds before figures are rebuilt from the views
+HEATMAP_TOP_LANGUAGES = 15  # languages shown as columns, the rest are folded into "other"
+HEATMAP_MAX_REPOS = 200     # above this, repos are clustered by their dominant language
+POINTS_THRESHOLD = 500      # above this many repos, per-repo points are not all sent to the browser
+MAX_SCATTER_POINTS = 2000   # sampled points drawn with WebGL above POINTS_THRESHOLD
+FILES_COLOR_MAX_REPOS = 30  # above this, the files histogram is not split into one trace per repo
+TREND_MAX_LINES = 10        # above this, the activity trend sums the selection into one line
+HOTSPOT_CHART_FILES = 15    # files shown in the hotspot chart
+PATCHED_TRACE_FIELDS = ("x", "y", "z", "text", "customdata", "width")  # trace arrays sent alone when only they change
+
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+
+def selection_key(selected_repos=None):
+    """Canonical cache key for a repo selection: order and duplicates don't matter."""
+    if not selected_repos:
+        return ("__all__",)
+    if isinstance(selected_repos, str):
+        selected_repos = [selected_repos]
+    return tuple(sorted(set(selected_repos)))
+
+
+def _digest(value):
+    return hashlib.md5(json.dumps(value, cls=PlotlyJSONEncoder, sort_keys=True).encode()).hexdigest()
+
+
+def figure_fingerprint(figure):
+    """
+    Hashes of the parts of a figure, used to skip or patch unchanged figures.
+
+    "shape" covers the layout and the traces without their data arrays; when
+    it matches what the browser shows, only the arrays listed in "arrays"
+    (one row of PATCHED_TRACE_FIELDS hashes per trace) and the title can differ.
+    """
+    spec = figure.to_plotly_json()
+    traces = spec.get("data", [])
+    layout = dict(spec.get("layout", {}))
+    title = layout.pop("title", None)
+    shape = [{key: value for key, value in trace.items() if key not in PATCHED_TRACE_FIELDS} for trace in traces]
+    return {
+        "shape": _digest([shape, layout]),
+        "title": _digest(title),
+        "arrays": [[_digest(trace.get(field)) for field in PATCHED_TRACE_FIELDS] for trace in traces],
+    }
+
+
+def repo_metrics_payload(selected_repos=None):
+    """
+    Figures for a repo selection together with their fingerprints.
+
+    Both are memoized per selection with LRU eviction, so repeated and
+    common selections render without a database round trip. Entries built
+    before ingestion last refreshed the views are rebuilt.
+    """
+    key = selection_key(selected_repos)
+    now = time.monotonic()
+    views_version = shared_cache.get("versions", METRICS_VIEWS_VERSION_KEY)
+    with _figure_cache_lock:
+        cached = _figure_cache.get(key)
+        hit = bool(cached) and now - cached[0] < FIGURE_CACHE_TTL and cached[3] == views_version
+        if hit:
+            _figure_cache.move_to_end(key)
+    record_cache("figures", hit)
+    if hit:
+        return cached[1], cached[2]
+
+    with timed(DASHBOARD_SECONDS):
+        figures = build_metrics_figures(None if key == ("__all__",) else list(key))
+        fingerprints = [figure_fingerprint(figure) for figure in figures]
+
+    with _figure_cache_lock:
+        _figure_cache[key] = (now, figures, fingerprints, views_version)
+        _figure_cache.move_to_end(key)
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return figures, fingerprints
 
 
 def repo_metrics_distribution(selected_repos=None):
-    conn, cur = connect_db()
-    
-    # Get all repo data
-    query = f"""
-        SELECT repo_name, total_commits, files_count, languages
-        FROM {TABLE}
-        {f"WHERE repo_name = ANY(%s)" if selected_repos else ""}
-        """
-    cur.execute(query, [selected_repos] if selected_repos else None)
-
-    data = cur.fetchall()
+    """Build (or reuse) the analytics figures for a repo selection."""
+    return repo_metrics_payload(selected_repos)[0]
+
+
+def _sample(df, n=MAX_SCATTER_POINTS):
+    return df if len(df) <= n else df.sample(n, random_state=0)
+
+
+def histogram_figure(df, column, title, nbins=None, **kwargs):
+    """
+    Histogram that ships raw values only for small fleets.
+
+    Above POINTS_THRESHOLD the bins are computed here and sent as a bar
+    trace, so the payload no longer grows with the number of repos.
+    """
+    if len(df) <= POINTS_THRESHOLD:
+        return px.histogram(df, x=column, nbins=nbins, title=title, **kwargs)
+
+    counts, edges = np.histogram(df[column].dropna(), bins=nbins or 50)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                           marker_color=(kwargs.get('color_discrete_sequence') or [None])[0]))
+    fig.update_layout(title=title, xaxis_title=column, yaxis_title='count', bargap=0)
+    return fig
+
+
+def box_figure(df, column, title):
+    """Box plot; above POINTS_THRESHOLD the box is sent as precomputed quartiles plus a WebGL sample."""
+    if len(df) <= POINTS_THRESHOLD:
+        return px.box(df, y=column, title=title, points='all')
+
+    values = df[column].dropna()
+    q1, median, q3 = values.quantile([0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    lower = values[values >= q1 - 1.5 * iqr].min()
+    upper = values[values <= q3 + 1.5 * iqr].max()
+    sample = _sample(df)
+    jitter = np.random.default_rng(0).uniform(-0.15, 0.15, len(sample))
+
+    fig = go.Figure([
+        go.Box(x=[0], q1=[q1], median=[median], q3=[q3], lowerfence=[lower], upperfence=[upper],
+               name=column, boxpoints=False),
+        go.Scattergl(x=0.5 + jitter, y=sample[column], mode='markers', text=sample['repo_name'],
+                     marker=dict(size=4, opacity=0.5), name='sample', showlegend=False),
+    ])
+    fig.update_layout(title=f'{title} ({len(sample)} of {len(df)} repos shown)',
+                      xaxis=dict(showticklabels=False))
+    return fig
+
+
+def violin_figure(df, column, title):
+    """Violin plot; above POINTS_THRESHOLD the density is estimated from a sample."""
+    if len(df) <= POINTS_THRESHOLD:
+        return px.violin(df, y=column, box=True, points='all', title=title)
+
+    sample = _sample(df)
+    fig = px.violin(sample, y=column, box=True, points=False,
+                    title=f'{title} (sample of {len(sample)} of {len(df)} repos)')
+    return fig
+
+
+def language_heatmap(lang_df, max_repos=HEATMAP_MAX_REPOS):
+    """
+    Heatmap of file counts per repo and language.
+
+    With more than max_repos rows, repos are grouped by their dominant
+    language and each row shows the cluster's mean profile instead.
+    """
+    title = 'Language Usage Across Repositories'
+    if lang_df.empty:
+        fig = go.Figure()
+        fig.update_layout(title=title, annotations=[
+            dict(text="No language data", showarrow=False, xref="paper", yref="paper", x=0.5, y=0.5)
+        ])
+        return fig
+
+    lang_pivot = lang_df.pivot_table(index='repo', columns='language', values='count',
+                                     aggfunc='sum', fill_value=0)
+
+    if len(lang_pivot) > max_repos:
+        dominant = lang_pivot.idxmax(axis=1)
+        sizes = dominant.value_counts()
+        lang_pivot = lang_pivot.groupby(dominant).mean().round(1)
+        lang_pivot.index = [f"{lang} repos ({sizes[lang]})" for lang in lang_pivot.index]
+        title += f' (clustered by dominant language, {len(dominant)} repos)'
+
+    return px.imshow(lang_pivot,
+                     title=title,
+                     color_continuous_scale='RdBu_r')
+
+
+def activity_trend_figure(trend_df):
+    """Monthly commits from the activity rollups, one line per repo or one for the whole selection."""
+    title = 'Monthly Commit Activity'
+    if trend_df.empty:
+        fig = go.Figure()
+        fig.update_layout(title=title, annotations=[
+            dict(text="No activity data", showarrow=False, xref="paper", yref="paper", x=0.5, y=0.5)
+        ])
+        return fig
+
+    per_repo = trend_df['repo'].nunique() > 1
+    # The summed line adds each repo's distinct authors, so people in several repos count once per repo
+    summed = (trend_df['repo'] == 'selection').all()
+    labels = {'authors': 'Authors (summed per repo)'} if summed else {}
+    return px.line(trend_df, x='month', y='commits', color='repo' if per_repo else None,
+                   hover_data=['authors'], labels=labels, markers=True, title=title)
+
+
+def hotspot_figure(hotspot_df):
+    """Horizontal bars of the most frequently changed files, most changed on top."""
+    title = f'Top {HOTSPOT_CHART_FILES} File Hotspots'
+    if hotspot_df.empty:
+        fig = go.Figure()
+        fig.update_layout(title=title, annotations=[
+            dict(text="No file churn data", showarrow=False, xref="paper", yref="paper", x=0.5, y=0.5)
+        ])
+        return fig
+
+    # Prefix the repo only when several repos are shown
+    if hotspot_df['repo'].nunique() > 1:
+        hotspot_df = hotspot_df.assign(file=hotspot_df['repo'] + ': ' + hotspot_df['file'])
+    fig = px.bar(hotspot_df.iloc[::-1], x='changes', y='file', orientation='h',
+                 hover_data=['lines_churned', 'last_touched'], title=title)
+    fig.update_layout(yaxis_title=None)
+    return fig
+
+
+def build_metrics_figures(selected_repos=None):
+    # Per-repo metrics and the language matrix come from materialized views
+    where = "WHERE repo_name = ANY(%s)" if selected_repos else ""
+    params = [selected_repos] if selected_repos else None
+    with db_cursor() as cur:
+        cur.execute(f"""
+            SELECT repo_name, total_commits, files_count
+            FROM {METRICS_VIEW}
+            {where}
+            """, params)
+        data = cur.fetchall()
+
+        # Fold everything outside the top-K languages into "other" in SQL, so
+        # the matrix width stays bounded however many extensions exist
+        cur.execute(f"""
+            WITH selected AS (
+                SELECT repo_name, language, file_count
+                FROM {LANGUAGES_VIEW}
+                {where}
+            ),
+            top_languages AS (
+                SELECT language
+                FROM selected
+                GROUP BY language
+                ORDER BY SUM(file_count) DESC
+                LIMIT %s
+            )
+            SELECT
+                repo_name,
+                CASE WHEN language IN (SELECT language FROM top_languages)
+                     THEN language ELSE 'other' END AS language_group,
+                SUM(file_count)
+            FROM selected
+            GROUP BY repo_name, language_group
+            """, (params or []) + [HEATMAP_TOP_LANGUAGES])
+        language_rows = cur.fetchall()
+
+        # Small selections get a line per repo; otherwise one summed line read
+        # through the (period, period_start) index
+        if selected_repos and len(selected_repos) <= TREND_MAX_LINES:
+            cur.execute(f"""
+                SELECT repo_name, period_start, commits, authors
+                FROM {ACTIVITY_TABLE}
+                WHERE period = 'month' AND repo_name = ANY(%s)
+                ORDER BY period_start
+                """, [selected_repos])
+        else:
+            cur.execute(f"""
+                SELECT 'selection', period_start, SUM(commits), SUM(authors)
+                FROM {ACTIVITY_TABLE}
+                WHERE period = 'month' {"AND repo_name = ANY(%s)" if selected_repos else ""}
+                GROUP BY period_start
+                ORDER BY period_start
+                """, params)
+        trend_rows = cur.fetchall()
+
+        hotspot_rows = get_file_hotspots(cur, selected_repos or None, limit=HOTSPOT_CHART_FILES)
     
     # Convert to DataFrame
-    df = pd.DataFrame(data, columns=['repo_name', 'total_commits', 'files_count', 'languages'])
+    df = pd.DataFrame(data, columns=['repo_name', 'total_commits', 'files_count'])
     
     # Create visualizations
-    fig_commits = px.histogram(df, x='total_commits', nbins=10, 
-                             title='Distribution of Total Commits',
-                             color_discrete_sequence=['skyblue'])
+    fig_commits = histogram_figure(df, 'total_commits', nbins=10,
+                                   title='Distribution of Total Commits',
+                                   color_discrete_sequence=['skyblue'])
     
-    fig_files = px.histogram(df, x='files_count',
-                            title='Number of Files by Repository',
-                            color='repo_name')
+    if len(df) <= FILES_COLOR_MAX_REPOS:
+        fig_files = px.histogram(df, x='files_count',
+                                title='Number of Files by Repository',
+                                color='repo_name')
+    else:
+        fig_files = histogram_figure(df, 'files_count', title='Number of Files by Repository')
     
     # Box plot of commits
-    fig_box = px.box(df, y='total_commits',
-                     title='Commit Distribution Across Repositories',
-                     points='all')
+    fig_box = box_figure(df, 'total_commits', 'Commit Distribution Across Repositories')
     
     # Violin plot
-    fig_violin = px.violin(df, y='total_commits',
-                          box=True, points='all',
-                          title='Violin Plot of Commit Distribution')
+    fig_violin = violin_figure(df, 'total_commits', 'Violin Plot of Commit Distribution')
     
     # Language distribution heatmap
-    language_data = []
-    for _, row in df.iterrows():
-        if isinstance(row['languages'], dict):
-            for lang, count in row['languages'].items():
-                language_data.append({
-                    'repo': row['repo_name'],
-                    'language': lang,
-                    'count': count
-                })
-    
-    lang_df = pd.DataFrame(language_data)
-    lang_pivot = lang_df.pivot(index='repo', columns='language', values='count').fillna(0)
-    
-    fig_lang_heatmap = px.imshow(lang_pivot,
-                                title='Language Usage Across Repositories',
-                                color_continuous_scale='RdBu_r')
+    lang_df = pd.DataFrame(language_rows, columns=['repo', 'language', 'count'])
+    fig_lang_heatmap = language_heatmap(lang_df)
     
     # Correlation heatmap
     corr = df[['total_commits', 'files_count']].corr().round(2)
@@ -70,7 +318,18 @@ def repo_metrics_distribution(selected_repos=None):
                         text_auto=True,
                         color_continuous_scale='Blues')
     
-    cur.close()
-    conn.close()
-    
-    return fig_commits, fig_files, fig_box, fig_violin, fig_lang_heatmap, fig_corr
+    # Commit activity over time
+    trend_df = pd.DataFrame(trend_rows, columns=['repo', 'month', 'commits', 'authors'])
+    fig_trend = activity_trend_figure(trend_df)
+
+    # Most frequently changed files
+    hotspot_df = pd.DataFrame([(repo, path, changes, added + removed, touched)
+                               for repo, path, changes, added, removed, touched in hotspot_rows],
+                              columns=['repo', 'file', 'changes', 'lines_churned', 'last_touched'])
+    fig_hotspots = hotspot_figure(hotspot_df)
+
+    figures = (fig_commits, fig_files, fig_box, fig_violin, fig_lang_heatmap, fig_corr, fig_trend,
+               fig_hotspots)
+    for figure in figures:
+        figure.update_layout(**GRAPH_THEME['layout'])
+    return figures
@@ -0,0 +1,52 @@
+"""Bounded background worker pool for chatbot questions."""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ANSWER_WORKERS = int(os.getenv("ANSWER_WORKERS", "4"))      # questions answered at the same time
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "16"))   # questions allowed to wait for a worker
+
+
+class QueueFull(Exception):
+    """Raised when a question is submitted while the queue is at its limit."""
+
+
+class JobManager:
+    """
+    Runs questions outside the Dash request threads.
+
+    At most `workers` jobs run at once and at most `max_queued` wait behind
+    them; further submissions are rejected so a burst of questions can't
+    starve the analytics callbacks.
+    """
+
+    def __init__(self, workers=ANSWER_WORKERS, max_queued=MAX_QUEUED_JOBS):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="answer-job")
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args):
+        with self.lock:
+            if self.pending >= self.workers + self.max_queued:
+                raise QueueFull(f"{self.pending} questions already in progress")
+            self.pending += 1
+
+        def run():
+            try:
+                func(*args)
+            finally:
+                with self.lock:
+                    self.pending -= 1
+
+        return self.executor.submit(run)
+
+    def queue_depth(self):
+        """Jobs waiting for a free worker."""
+        with self.lock:
+            return max(self.pending - self.workers, 0)
+
+
+job_manager = JobManager()
@@ -27,7 +27,9 @@ def create_analytics_tab(repo_options):
         dcc.Graph(id="commits-box"),
         dcc.Graph(id="commits-violin"),
         dcc.Graph(id="lang-heatmap"),
-        dcc.Graph(id="metrics-corr")
+        dcc.Graph(id="metrics-corr"),
+        dcc.Graph(id="activity-trend"),
+        dcc.Graph(id="file-hotspots")
     ]
 
     return html.Div([
@@ -0,0 +1,237 @@
+"""Server-side answer buffers polled by the chatbot panel while the LLM streams."""
+
+import sys
+import os
+import time
+import uuid
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backend.qa_utils import answer_hybrid
+from backend.aggregate_queries import parse_aggregate_question
+from backend.ai_utils import AnswerCancelled
+from backend.shared_cache import shared_cache, make_key
+from frontend.jobs import job_manager, QueueFull
+
+STREAM_TTL = 600  # seconds a finished stream is kept for late polls
+PUBLISH_INTERVAL = 0.1      # min seconds between snapshots shared with other workers
+CANCEL_CHECK_INTERVAL = 0.2 # min seconds between checks for a cancel from another worker
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+STATUS_LABELS = {
+    "queued": "Queued, waiting for a free worker...",
+    "retrieving": "Retrieving context...",
+    "generating": "Generating answer...",
+}
+
+
+class SharedCancelEvent:
+    """
+    threading.Event look-alike that is also set by a cancel from another worker.
+
+    Polls to a stream can reach any gunicorn worker, so the Cancel button
+    records its flag in the shared cache; the worker running the answer sees
+    it through is_set().
+    """
+
+    def __init__(self, stream_id):
+        self.key = make_key(stream_id, "cancel")
+        self.event = threading.Event()
+        self.checked_at = 0.0
+
+    def set(self):
+        self.event.set()
+        shared_cache.set("streams", self.key, True, ttl=STREAM_TTL)
+
+    def is_set(self):
+        if self.event.is_set():
+            return True
+        now = time.monotonic()
+        if now - self.checked_at >= CANCEL_CHECK_INTERVAL:
+            self.checked_at = now
+            if shared_cache.get("streams", self.key):
+                self.event.set()
+        return self.event.is_set()
+
+
+class AnswerStream:
+    """Tokens received so far for one question, one section per selected repo."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.sections = []
+        self.version = 0
+        self.status = "queued"
+        self.cancel_event = SharedCancelEvent(self.id)
+        self.published_at = 0.0
+        self.done = False
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def set_status(self, status):
+        with self.lock:
+            self.status = status
+            self.version += 1
+        self.publish(force=True)
+
+    def start_section(self, prefix=""):
+        with self.lock:
+            self.sections.append(prefix)
+            if self.status != "cancelled":
+                self.status = "retrieving"
+            self.version += 1
+        self.publish(force=True)
+
+    def append(self, token):
+        """Add a token to the current section. Used as the on_token callback."""
+        with self.lock:
+            if self.cancel_event.is_set():
+                return
+            self.status = "generating"
+            if self.first_token is None:
+                self.first_token = time.perf_counter() - self.started
+            if not self.sections:
+                self.sections.append("")
+            self.sections[-1] += token
+            self.version += 1
+        self.publish()
+
+    def replace_section(self, text):
+        """Swap the streamed text of the current section for the final formatted answer."""
+        with self.lock:
+            if not self.sections:
+                self.sections.append("")
+            self.sections[-1] = text
+            self.version += 1
+        self.publish(force=True)
+
+    def cancel(self):
+        """Stop waiting for this answer; in-flight calls are aborted by the backend."""
+        self.cancel_event.set()
+        self.set_status("cancelled")
+
+    def finish(self, status="done"):
+        with self.lock:
+            self.done = True
+            if self.status != "cancelled":
+                self.status = status
+            self.finished = time.perf_counter() - self.started
+            self.version += 1
+        self.publish(force=True)
+
+    def publish(self, force=False):
+        """Share a rendered snapshot so polls served by other workers can read it."""
+        now = time.monotonic()
+        if not force and now - self.published_at < PUBLISH_INTERVAL:
+            return
+        self.published_at = now
+        shared_cache.set("streams", self.id, {
+            "version": self.version, "done": self.done, "text": self.render(),
+        }, ttl=STREAM_TTL)
+
+    def render(self):
+        """Markdown shown in the answer panel, with latency once the answer is done."""
+        with self.lock:
+            text = "\n\n\n".join(self.sections)
+            if self.status == "cancelled":
+                text += "\n\n---\n*Cancelled.*"
+            elif self.done and self.first_token is not None:
+                text += (f"\n\n---\n*First token after {self.first_token:.2f}s, "
+                         f"complete after {self.finished:.2f}s.*")
+            elif not self.done and self.status in STATUS_LABELS:
+                text += f"\n\n*{STATUS_LABELS[self.status]}*"
+            return text
+
+
+def _register(stream):
+    now = time.perf_counter()
+    with _streams_lock:
+        stale = [sid for sid, s in _streams.items()
+                 if s.done and now - s.started - s.finished > STREAM_TTL]
+        for sid in stale:
+            del _streams[sid]
+        _streams[stream.id] = stream
+    stream.publish(force=True)
+
+
+class StreamSnapshot:
+    """Read-only view of a stream owned by another worker process."""
+
+    def __init__(self, stream_id, data):
+        self.id = stream_id
+        self.version = data["version"]
+        self.done = data["done"]
+        self.text = data["text"]
+        self.cancel_event = SharedCancelEvent(stream_id)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def render(self):
+        return self.text
+
+
+def get_stream(stream_id):
+    """The local stream, or a snapshot of one running in another worker."""
+    with _streams_lock:
+        stream = _streams.get(stream_id)
+    if stream is not None or not stream_id:
+        return stream
+    data = shared_cache.get("streams", stream_id)
+    return StreamSnapshot(stream_id, data) if data else None
+
+
+def start_static_stream(message):
+    """Create an already finished stream holding a fixed message."""
+    stream = AnswerStream()
+    stream.start_section(message)
+    stream.finish()
+    _register(stream)
+    return stream.id
+
+
+def cancel_stream(stream_id):
+    stream = get_stream(stream_id)
+    if stream is not None and not stream.done:
+        stream.cancel()
+
+
+def _run_answer(stream, question, repos):
+    # Cross-repo aggregates have one answer whatever the selection
+    if parse_aggregate_question(question):
+        repos = repos[:1]
+    for repo in repos:
+        if stream.cancel_event.is_set():
+            break
+        stream.start_section(f"For {repo}: " if len(repos) > 1 else "")
+        try:
+            answer = answer_hybrid(question, repo_name=repo, on_token=stream.append,
+                                   cancel_event=stream.cancel_event)
+        except AnswerCancelled:
+            break
+        except Exception as e:
+            print(f"❌ Failed to answer for {repo}:", e)
+            answer = f"Failed to answer: {e}"
+        stream.replace_section(f"For {repo}: {answer}" if len(repos) > 1 else answer)
+    stream.finish()
+
+
+def start_answer_stream(question, repos):
+    """
+    Queue a question on the background job pool, streaming tokens into a buffer.
+
+    Returns:
+        The stream id the poll callback uses to read the buffer.
+    """
+    stream = AnswerStream()
+    try:
+        job_manager.submit(_run_answer, stream, question, repos)
+    except QueueFull:
+        return start_static_stream("The server is busy answering other questions, please try again shortly.")
+    _register(stream)
+    return stream.id
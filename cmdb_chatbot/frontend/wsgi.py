@@ -0,0 +1,48 @@
+"""WSGI entry point for serving the dashboard with gunicorn (see gunicorn.conf.py)."""
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backend.db_utils import db_cursor, get_hot_repos, close_pool
+from backend.repo_index import refresh_repo_index
+from backend.qa_utils import warm_repo_metadata
+from frontend.app import app, init_database
+from frontend.dataviz import repo_metrics_payload
+
+# Comma separated repo names to warm up; the most recently active ones are used when unset
+HOT_REPOS = [name.strip() for name in os.getenv("HOT_REPOS", "").split(",") if name.strip()]
+WARMUP_REPOS = int(os.getenv("WARMUP_REPOS", "10"))
+
+
+def warm_up():
+    """
+    Preload what the first requests would otherwise compute.
+
+    Runs once in the gunicorn master with preload_app, so forked workers
+    inherit the repo index and default figures, and the shared cache holds
+    the hot repos' metadata for every worker.
+    """
+    try:
+        with db_cursor() as cur:
+            refresh_repo_index(cur=cur)
+            hot_repos = HOT_REPOS or get_hot_repos(cur, limit=WARMUP_REPOS)
+        warm_repo_metadata(hot_repos)
+        repo_metrics_payload(None)
+        print(f"✅ Warmed up {len(hot_repos)} repos")
+    except Exception as e:
+        # A cold cache is slower, not broken
+        print("❌ Warm-up failed:", e)
+
+
+def create_app():
+    """
+    Build the Flask server behind the Dash app.
+
+    Database connections opened here belong to the master process and are
+    closed before gunicorn forks its workers.
+    """
+    init_database()
+    warm_up()
+    close_pool()
+    return app.server
@@ -0,0 +1,45 @@
+"""
+Production settings for gunicorn.
+
+Run from the cmdb_chatbot folder:
+    gunicorn -c gunicorn.conf.py
+"""
+
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+# Workers write their metrics here and /metrics merges them; must be set
+# before the app (and prometheus_client) is imported
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "cmdb_chatbot_metrics"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+bind = os.getenv("BIND", "0.0.0.0:8050")
+wsgi_app = "frontend.wsgi:create_app()"
+
+# Load the app (and warm its caches) once in the master, then fork
+preload_app = True
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+# Threads let one worker keep polling streams while others wait on the LLM
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # Connections, if any, belong to the master; each worker opens its own
+    from backend.db_utils import forget_pool
+    forget_pool()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)